@@ -0,0 +1,121 @@
+"""
+Streaming export of user_activity.
+Rows are read from the cursor in fetchmany() batches and each batch is
+formatted and yielded before the next is fetched, so a worker holds one batch
+in memory however many rows the export covers.
+"""
+import csv
+import json
+from datetime import date, timedelta
+from io import StringIO
+
+BATCH_SIZE = 2000
+
+CSV_HEADER = ['Timestamp', 'User', 'Action', 'Book ID', 'Details']
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+class ExportError(ValueError):
+    """Raised for filter values that cannot be turned into a query."""
+
+
+def parse_filters(args):
+    """
+    Reads the export filters from request args: `start` and `end` (inclusive
+    YYYY-MM-DD dates), `user_id`, and any number of `action` values.
+    """
+    filters = {}
+    for name in ('start', 'end'):
+        value = args.get(name, '').strip()
+        if value:
+            try:
+                filters[name] = date.fromisoformat(value)
+            except ValueError:
+                raise ExportError(f'{name} must be a YYYY-MM-DD date')
+    user_id = args.get('user_id', '').strip()
+    if user_id:
+        try:
+            filters['user_id'] = int(user_id)
+        except ValueError:
+            raise ExportError('user_id must be a member id')
+        if not 1 <= filters['user_id'] < 2 ** 63:  # beyond that SQLite cannot bind it
+            raise ExportError('user_id must be a member id')
+    actions = [a.strip() for a in args.getlist('action') if a.strip()]
+    if actions:
+        filters['actions'] = actions
+    return filters
+
+
+def activity_query(filters):
+    """Returns (sql, params) selecting the filtered activity, newest first."""
+    where, params = [], []
+    if 'start' in filters:
+        where.append('ua.created_at >= ?')
+        params.append(filters['start'].isoformat())
+    if 'end' in filters:
+        where.append('ua.created_at < ?')
+        params.append((filters['end'] + timedelta(days=1)).isoformat())
+    if 'user_id' in filters:
+        where.append('ua.user_id = ?')
+        params.append(filters['user_id'])
+    if 'actions' in filters:
+        where.append(f"ua.action IN ({', '.join('?' for _ in filters['actions'])})")
+        params.extend(filters['actions'])
+    sql = '''
+        SELECT ua.created_at, m.first_name, m.last_name, ua.user_id, ua.action, ua.book_id, ua.details
+        FROM user_activity ua
+        JOIN member_db m ON ua.user_id = m.member_id
+    '''
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY ua.created_at DESC'
+    return sql, params
+
+
+def iter_batches(db, filters, batch_size=BATCH_SIZE):
+    sql, params = activity_query(filters)
+    cursor = db.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+def stream_csv(batches):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([row['created_at'], f"{row['first_name']} {row['last_name']}", row['action'], row['book_id'], row['details']])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_jsonl(batches):
+    for rows in batches:
+        yield ''.join(json.dumps({
+            'created_at': row['created_at'],
+            'user_id': row['user_id'],
+            'user': f"{row['first_name']} {row['last_name']}",
+            'action': row['action'],
+            'book_id': row['book_id'],
+            'details': row['details'],
+        }) + '\n' for row in rows)
+
+
+def stream_export(db, filters, fmt='csv', batch_size=BATCH_SIZE):
+    """Yields the export as text chunks, one per batch of rows."""
+    batches = iter_batches(db, filters, batch_size)
+    return stream_csv(batches) if fmt == 'csv' else stream_jsonl(batches)
@@ -0,0 +1,158 @@
+"""
+Buffered writer for user_activity.
+Request handlers enqueue events and return; a background thread per worker
+writes them in batches of up to ACTIVITY_FLUSH_SIZE rows, one transaction per
+batch, at least every ACTIVITY_FLUSH_INTERVAL seconds. Events are timestamped
+when they are enqueued, so the log keeps the time the action happened rather
+than the time it was written.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULTS = {
+    'ACTIVITY_LOG_ASYNC': 1,          # 0 writes each event inside the request, as before
+    'ACTIVITY_FLUSH_SIZE': 200,       # most events written per transaction
+    'ACTIVITY_FLUSH_INTERVAL': 1.0,   # seconds an event may wait for a batch to fill
+    'ACTIVITY_QUEUE_SIZE': 10000,     # events buffered before new ones are dropped
+}
+
+INSERT_SQL = 'INSERT INTO user_activity (user_id, action, details, book_id, created_at) VALUES (?, ?, ?, ?, ?)'
+
+log = logging.getLogger(__name__)
+
+
+def _timestamp():
+    # Same format and clock as the column's CURRENT_TIMESTAMP default.
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ActivityWriter:
+    def __init__(self, get_pool, settings):
+        self._get_pool = get_pool
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        atexit.register(self.close)
+
+    def log(self, user_id, action, details=None, book_id=None, db=None):
+        """
+        Queues one event. With ACTIVITY_LOG_ASYNC off it is written and
+        committed on `db`, the request's own connection, instead; a second
+        connection would wait on the request's open write transaction.
+        """
+        event = (user_id, action, details, book_id, _timestamp())
+        if not self.settings['ACTIVITY_LOG_ASYNC'] and db is not None:
+            db.execute(INSERT_SQL, event)
+            db.commit()
+            with self._lock:
+                self.written += 1
+            return
+        try:
+            self._ensure_started().put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Writes everything queued so far from the calling thread."""
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return
+        while True:
+            batch = self._take(q, block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        """Stops the writer thread after it drains the queue."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        thread.join(timeout)
+        self.flush()
+        with self._lock:
+            self._pid = self._thread = None  # a later event starts a new thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+                'written': self.written,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'errors': self.errors,
+            }
+
+    def _ensure_started(self):
+        # A worker forked from a preloaded master inherits the master's queue
+        # but not its thread, so each process starts its own.
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._queue
+        with self._lock:
+            if self._pid != pid:
+                self._queue = queue.Queue(self.settings['ACTIVITY_QUEUE_SIZE'])
+                self._stopping = threading.Event()
+                self._thread = threading.Thread(target=self._run, name='activity-writer', daemon=True)
+                self._pid = pid
+                self._thread.start()
+        return self._queue
+
+    def _run(self):
+        q = self._queue
+        while not self._stopping.is_set():
+            batch = self._take(q, block=True)
+            if batch:
+                self._write(batch)
+
+    def _take(self, q, block):
+        """Collects up to ACTIVITY_FLUSH_SIZE events, waiting at most one interval for them."""
+        size = self.settings['ACTIVITY_FLUSH_SIZE']
+        deadline = time.monotonic() + self.settings['ACTIVITY_FLUSH_INTERVAL']
+        batch = []
+        while len(batch) < size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(q.get(timeout=remaining))
+                else:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        pool = self._get_pool()
+        conn = None
+        try:
+            conn = pool.acquire()
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+        except Exception:
+            # Anything raised here would end the writer thread, so it is
+            # logged and the batch counted as dropped instead.
+            log.exception('dropping %d activity events', len(batch))
+            with self._lock:
+                self.errors += 1
+                self.dropped += len(batch)
+            return
+        finally:
+            if conn is not None:
+                pool.release(conn)
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
@@ -1,6 +1,30 @@
+import hashlib
+import io
 import os
 import sqlite3
 
+import activity_export
+import activity_writer
+import assets
+import avatars
+import bulk_import
+import chatbot
+import compression
+import dashboard_metrics
+import db_pool
+import event_hub
+import maintenance
+import member_cache
+import migrate
+import notifier
+import pagination
+import passwords
+import recommendations
+import search
+import sql_profiler
+import suggestions
+import title_cache
+
 DB_PATH = 'library.db'
 SCHEMA_PATH = 'full_schema.sql'
 
@@ -9,49 +33,86 @@ def init_db():
         with sqlite3.connect(DB_PATH) as conn:
             with open(SCHEMA_PATH, 'r') as f:
                 conn.executescript(f.read())
+    with sqlite3.connect(DB_PATH) as conn:
+        migrate.migrate(conn)
+        search.ensure_search_index(conn)
 
 init_db()
 # --- Helper for user-friendly action descriptions ---
-def get_action_description(log):
+BOOK_ACTION_LABELS = {
+    'add_wishlist': 'Added to wishlist',
+    'remove_wishlist': 'Removed from wishlist',
+    'reserve_book': 'Reserved book',
+    'return_book': 'Returned book',
+}
+
+def get_action_description(log, titles):
+    """Describes one activity row; `titles` maps the feed's book ids to titles."""
     action = log['action']
+    book_id = log['book_id']
+    if action in BOOK_ACTION_LABELS and book_id is not None:
+        return f"{BOOK_ACTION_LABELS[action]}: <a href='/admin/book/{book_id}' class='log-link'>{titles.get(book_id, book_id)}</a>"
     details = log['details'] or ''
-    desc = ''
-    if action == 'add_wishlist':
-        # Try to get book title
-        book_id = details.split('=')[1] if '=' in details else ''
-        db = get_db()
-        book = db.execute('SELECT title FROM book_db WHERE book_id = ?', (book_id,)).fetchone()
-        desc = f"Added to wishlist: <a href='/admin/book/{book_id}' class='log-link'>{book['title'] if book else book_id}</a>"
-    elif action == 'remove_wishlist':
-        book_id = details.split('=')[1] if '=' in details else ''
-        db = get_db()
-        book = db.execute('SELECT title FROM book_db WHERE book_id = ?', (book_id,)).fetchone()
-        desc = f"Removed from wishlist: <a href='/admin/book/{book_id}' class='log-link'>{book['title'] if book else book_id}</a>"
-    elif action == 'reserve_book':
-        book_id = details.split('=')[1] if '=' in details else ''
-        db = get_db()
-        book = db.execute('SELECT title FROM book_db WHERE book_id = ?', (book_id,)).fetchone()
-        desc = f"Reserved book: <a href='/admin/book/{book_id}' class='log-link'>{book['title'] if book else book_id}</a>"
-    elif action == 'return_book':
-        book_id = details.split('=')[1] if '=' in details else ''
-        db = get_db()
-        book = db.execute('SELECT title FROM book_db WHERE book_id = ?', (book_id,)).fetchone()
-        desc = f"Returned book: <a href='/admin/book/{book_id}' class='log-link'>{book['title'] if book else book_id}</a>"
-    else:
-        desc = action.replace('_', ' ').capitalize() + (f": {details}" if details else '')
-    return desc
+    return action.replace('_', ' ').capitalize() + (f": {details}" if details else '')
+
+def activity_entries(db, activity_log):
+    """
+    Adds profile links and friendly descriptions to user_activity rows joined
+    with the member's name. Titles for the whole batch come from the title
+    cache, with at most one query for the misses.
+    """
+    titles = book_titles.get_many(db, [log['book_id'] for log in activity_log if log['book_id'] is not None])
+    entries = []
+    for log in activity_log:
+        log = dict(log)
+        log['user_link'] = f"<a href='/admin/user/{log['user_id']}' class='log-link'>{log['first_name']} {log['last_name']}</a>"
+        log['desc'] = get_action_description(log, titles)
+        entries.append(log)
+    return entries
+
+def activity_feed_item(entry):
+    """The fields of an activity entry sent to the admin dashboard as JSON."""
+    return {key: entry[key] for key in ('activity_id', 'created_at', 'user_link', 'desc', 'action')}
 
-# Correct import for secure_filename
-from werkzeug.utils import secure_filename
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+def recent_activity(db, after_id=0):
+    """The newest ACTIVITY_FEED_SIZE activity rows past `after_id`, with member names."""
+    return db.execute('''
+        SELECT ua.*, m.first_name, m.last_name
+        FROM user_activity ua
+        JOIN member_db m ON ua.user_id = m.member_id
+        WHERE ua.activity_id > ?
+        ORDER BY ua.activity_id DESC
+        LIMIT ?
+    ''', (after_id, app.config['ACTIVITY_FEED_SIZE'])).fetchall()
+
+def latest_activity(db):
+    """(activity_id, created_at) of the newest activity row, or (0, None)."""
+    row = db.execute('SELECT activity_id, created_at FROM user_activity ORDER BY activity_id DESC LIMIT 1').fetchone()
+    return (row['activity_id'], row['created_at']) if row else (0, None)
+
+def latest_activity_id(db):
+    return latest_activity(db)[0]
+
+def activity_changes(db, after_id, limit):
+    """Activity entries added after `after_id`, for the admins' live feed."""
+    rows = db.execute('''
+        SELECT ua.*, m.first_name, m.last_name
+        FROM user_activity ua
+        JOIN member_db m ON ua.user_id = m.member_id
+        WHERE ua.activity_id > ?
+        ORDER BY ua.activity_id
+        LIMIT ?
+    ''', (after_id, limit)).fetchall()
+    return [(entry['activity_id'], ('role', 'admin'), activity_feed_item(entry)) for entry in activity_entries(db, rows)]
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 import sqlite3
 
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, g, jsonify
-import bcrypt
-from datetime import date, timedelta
+from flask import Flask, render_template, request, redirect, url_for, session, g, jsonify, send_from_directory, stream_with_context
+from datetime import date, datetime, timedelta, timezone
 
 # --- Flask App Configuration ---
 app = Flask(__name__)
@@ -60,29 +121,160 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
 app.config['DATABASE_URL'] = os.environ.get('DATABASE_URL')
 # For local development, fallback to SQLite
 app.config['LOCAL_DATABASE'] = 'library.db'
+# Seconds before a worker rebuilds its autocomplete index from the database
+app.config['SUGGESTION_INDEX_TTL'] = int(os.environ.get('SUGGESTION_INDEX_TTL', 300))
+# SQLite connection pool and pragmas (see db_pool.DEFAULTS)
+for key, default in db_pool.DEFAULTS.items():
+    app.config[key] = int(os.environ.get(key, default))
+# Logged-in member cache: seconds an entry lives and how many are kept per worker
+app.config['MEMBER_CACHE_TTL'] = int(os.environ.get('MEMBER_CACHE_TTL', 60))
+app.config['MEMBER_CACHE_SIZE'] = int(os.environ.get('MEMBER_CACHE_SIZE', 1024))
+members_cache = member_cache.MemberCache(app.config['MEMBER_CACHE_TTL'], app.config['MEMBER_CACHE_SIZE'])
+# Book title cache used by the activity feed
+app.config['TITLE_CACHE_TTL'] = int(os.environ.get('TITLE_CACHE_TTL', 300))
+app.config['TITLE_CACHE_SIZE'] = int(os.environ.get('TITLE_CACHE_SIZE', 4096))
+book_titles = title_cache.TitleCache(app.config['TITLE_CACHE_TTL'], app.config['TITLE_CACHE_SIZE'])
+# Seconds the admin pages' header tiles are cached per worker
+app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 15))
+dashboard = dashboard_metrics.DashboardMetrics(app.config['DASHBOARD_CACHE_TTL'])
+# Server-Sent Events push channel (see event_hub.DEFAULTS)
+for key, default in event_hub.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Rows shown in the admin activity feed
+app.config['ACTIVITY_FEED_SIZE'] = int(os.environ.get('ACTIVITY_FEED_SIZE', 20))
+# Rows per page for the catalog, the admin tables and /api/search_books
+app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 50))
+# Buffered activity logging (see activity_writer.DEFAULTS)
+for key, default in activity_writer.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Activity log rows fetched and written per chunk of a streamed export
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', activity_export.BATCH_SIZE))
+# Bulk catalog and member imports (see bulk_import.DEFAULTS)
+for key, default in bulk_import.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Chatbot keyword matcher (see chatbot.DEFAULTS)
+for key, default in chatbot.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Nightly fines, reminders and overdue days (see maintenance.DEFAULTS)
+for key, default in maintenance.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Per-request SQL profiling, slow-query log and /admin/metrics (see sql_profiler.DEFAULTS)
+for key, default in sql_profiler.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+profiler = sql_profiler.Profiler(app.config)
+# Password hashing pool and work factor (see passwords.DEFAULTS)
+for key, default in passwords.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+password_service = passwords.PasswordService(app.config)
+# Profile picture thumbnails (see avatars.DEFAULTS)
+for key, default in avatars.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+# Response compression (see compression.DEFAULTS)
+for key, default in compression.DEFAULTS.items():
+    app.config[key] = type(default)(os.environ.get(key, default))
+compressor = compression.Compressor(app.config)
+
+@app.errorhandler(passwords.Busy)
+def password_service_busy(error):
+    """A form that needed a new hash found the pool full; it can simply be sent again."""
+    return 'The server is busy. Please try again in a moment.', 503, {'Retry-After': '1'}
+
+# --- Conditional GET for polled JSON ---
+def parse_timestamp(value):
+    """Reads a CURRENT_TIMESTAMP-style UTC column value as an aware datetime, or None."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+def conditional_json(etag, last_modified, build):
+    """
+    Answers 304 Not Modified, without calling `build`, when the client already
+    holds `etag` in any encoding (or, if it sent no ETag, a copy at least as
+    new as `last_modified`); otherwise returns jsonify(build()). Both
+    validators are sent either way and the client must revalidate before
+    reusing its copy.
+    """
+    if request.if_none_match:
+        fresh = compression.etag_matches(request.if_none_match, etag)
+    else:
+        fresh = (last_modified is not None and request.if_modified_since is not None
+                 and last_modified <= request.if_modified_since)
+    response = app.response_class(status=304) if fresh else jsonify(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def table_versions(db, *names):
+    """Change counters of `names` from table_versions, in order; 0 for a table that has none."""
+    rows = dict(db.execute(f"SELECT name, version FROM table_versions WHERE name IN ({', '.join('?' * len(names))})",
+                           names).fetchall())
+    return [rows.get(name, 0) for name in names]
+
+# Cache-Control of responses that do not set their own, by endpoint
+CACHE_CONTROL = {
+    'search_suggestions': 'private, max-age=60',  # the index behind it is rebuilt every SUGGESTION_INDEX_TTL
+    'get_chatbot_response': 'no-store',
+    'metrics': 'no-store',
+}
 
 # --- Notifications API ---
 @app.route('/notifications')
 def notifications():
+    """
+    The member's newest notifications. With since=<notification_id> only newer
+    ones are returned, and an unchanged feed is answered with 304 after a
+    single index probe. The ETag also carries `since` and the read-state
+    counter, so marking notifications read refreshes the unread count.
+    """
     if 'mob_no' not in session:
         return jsonify({'notifications': []})
     db = get_db()
-    user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (session['mob_no'],)).fetchone()
-    notifs = db.execute('SELECT * FROM notifications WHERE user_id = ? ORDER BY created_at DESC LIMIT 20', (user['member_id'],)).fetchall()
-    unread_count = db.execute('SELECT COUNT(*) as cnt FROM notifications WHERE user_id = ? AND is_read = 0', (user['member_id'],)).fetchone()['cnt']
-    return jsonify({'notifications': [dict(n) for n in notifs], 'unread_count': unread_count})
-
-# --- Notification Helper ---
-def create_notification(user_id, message):
+    user = get_current_member()
+    since = request.args.get('since', 0, type=int)
+    latest_id, latest_at = notifier.latest(db, user)
+
+    def build():
+        notifs = notifier.feed(db, user, after_id=since)
+        unread_count = notifier.unread_count(db, user)
+        return {'notifications': [dict(n) for n in notifs], 'unread_count': unread_count, 'latest': latest_id}
+
+    read_version, = table_versions(db, 'notification_reads')
+    etag = f"n{user['member_id']}-{latest_id}-r{read_version}-s{since}"
+    return conditional_json(etag, parse_timestamp(latest_at), build)
+
+@app.route('/notifications/read', methods=['POST'])
+def notifications_read():
+    """Marks the member's feed read up to upto=<notification_id>, the newest one the bell has shown."""
+    if 'mob_no' not in session:
+        return jsonify({'success': False, 'error': 'Not logged in'}), 401
     db = get_db()
-    db.execute('INSERT INTO notifications (user_id, message) VALUES (?, ?)', (user_id, message))
-    db.commit()
+    user = get_current_member()
+    notifier.mark_read(db, user, request.form.get('upto', 0, type=int))
+    return jsonify({'success': True, 'unread_count': notifier.unread_count(db, user)})
+
+# --- Live updates ---
+@app.route('/events')
+def events():
+    """
+    Server-Sent Events stream of the member's new notifications, plus new
+    activity entries for admins. Answers 503 when the worker has no room for
+    another stream, and the page falls back to polling.
+    """
+    user = get_current_member()
+    sub = live_events.subscribe(user['member_id'], user['role'])
+    if sub is None:
+        return jsonify({'success': False, 'error': 'Too many live connections'}), 503
+    return app.response_class(live_events.stream(sub), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
     # --- User Activity Logging Helper ---
-def log_user_activity(user_id, action, details=None):
-    db = get_db()
-    db.execute('INSERT INTO user_activity (user_id, action, details) VALUES (?, ?, ?)', (user_id, action, details))
-    db.commit()
+def log_user_activity(user_id, action, details=None, book_id=None):
+    """Queues an activity event; the worker's writer thread commits it in a batch."""
+    activity_log.log(user_id, action, details, book_id=book_id, db=get_db())
 
 # --- Profile Management ---
 
@@ -95,6 +287,7 @@ def profile():
     user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (session['mob_no'],)).fetchone()
     # Handle missing profile_pic gracefully
     profile_pic = user['profile_pic'] if 'profile_pic' in user.keys() else None
+    previous_pic = profile_pic
     error = None
     success = None
     if request.method == 'POST':
@@ -106,53 +299,169 @@ def profile():
         # Password change
         new_password = request.form.get('new_password')
         if new_password:
-            hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+            hashed = password_service.hash(new_password)
         else:
             hashed = user['password']
         # Handle file upload
         file = request.files.get('profile_pic')
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{user['mob_no']}_" + file.filename)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            profile_pic = filename
+            try:
+                profile_pic = avatars.save_upload(file.stream, app.config['UPLOAD_FOLDER'], app.config)
+            except avatars.AvatarError as e:
+                error = f'Your picture was not changed: {e}'
         db.execute('UPDATE member_db SET first_name=?, last_name=?, address=?, email_id=?, mob_no=?, password=?, profile_pic=? WHERE member_id=?',
                    (first_name, last_name, address, email_id, mob_no, hashed, profile_pic, user['member_id']))
         db.commit()
+        if profile_pic != previous_pic:
+            avatars.release(db, app.config['UPLOAD_FOLDER'], previous_pic)
+        members_cache.invalidate(mob_no=user['mob_no'], member_id=user['member_id'])
+        g.pop('_member', None)
         session['mob_no'] = mob_no
-        success = 'Profile updated successfully.'
+        success = None if error else 'Profile updated successfully.'
         # Refresh user data
         user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (mob_no,)).fetchone()
     return render_template('profile.html', user=user, error=error, success=success)
 
-# Profile picture upload config (must be after app is defined)
-UPLOAD_FOLDER = 'static/profile_pics'
+# Profile picture upload config (must be after app is defined). Absolute, so
+# that pictures are saved where /avatars/ serves them from whatever the cwd.
+UPLOAD_FOLDER = os.path.join(app.root_path, 'static', 'profile_pics')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+@app.route('/avatars/<name>')
+def avatar(name):
+    """A profile picture. Thumbnails are named after their content and cached for good."""
+    if not avatars.is_immutable(name):
+        return send_from_directory(app.config['UPLOAD_FOLDER'], name)
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], name, max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Fingerprinted, precompressed static files built by `python assets.py`
+static_assets = assets.Assets(app.static_folder)
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+@app.route('/assets/<name>')
+def asset(name):
+    """
+    A built static file, precompressed when the client takes br or gzip and
+    cached for good since its name changes with its content. Bundle names
+    that have no build are joined on request and not cached.
+    """
+    encodings = static_assets.encodings(name)
+    if encodings is None:
+        if name not in assets.BUNDLES:
+            return 'Not found', 404
+        return app.response_class(assets.join_sources(name, app.static_folder), mimetype=assets.mimetype(name),
+                                  headers={'Cache-Control': 'no-cache'})
+    path, encoding = name, None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in encodings and request.accept_encodings.quality(candidate) > 0:
+            path, encoding = name + suffix, candidate
+            break
+    response = send_from_directory(static_assets.dist, path, mimetype=assets.mimetype(name), max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.content_encoding = encoding
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.template_global()
+def asset_url(name):
+    """URL of a file in static/ or a bundle in assets.BUNDLES, fingerprinted once built."""
+    built = static_assets.built(name)
+    if built is not None or name in assets.BUNDLES:
+        return url_for('asset', name=built or name)
+    return url_for('static', filename=name)
+
+@app.template_global()
+def avatar_url(profile_pic, size=64):
+    """URL of a member's picture at `size` pixels square (one of avatars.SIZES)."""
+    if not profile_pic:
+        return url_for('static', filename='profile_pics/default.png')
+    return url_for('avatar', name=avatars.variant(profile_pic, size))
 
 # --- Database Functions ---
+def get_pool():
+    """Returns this worker's connection pool for the configured database."""
+    return db_pool.get_pool(app.config['LOCAL_DATABASE'], app.config)
+
 def get_db():
     """
-    Connects to the database and returns a connection object.
-    It stores the connection in the 'g' object to reuse it for the same request.
-    This function now supports both PostgreSQL (for production) and SQLite (for local dev).
+    Returns a database connection for the current request.
+    The connection is checked out of the worker's pool on first use and kept
+    in the 'g' object so the rest of the request reuses it. While the request
+    is being profiled it is wrapped to time its statements.
     """
     db = getattr(g, '_database', None)
     if db is not None:
         return db
-
-    # Always use SQLite for this application
-    db = getattr(g, '_database', None)
-    if db is not None:
-        return db
-    db = g._database = sqlite3.connect(app.config['LOCAL_DATABASE'])
-    db.row_factory = sqlite3.Row
+    db = g._database = profiler.wrap(get_pool().acquire(), g.get('_sql_profile'))
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
-    """Closes the database connection at the end of the request."""
-    db = getattr(g, '_database', None)
+    """Returns the database connection to the pool at the end of the request."""
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        get_pool().release(sql_profiler.unwrap(db))
+
+# Registered ahead of check_auth so that the profile covers the whole request
+@app.before_request
+def start_profile():
+    g._sql_profile = profiler.start()
+
+@app.after_request
+def add_server_timing(response):
+    profile = g.get('_sql_profile')
+    if profile is not None:
+        response.headers['Server-Timing'] = profiler.server_timing(profile)
+    return response
+
+@app.teardown_request
+def finish_profile(exception):
+    """Records the request's latency and statements; runs before its connection goes back to the pool."""
+    profile = g.pop('_sql_profile', None)
+    if profile is not None:
+        db = g.get('_database')
+        profiler.finish(profile, request.endpoint, sql_profiler.unwrap(db) if db is not None else None)
+
+# Runs before add_server_timing (after_request hooks run in reverse), so the compression counts too
+@app.after_request
+def compress_response(response):
+    policy = CACHE_CONTROL.get(request.endpoint)
+    if policy is not None and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+    return compressor.process(request, response)
+
+activity_log = activity_writer.ActivityWriter(get_pool, app.config)
+
+# Live notifications and activity feed, pushed over /events. The watcher uses
+# its own connection outside the pool because it holds it for its lifetime.
+live_events = event_hub.EventHub(lambda: get_pool().connect(), [
+    event_hub.Source('notification', notifier.latest_id, notifier.changes),
+    event_hub.Source('activity', latest_activity_id, activity_changes),
+], app.config)
+
+# Chatbot responses, held in memory by each worker. The matcher keeps its own
+# connection so that PRAGMA data_version reports other connections' commits.
+chatbot_matcher = chatbot.KeywordMatcher(lambda: get_pool().connect(), app.config)
+
+# Nightly maintenance jobs, run in-process only when MAINTENANCE_SCHEDULER is
+# set; otherwise run `python maintenance.py` from cron.
+maintenance_scheduler = maintenance.Scheduler(lambda: get_pool().connect(), app.config)
+days_overdue = maintenance.DaysOverdueRefresher()
+
+# Started from the first request each process serves, not at import: under
+# gunicorn --preload the import runs only in the master, whose threads the
+# forked workers do not inherit
+@app.before_request
+def start_maintenance_scheduler():
+    if app.config['MAINTENANCE_SCHEDULER']:
+        maintenance_scheduler.start()
 
 # --- Authentication Routes ---
 @app.before_request
@@ -162,12 +471,18 @@ def check_auth():
     Redirects to the login page if the user is not authenticated,
     unless the request is for the login/register page or static files.
     """
-    allowed_routes = ['login', 'register', 'static', 'get_chatbot_response', 'forgot_password', 'reset_password']
+    allowed_routes = ['login', 'register', 'static', 'asset', 'avatar', 'get_chatbot_response', 'forgot_password', 'reset_password']
+    if request.endpoint == 'metrics' and profiler.scrape_allowed(request.headers.get('Authorization')):
+        return
     if request.endpoint in allowed_routes:
         return
     
     if 'mob_no' not in session:
         return redirect(url_for('login'))
+    if get_current_member() is None:
+        # The account was deleted or its mobile number changed elsewhere
+        session.clear()
+        return redirect(url_for('login'))
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -175,13 +490,23 @@ def login():
     error = None
     if request.method == 'POST':
         mob_no = request.form['mob_no']
-        password = request.form['password'].encode('utf-8')
+        password = request.form['password']
         
         db = get_db()
         user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (mob_no,)).fetchone()
+        try:
+            matches, rehashed = password_service.check(password, user['password']) if user else (False, None)
+        except passwords.Busy:
+            return render_template('login_register.html', error='Too many sign-ins right now. Please try again in a moment.'), 503
         
-        if user and bcrypt.checkpw(password, user['password']):
+        if matches:
+            if rehashed is not None:
+                # Stored at another cost than BCRYPT_ROUNDS; unless it changed meanwhile, keep the new hash
+                db.execute('UPDATE member_db SET password = ? WHERE member_id = ? AND password = ?',
+                           (rehashed, user['member_id'], user['password']))
+                db.commit()
             session['mob_no'] = user['mob_no']
+            members_cache.put(user['mob_no'], {column: user[column] for column in member_cache.MEMBER_COLUMNS})
             session['name'] = f"{user['first_name']} {user['last_name']}"
             if user['role'] == 'admin':
                 return redirect(url_for('admin_page'))
@@ -203,7 +528,6 @@ def register():
         address = request.form['address']
         mob_no = request.form['mob_no']
         email_id = request.form['email_id']
-        password = bcrypt.hashpw(request.form['password'].encode('utf-8'), bcrypt.gensalt())
         role = request.form['role']
         
         check_mob = db.execute('SELECT mob_no FROM member_db WHERE mob_no = ?', (mob_no,)).fetchone()
@@ -211,9 +535,11 @@ def register():
         if check_mob:
             error = 'Mobile number is already registered'
         else:
+            password = password_service.hash(request.form['password'])
             db.execute('INSERT INTO member_db (first_name, last_name, address, mob_no, email_id, password, role) VALUES (?, ?, ?, ?, ?, ?, ?)',
                          (first_name, last_name, address, mob_no, email_id, password, role))
             db.commit()
+            dashboard.invalidate()
             return redirect(url_for('login'))
             
     return render_template('login_register.html', error=error)
@@ -224,15 +550,43 @@ def logout():
     session.clear()
     return redirect(url_for('login'))
 
+# --- Current Member ---
+def get_current_member():
+    """
+    Returns the logged-in member as a dict (without the password), or None.
+    Looked up once per request and kept in 'g'; across requests it is served
+    from the worker's member cache, so most requests never query member_db.
+    """
+    if 'mob_no' not in session:
+        return None
+    if '_member' in g:
+        return g._member
+    mob_no = session['mob_no']
+    member = members_cache.get(mob_no)
+    if member is None:
+        member = member_cache.load_member(get_db(), mob_no)
+        if member is not None:
+            members_cache.put(mob_no, member)
+    g._member = member
+    return member
+
 # --- Admin Pages ---
 def get_user_role():
     """Helper function to get the current user's role."""
-    if 'mob_no' in session:
-        db = get_db()
-        user = db.execute('SELECT role FROM member_db WHERE mob_no = ?', (session['mob_no'],)).fetchone()
-        if user:
-            return user['role']
-    return None
+    member = get_current_member()
+    return member['role'] if member else None
+
+# --- Pagination Helpers ---
+def page_args():
+    """Cursor arguments for pagination.paginate() taken from the query string."""
+    return {'after': request.args.get('after'), 'before': request.args.get('before'), 'page_size': app.config['PAGE_SIZE']}
+
+@app.template_global()
+def page_url(**cursor):
+    """URL of the current listing with its filters kept and the cursor replaced."""
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'partial')}
+    args.update(cursor)
+    return url_for(request.endpoint, **args)
 
 @app.route('/admin_page')
 def admin_page():
@@ -241,74 +595,93 @@ def admin_page():
         return redirect(url_for('user_dashboard'))
 
     db = get_db()
-    total_books = db.execute("SELECT COUNT(*) AS cnt FROM book_db").fetchone()['cnt']
-    total_users = db.execute("SELECT COUNT(*) AS cnt FROM member_db WHERE role='user'").fetchone()['cnt']
-    pending_issues = db.execute("SELECT COUNT(*) AS cnt FROM issued_books WHERE return_date IS NULL").fetchone()['cnt']
-    due_today = db.execute("SELECT COUNT(*) AS cnt FROM issued_books WHERE due_date = ? AND return_date IS NULL", (date.today(),)).fetchone()['cnt']
+    if request.args.get('ajax') == '1':
+        # Polled by the live feed's fallback: since=<activity_id> returns only
+        # newer entries, and an unchanged feed is answered with 304. The ETag
+        # carries `since` as well, as the entries depend on it
+        since = request.args.get('since', 0, type=int)
+        latest_id, latest_at = latest_activity(db)
+
+        def build():
+            entries = activity_entries(db, recent_activity(db, since))
+            return {'entries': [activity_feed_item(log) for log in entries], 'latest': latest_id}
+
+        return conditional_json(f'a{latest_id}-s{since}', parse_timestamp(latest_at), build)
+
+    tiles = dashboard.get(db)
     
     recent_issues = db.execute("SELECT ib.issue_id, m.first_name || ' ' || m.last_name AS member_name, b.title AS book_title, ib.issue_date, ib.due_date FROM issued_books ib JOIN member_db m ON ib.member_id = m.member_id JOIN book_db b ON ib.book_id = b.book_id ORDER BY ib.issue_date DESC LIMIT 5").fetchall()
 
-    # Get count of pending reservations (status = 'pending')
-    pending_count = db.execute("SELECT COUNT(*) AS cnt FROM reservations WHERE status = 'pending'").fetchone()['cnt']
-    # User Activity Log (last 20 actions)
-    activity_log = db.execute('''
-        SELECT ua.*, m.first_name, m.last_name
-        FROM user_activity ua
-        JOIN member_db m ON ua.user_id = m.member_id
-        ORDER BY ua.created_at DESC
-        LIMIT 20
-    ''').fetchall()
-    # Add user profile links and friendly descriptions
-    log_rows = []
-    for log in activity_log:
-        log = dict(log)
-        log['user_link'] = f"<a href='/admin/user/{log['user_id']}' class='log-link'>{log['first_name']} {log['last_name']}</a>"
-        log['desc'] = get_action_description(log)
-        log_rows.append(log)
-    if request.args.get('ajax') == '1':
-        # Return JSON for AJAX live update
-        return jsonify([
-            {
-                'created_at': log['created_at'],
-                'user_link': log['user_link'],
-                'desc': log['desc'],
-                'action': log['action']
-            } for log in log_rows
-        ])
+    # User Activity Log (latest ACTIVITY_FEED_SIZE actions)
+    log_rows = activity_entries(db, recent_activity(db))
     return render_template('admin_page.html',
-        total_books=total_books, total_users=total_users, pending_issues=pending_issues, due_today=due_today,
-        recent_issues=recent_issues, pending_count=pending_count, activity_log=log_rows)
+        total_books=tiles['total_books'], total_users=tiles['total_users'], pending_issues=tiles['pending_issues'], due_today=tiles['due_today'],
+        recent_issues=recent_issues, pending_count=tiles['pending_reservations'], activity_log=log_rows,
+        activity_latest=latest_activity_id(db))
 
-# --- Export user activity log as CSV ---
-import csv
-from io import StringIO
+# --- Export user activity log as CSV or JSONL ---
 @app.route('/admin/export_activity_log')
 def export_activity_log():
-    db = get_db()
-    logs = db.execute('''
-        SELECT ua.created_at, m.first_name, m.last_name, ua.action, ua.details
-        FROM user_activity ua
-        JOIN member_db m ON ua.user_id = m.member_id
-        ORDER BY ua.created_at DESC
-        LIMIT 1000
-    ''').fetchall()
-    si = StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Timestamp', 'User', 'Action', 'Details'])
-    for log in logs:
-        cw.writerow([
-            log['created_at'],
-            f"{log['first_name']} {log['last_name']}",
-            log['action'],
-            log['details']
-        ])
-    output = si.getvalue()
+    """
+    Streams the activity log, newest first. Accepts start/end dates, user_id
+    and action filters, and format=csv (default) or format=jsonl.
+    """
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    fmt = request.args.get('format', 'csv')
+    if fmt not in activity_export.FORMATS:
+        return jsonify({'success': False, 'error': 'format must be csv or jsonl'}), 400
+    try:
+        filters = activity_export.parse_filters(request.args)
+    except activity_export.ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    mimetype, extension = activity_export.FORMATS[fmt]
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+
+    def generate():
+        # Runs after the view has returned and its context was torn down, so
+        # get_db() checks a connection out of the worker's pool again. The
+        # stream holds it until the download ends, when stream_with_context
+        # pops the context and the teardown returns it.
+        yield from activity_export.stream_export(get_db(), filters, fmt, batch_size)
+
     return app.response_class(
-        output,
-        mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment;filename=user_activity_log.csv'}
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment;filename=user_activity_log.{extension}'}
     )
-    return render_template('admin_page.html', total_books=total_books, total_users=total_users, pending_issues=pending_issues, due_today=due_today, recent_issues=recent_issues, pending_count=pending_count, activity_log=activity_log)
+
+# --- Bulk import of books or members from CSV or JSONL ---
+@app.route('/admin/import/<kind>', methods=['POST'])
+def import_records(kind):
+    """
+    Imports the uploaded `file` into the catalog (kind=books) or the members
+    (kind=members) and returns the import report. on_duplicate=skip leaves
+    books already in the catalog untouched instead of adding to their stock.
+    """
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'error': 'no file uploaded'}), 400
+    try:
+        fmt = bulk_import.detect_format(upload.filename, request.form.get('format'))
+    except bulk_import.BulkImportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    # Its own connection: an import can hold one for minutes
+    conn = get_pool().connect()
+    try:
+        report = bulk_import.run_import(conn, kind, upload.stream, fmt, app.config,
+                                        on_duplicate=request.form.get('on_duplicate', 'merge'))
+    except bulk_import.BulkImportError as e:
+        status = 409 if bulk_import.pending_restore(conn) else 400
+        return jsonify({'success': False, 'error': str(e)}), status
+    finally:
+        conn.close()
+    dashboard.invalidate()
+    if kind == 'books':
+        suggestions.reset_index()
+    return jsonify({'success': True, **report.as_dict()})
 
 @app.route('/manage_member', methods=['GET', 'POST'])
 def manage_member():
@@ -326,7 +699,7 @@ def manage_member():
             address = request.form['address']
             mob_no = request.form['mob_no']
             email = request.form['email_id']
-            password = bcrypt.hashpw(request.form['password'].encode('utf-8'), bcrypt.gensalt())
+            password = password_service.hash(request.form['password'])
             role = request.form['role']
             db.execute("INSERT INTO member_db (first_name, last_name, address, mob_no, email_id, password, role) VALUES (?, ?, ?, ?, ?, ?, ?)",
                          (fname, lname, address, mob_no, email, password, role))
@@ -340,7 +713,9 @@ def manage_member():
             role = request.form['role']
             db.execute("UPDATE member_db SET first_name=?, last_name=?, address=?, mob_no=?, email_id=?, role=? WHERE member_id=?",
                          (fname, lname, address, mob_no, email, role, id))
+            members_cache.invalidate(mob_no=mob_no, member_id=id)
         db.commit()
+        dashboard.invalidate()
         return redirect(url_for('manage_member'))
     
     if 'edit' in request.args:
@@ -351,9 +726,12 @@ def manage_member():
         delete_id = request.args['delete']
         db.execute("DELETE FROM member_db WHERE member_id = ?", (delete_id,))
         db.commit()
+        dashboard.invalidate()
+        members_cache.invalidate(member_id=delete_id)
         return redirect(url_for('manage_member'))
     
-    members = db.execute("SELECT member_id, first_name, last_name, address, mob_no, email_id, role FROM member_db").fetchall()
+    members = pagination.paginate(db, "SELECT member_id, first_name, last_name, address, mob_no, email_id, role FROM member_db WHERE 1=1", [],
+                                  [('member_id', 'member_id')], **page_args())
     
     return render_template('manage_member.html', members=members, edit_data=edit_data)
 
@@ -375,8 +753,9 @@ def manage_book():
             edition = request.form['edition']
             stock = request.form['total_stock']
             author = request.form['author_name']
-            db.execute("INSERT INTO book_db (title, category, publisher, year, edition, total_stock, author_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            cur = db.execute("INSERT INTO book_db (title, category, publisher, year, edition, total_stock, author_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
                          (title, category, publisher, year, edition, stock, author))
+            suggestions.add_book(cur.lastrowid, title, author, category)
         elif 'edit_book' in request.form:
             id = request.form['book_id']
             title = request.form['title']
@@ -388,7 +767,10 @@ def manage_book():
             author = request.form['author_name']
             db.execute("UPDATE book_db SET title=?, category=?, publisher=?, year=?, edition=?, total_stock=?, author_name=? WHERE book_id=?",
                          (title, category, publisher, year, edition, stock, author, id))
+            suggestions.update_book(id, title, author, category)
+            book_titles.invalidate(id)
         db.commit()
+        dashboard.invalidate()
         return redirect(url_for('manage_book'))
 
     if 'edit' in request.args:
@@ -399,9 +781,13 @@ def manage_book():
         delete_id = request.args['delete']
         db.execute("DELETE FROM book_db WHERE book_id = ?", (delete_id,))
         db.commit()
+        dashboard.invalidate()
+        suggestions.remove_book(delete_id)
+        book_titles.invalidate(delete_id)
         return redirect(url_for('manage_book'))
 
-    books = db.execute("SELECT book_id, title, category, publisher, year, edition, total_stock, author_name FROM book_db").fetchall()
+    books = pagination.paginate(db, "SELECT book_id, title, category, publisher, year, edition, total_stock, author_name FROM book_db WHERE 1=1", [],
+                                [('book_id', 'book_id')], **page_args())
     
     return render_template('manage_book.html', books=books, edit_data=edit_data)
 
@@ -412,7 +798,8 @@ def manage_issue():
         return redirect(url_for('user_dashboard'))
 
     db = get_db()
-    issued_records = db.execute("SELECT ib.issue_id, m.first_name || ' ' || m.last_name AS member_name, b.title AS book_title, ib.issue_date, ib.due_date, ib.return_date FROM issued_books ib JOIN member_db m ON ib.member_id = m.member_id JOIN book_db b ON ib.book_id = b.book_id ORDER BY ib.issue_date DESC").fetchall()
+    issued_records = pagination.paginate(db, "SELECT ib.issue_id, m.first_name || ' ' || m.last_name AS member_name, b.title AS book_title, ib.issue_date, ib.due_date, ib.return_date FROM issued_books ib JOIN member_db m ON ib.member_id = m.member_id JOIN book_db b ON ib.book_id = b.book_id WHERE 1=1", [],
+                                         [('ib.issue_date', 'issue_date'), ('ib.issue_id', 'issue_id')], descending=True, **page_args())
     return render_template('manage_issue.html', issued_records=issued_records)
 
 @app.route('/manage_fine', methods=['GET', 'POST'])
@@ -427,20 +814,22 @@ def manage_fine():
         if 'pay_fine' in request.form:
             fine_id = request.form['fine_id']
             db.execute("UPDATE fines SET status = 'Paid', payment_date = ? WHERE fine_id = ?", (date.today(), fine_id))
-            db.commit()
-            # Notify user and admin
+            # Notify user and admins in the same transaction as the payment
             fine = db.execute("SELECT f.*, ib.member_id, b.title FROM fines f JOIN issued_books ib ON f.issue_id = ib.issue_id JOIN book_db b ON ib.book_id = b.book_id WHERE f.fine_id = ?", (fine_id,)).fetchone()
             if fine:
-                admins = db.execute('SELECT member_id FROM member_db WHERE role = "admin"').fetchall()
-                for admin in admins:
-                    create_notification(admin['member_id'], f"Fine paid for '{fine['title']}' by member ID {fine['member_id']}")
-                create_notification(fine['member_id'], f"Your fine for '{fine['title']}' has been paid.")
+                notifier.send(db,
+                              messages=[(fine['member_id'], f"Your fine for '{fine['title']}' has been paid.")],
+                              broadcasts=[('admin', f"Fine paid for '{fine['title']}' by member ID {fine['member_id']}")],
+                              commit=False)
+            db.commit()
+            dashboard.invalidate()
             return redirect(url_for('manage_fine'))
     
     if 'delete' in request.args:
         fine_id = request.args['delete']
         db.execute("DELETE FROM fines WHERE fine_id = ?", (fine_id,))
         db.commit()
+        dashboard.invalidate()
         return redirect(url_for('manage_fine'))
     
     status_filter = request.args.get('status', 'all')
@@ -466,16 +855,18 @@ def manage_fine():
         query += " AND (m.first_name LIKE ? OR m.last_name LIKE ? OR m.first_name || ' ' || m.last_name LIKE ?)"
         params.extend([f"%{member_filter}%"] * 3)
 
-    query += " ORDER BY f.fine_date DESC"
+    fines = pagination.paginate(db, query, params, [('f.fine_date', 'fine_date'), ('f.fine_id', 'fine_id')], descending=True, **page_args())
 
-    fines = db.execute(query, params).fetchall()
+    tiles = dashboard.get(db)
 
-    total_fines = db.execute("SELECT COUNT(*) AS count FROM fines").fetchone()['count']
-    pending_fines = db.execute("SELECT COUNT(*) AS count FROM fines WHERE status = 'Pending'").fetchone()['count']
-    paid_fines = db.execute("SELECT COUNT(*) AS count FROM fines WHERE status = 'Paid'").fetchone()['count']
-    total_amount = db.execute("SELECT COALESCE(SUM(fine_amount), 0) AS total FROM fines WHERE status = 'Pending'").fetchone()['total']
+    return render_template('manage_fine.html', fines=fines, total_fines=tiles['total_fines'], pending_fines=tiles['pending_fines'], paid_fines=tiles['paid_fines'], total_amount=tiles['pending_fine_amount'], status_filter=status_filter, member_filter=member_filter)
 
-    return render_template('manage_fine.html', fines=fines, total_fines=total_fines, pending_fines=pending_fines, paid_fines=paid_fines, total_amount=total_amount, status_filter=status_filter, member_filter=member_filter)
+# An issue's fines summed per listed issue: a paid fine and the Pending one
+# accrued since can both exist, so joining fines would list the issue twice.
+# Correlated, since a joined GROUP BY subquery would aggregate all of fines.
+ISSUE_FINE_COLUMNS = '''(SELECT SUM(f.fine_amount) FROM fines f WHERE f.issue_id = ib.issue_id) AS fine_amount,
+               (SELECT CASE WHEN SUM(f.status = 'Pending') > 0 THEN 'Pending' ELSE MAX(f.status) END
+                FROM fines f WHERE f.issue_id = ib.issue_id) AS fine_status'''
 
 @app.route('/manage_return', methods=['GET', 'POST'])
 def manage_return():
@@ -492,43 +883,40 @@ def manage_return():
         if issue:
             due_date = date.fromisoformat(issue['due_date'])
             days_late = max(0, (date.today() - due_date).days)
-            fine = days_late * 5
-            db.execute("UPDATE issued_books SET return_date = ? WHERE issue_id = ?", (return_date, issue_id))
-            if fine > 0:
-                db.execute("INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date) VALUES (?, ?, ?, 'Pending', ?)",
-                            (issue_id, fine, days_late, date.today()))
+            db.execute("UPDATE issued_books SET return_date = ?, days_overdue = ? WHERE issue_id = ?", (return_date, days_late, issue_id))
+            # Settles the fine the nightly job may already have accrued for this issue
+            maintenance.accrue_fines(db, date.today(), issue_id=issue_id)
+            # Notify user and admins in the same transaction as the return
+            notifier.send(db,
+                          messages=[(issue['member_id'], f"You have returned '{issue['title']}'.")],
+                          broadcasts=[('admin', f"Book '{issue['title']}' returned by {issue['first_name']} {issue['last_name']}")],
+                          commit=False)
             db.commit()
-            # Notify user and admin
-            admins = db.execute('SELECT member_id FROM member_db WHERE role = "admin"').fetchall()
-            for admin in admins:
-                create_notification(admin['member_id'], f"Book '{issue['title']}' returned by {issue['first_name']} {issue['last_name']}")
-            create_notification(issue['member_id'], f"You have returned '{issue['title']}'.")
+            dashboard.invalidate()
             
     if 'delete' in request.args:
         issue_id = request.args['delete']
         db.execute("DELETE FROM fines WHERE issue_id = ?", (issue_id,))
         db.execute("DELETE FROM issued_books WHERE issue_id = ?", (issue_id,))
         db.commit()
+        dashboard.invalidate()
         return redirect(url_for('manage_return'))
 
+    days_overdue.ensure(db)
     status_filter = request.args.get('status', 'all')
     member_filter = request.args.get('member', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
 
-    query = """
+    query = f"""
         SELECT ib.issue_id, ib.issue_date, ib.due_date, ib.return_date,
                m.member_id, m.first_name, m.last_name, m.mob_no, m.email_id,
                b.book_id, b.title, b.author_name, b.category,
-               (CASE WHEN ib.return_date IS NULL AND ib.due_date < CURRENT_DATE THEN CAST((JULIANDAY(CURRENT_DATE) - JULIANDAY(ib.due_date)) AS INTEGER)
-                     WHEN ib.return_date IS NOT NULL AND ib.return_date > ib.due_date THEN CAST((JULIANDAY(ib.return_date) - JULIANDAY(ib.due_date)) AS INTEGER)
-                     ELSE 0 END) AS days_overdue,
-               (CASE WHEN f.fine_amount IS NOT NULL THEN f.fine_amount ELSE 0 END) AS fine_amount,
-               f.status AS fine_status
+               ib.days_overdue,
+               {ISSUE_FINE_COLUMNS}
         FROM issued_books ib
         JOIN member_db m ON ib.member_id = m.member_id
         JOIN book_db b ON ib.book_id = b.book_id
-        LEFT JOIN fines f ON ib.issue_id = f.issue_id
         WHERE 1=1
     """
 
@@ -549,15 +937,11 @@ def manage_return():
         query += " AND ib.issue_date <= ?"
         params.append(date_to)
 
-    query += " ORDER BY ib.issue_date DESC"
-    returns = db.execute(query, params).fetchall()
+    returns = pagination.paginate(db, query, params, [('ib.issue_date', 'issue_date'), ('ib.issue_id', 'issue_id')], descending=True, **page_args())
 
-    total_issues = db.execute("SELECT COUNT(*) AS count FROM issued_books").fetchone()['count']
-    pending_returns = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE return_date IS NULL").fetchone()['count']
-    completed_returns = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE return_date IS NOT NULL").fetchone()['count']
-    overdue_books = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE return_date IS NULL AND due_date < CURRENT_DATE").fetchone()['count']
+    tiles = dashboard.get(db)
 
-    return render_template('manage_return.html', returns=returns, total_issues=total_issues, pending_returns=pending_returns, completed_returns=completed_returns, overdue_books=overdue_books, status_filter=status_filter, member_filter=member_filter, date_from=date_from, date_to=date_to)
+    return render_template('manage_return.html', returns=returns, total_issues=tiles['total_issues'], pending_returns=tiles['pending_issues'], completed_returns=tiles['completed_returns'], overdue_books=tiles['overdue'], status_filter=status_filter, member_filter=member_filter, date_from=date_from, date_to=date_to)
 
 @app.route('/report_page')
 def report_page():
@@ -575,21 +959,25 @@ def report_page():
     else:
         start_date = date.today().isoformat()
     
-    borrow_summary = db.execute("SELECT COUNT(*) AS cnt FROM issued_books WHERE issue_date >= ?", (start_date,)).fetchone()['cnt']
-    fine_summary = db.execute("SELECT COALESCE(SUM(fine_amount), 0) AS total FROM fines WHERE status='Paid' AND payment_date >= ?", (start_date,)).fetchone()['total']
+    # Totals and rankings come from the report_* rollups (migration 0007),
+    # which triggers keep current, so the cost does not grow with history.
+    summary = db.execute("SELECT COALESCE(SUM(borrows), 0) AS borrows, COALESCE(SUM(fines_collected), 0) AS fines FROM report_daily WHERE day >= ?", (start_date,)).fetchone()
+    borrow_summary = summary['borrows']
+    fine_summary = summary['fines']
 
     # Report Queries
-    all_issued = db.execute("SELECT ib.issue_id, b.title, m.first_name || ' ' || m.last_name AS member_name, ib.issue_date, ib.due_date, ib.return_date FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id JOIN member_db m ON ib.member_id = m.member_id ORDER BY ib.issue_date DESC").fetchall()
-    top_books = db.execute("SELECT b.book_id, b.title, b.author_name, COUNT(*) AS borrow_count FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id GROUP BY b.book_id ORDER BY borrow_count DESC LIMIT 10").fetchall()
-    active_members = db.execute("SELECT m.member_id, m.first_name || ' ' || m.last_name AS member_name, COUNT(*) AS borrow_count FROM issued_books ib JOIN member_db m ON ib.member_id = m.member_id GROUP BY m.member_id ORDER BY borrow_count DESC LIMIT 10").fetchall()
+    all_issued = pagination.paginate(db, "SELECT ib.issue_id, b.title, m.first_name || ' ' || m.last_name AS member_name, ib.issue_date, ib.due_date, ib.return_date FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id JOIN member_db m ON ib.member_id = m.member_id WHERE 1=1", [],
+                                     [('ib.issue_date', 'issue_date'), ('ib.issue_id', 'issue_id')], descending=True, **page_args())
+    top_books = db.execute("SELECT b.book_id, b.title, b.author_name, r.borrows AS borrow_count FROM report_book_borrows r JOIN book_db b ON r.book_id = b.book_id WHERE r.borrows > 0 ORDER BY r.borrows DESC LIMIT 10").fetchall()
+    active_members = db.execute("SELECT m.member_id, m.first_name || ' ' || m.last_name AS member_name, r.borrows AS borrow_count FROM report_member_borrows r JOIN member_db m ON r.member_id = m.member_id WHERE r.borrows > 0 ORDER BY r.borrows DESC LIMIT 10").fetchall()
     overdue = db.execute("SELECT ib.issue_id, b.title, m.first_name || ' ' || m.last_name AS member_name, ib.due_date FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id JOIN member_db m ON ib.member_id = m.member_id WHERE ib.due_date < CURRENT_DATE AND ib.return_date IS NULL ORDER BY ib.due_date ASC").fetchall()
     low_stock = db.execute("SELECT book_id, title, total_stock FROM book_db WHERE total_stock < 3 ORDER BY total_stock ASC").fetchall()
     
     # New Reports
-    monthly_borrow = db.execute("SELECT SUBSTR(issue_date, 1, 7) AS month, COUNT(*) AS borrow_count FROM issued_books GROUP BY month ORDER BY month DESC LIMIT 12").fetchall()
-    category_popularity = db.execute("SELECT b.category, COUNT(*) AS borrow_count FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id GROUP BY b.category ORDER BY borrow_count DESC").fetchall()
-    fine_collection = db.execute("SELECT SUBSTR(payment_date, 1, 7) AS month, SUM(fine_amount) AS total_collected FROM fines WHERE status='Paid' GROUP BY month ORDER BY month DESC LIMIT 12").fetchall()
-    top_authors = db.execute("SELECT b.author_name, COUNT(*) AS borrow_count FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id GROUP BY b.author_name ORDER BY borrow_count DESC LIMIT 10").fetchall()
+    monthly_borrow = db.execute("SELECT month, borrows AS borrow_count FROM report_monthly WHERE borrows > 0 ORDER BY month DESC LIMIT 12").fetchall()
+    category_popularity = db.execute("SELECT NULLIF(category, '') AS category, borrows AS borrow_count FROM report_category_borrows WHERE borrows > 0 ORDER BY borrows DESC").fetchall()
+    fine_collection = db.execute("SELECT month, fines_collected AS total_collected FROM report_monthly WHERE fines_paid > 0 ORDER BY month DESC LIMIT 12").fetchall()
+    top_authors = db.execute("SELECT NULLIF(author_name, '') AS author_name, borrows AS borrow_count FROM report_author_borrows WHERE borrows > 0 ORDER BY borrows DESC LIMIT 10").fetchall()
 
     return render_template('report_page.html', timeframe=timeframe, borrow_summary=borrow_summary, fine_summary=fine_summary, all_issued=all_issued, top_books=top_books, active_members=active_members, overdue=overdue, low_stock=low_stock, monthly_borrow=monthly_borrow, category_popularity=category_popularity, fine_collection=fine_collection, top_authors=top_authors)
 
@@ -606,20 +994,21 @@ def wishlist_data():
         issue_date = date.today().isoformat()
         due_date = (date.today() + timedelta(days=14)).isoformat()
         
-        stock_check = db.execute("SELECT total_stock FROM book_db WHERE book_id = ?", (book_id,)).fetchone()['total_stock']
-        issued_count = db.execute("SELECT COUNT(*) FROM issued_books WHERE book_id = ? AND return_date IS NULL", (book_id,)).fetchone()[0]
+        stock = db.execute("SELECT total_stock, active_issue_count FROM book_db WHERE book_id = ?", (book_id,)).fetchone()
 
-        if issued_count < stock_check:
+        if stock['active_issue_count'] < stock['total_stock']:
             db.execute("INSERT INTO issued_books (member_id, book_id, issue_date, due_date) VALUES (?, ?, ?, ?)", (member_id, book_id, issue_date, due_date))
             db.execute("DELETE FROM wishlist WHERE member_id = ? AND book_id = ?", (member_id, book_id))
             db.commit()
+            dashboard.invalidate()
             session['message'] = 'Book issued successfully!'
         else:
             session['message'] = 'No stock available for this book.'
             
         return redirect(url_for('wishlist_data'))
 
-    wishlist_records = db.execute("SELECT ib.wishlist_id, ib.member_id, ib.book_id, m.first_name || ' ' || m.last_name AS member_name, b.title AS book_title FROM wishlist ib JOIN member_db m ON ib.member_id = m.member_id JOIN book_db b ON ib.book_id = b.book_id ORDER BY ib.added_date DESC").fetchall()
+    wishlist_records = pagination.paginate(db, "SELECT ib.wishlist_id, ib.member_id, ib.book_id, ib.added_date, m.first_name || ' ' || m.last_name AS member_name, b.title AS book_title FROM wishlist ib JOIN member_db m ON ib.member_id = m.member_id JOIN book_db b ON ib.book_id = b.book_id WHERE 1=1", [],
+                                           [('ib.added_date', 'added_date'), ('ib.wishlist_id', 'wishlist_id')], descending=True, **page_args())
     message = session.pop('message', None)
     return render_template('wishlist_data.html', wishlist_records=wishlist_records, message=message)
 
@@ -631,7 +1020,7 @@ def user_dashboard():
         return redirect(url_for('admin_page'))
 
     db = get_db()
-    user_data = db.execute("SELECT * FROM member_db WHERE mob_no = ?", (session['mob_no'],)).fetchone()
+    user_data = get_current_member()
     member_id = user_data['member_id']
 
     if request.method == 'POST' and 'toggle_wishlist' in request.form:
@@ -640,61 +1029,50 @@ def user_dashboard():
         if wishlist_check:
             db.execute("DELETE FROM wishlist WHERE member_id = ? AND book_id = ?", (member_id, book_id))
             session['message'] = "Book removed from wishlist!"
-            log_user_activity(member_id, 'remove_wishlist', f'book_id={book_id}')
+            log_user_activity(member_id, 'remove_wishlist', book_id=book_id)
         else:
             db.execute("INSERT INTO wishlist (member_id, book_id) VALUES (?, ?)", (member_id, book_id))
             session['message'] = "Book added to wishlist!"
-            log_user_activity(member_id, 'add_wishlist', f'book_id={book_id}')
+            log_user_activity(member_id, 'add_wishlist', book_id=book_id)
         db.commit()
         return redirect(url_for('user_dashboard'))
 
-    # Statistics
-    total_issued = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ?", (member_id,)).fetchone()['count']
-    currently_issued = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ? AND return_date IS NULL", (member_id,)).fetchone()['count']
-    overdue_books = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ? AND return_date IS NULL AND due_date < CURRENT_DATE", (member_id,)).fetchone()['count']
-    pending_fines = db.execute("SELECT COALESCE(SUM(f.fine_amount), 0) AS total FROM fines f JOIN issued_books ib ON f.issue_id = ib.issue_id WHERE ib.member_id = ? AND f.status = 'Pending'", (member_id,)).fetchone()['total']
-
     # Search & Books
     search_query = request.args.get('search', '')
     search_filter = request.args.get('filter', 'all')
-    params = [member_id]
-    where_clause = ""
-    
-    if search_query:
-        if search_filter == 'all':
-            where_clause = "WHERE b.title LIKE ? OR b.author_name LIKE ? OR b.category LIKE ?"
-            params.extend([f"%{search_query}%"] * 3)
-        elif search_filter == 'title':
-            where_clause = "WHERE b.title LIKE ?"
-            params.append(f"%{search_query}%")
-        elif search_filter == 'author':
-            where_clause = "WHERE b.author_name LIKE ?"
-            params.append(f"%{search_query}%")
-        elif search_filter == 'category':
-            where_clause = "WHERE b.category LIKE ?"
-            params.append(f"%{search_query}%")
+    join_clause, where_clause, order_clause, search_params = search.catalog_filter(search_query, search_filter)
 
     books_query = f"""
         SELECT b.book_id, b.title, b.author_name, b.category, b.year, b.total_stock,
-               (SELECT COUNT(*) FROM issued_books ib WHERE ib.book_id = b.book_id AND ib.return_date IS NULL) AS issued_count,
+               b.active_issue_count AS issued_count,
                EXISTS(SELECT 1 FROM wishlist w WHERE w.book_id = b.book_id AND w.member_id = ?) AS in_wishlist,
-               EXISTS(SELECT 1 FROM reservations r WHERE r.book_id = b.book_id AND r.member_id = ? AND r.status = 'active') AS has_reserved
+               EXISTS(SELECT 1 FROM reservations r WHERE r.book_id = b.book_id AND r.member_id = ? AND r.status = 'active') AS has_reserved,
+               {order_clause} AS sort_key
         FROM book_db b
+        {join_clause}
         {where_clause}
-        ORDER BY b.title
     """
-    params = [member_id, member_id] + params[1:]
-    books = db.execute(books_query, tuple(params)).fetchall()
+    params = [member_id, member_id] + search_params
+    books = pagination.paginate(db, books_query, params, [(order_clause, 'sort_key'), ('b.book_id', 'book_id')], **page_args())
+    if request.args.get('partial') == 'books':
+        # "Show More" only needs the next page of cards
+        return render_template('book_cards_page.html', books=books)
+
+    days_overdue.ensure(db)
+    # Statistics
+    total_issued = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ?", (member_id,)).fetchone()['count']
+    currently_issued = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ? AND return_date IS NULL", (member_id,)).fetchone()['count']
+    overdue_books = db.execute("SELECT COUNT(*) AS count FROM issued_books WHERE member_id = ? AND return_date IS NULL AND days_overdue > 0", (member_id,)).fetchone()['count']
+    pending_fines = db.execute("SELECT COALESCE(SUM(f.fine_amount), 0) AS total FROM fines f JOIN issued_books ib ON f.issue_id = ib.issue_id WHERE ib.member_id = ? AND f.status = 'Pending'", (member_id,)).fetchone()['total']
 
     # Issued Books
-    issued_books_query = """
+    issued_books_query = f"""
         SELECT ib.issue_id, ib.issue_date, ib.due_date, ib.return_date,
                b.title, b.author_name, b.category,
-               (CASE WHEN ib.return_date IS NULL AND ib.due_date < CURRENT_DATE THEN CAST((JULIANDAY(CURRENT_DATE) - JULIANDAY(ib.due_date)) AS INTEGER) ELSE 0 END) AS days_overdue,
-               f.fine_amount, f.status AS fine_status
+               ib.days_overdue,
+               {ISSUE_FINE_COLUMNS}
         FROM issued_books ib
         JOIN book_db b ON ib.book_id = b.book_id
-        LEFT JOIN fines f ON ib.issue_id = f.issue_id
         WHERE ib.member_id = ?
         ORDER BY ib.issue_date DESC
     """
@@ -704,7 +1082,7 @@ def user_dashboard():
     wishlist_query = """
         SELECT w.wishlist_id, w.added_date,
                b.book_id, b.title, b.author_name, b.category, b.total_stock,
-               (SELECT COUNT(*) FROM issued_books ib WHERE ib.book_id = b.book_id AND ib.return_date IS NULL) AS issued_count
+               b.active_issue_count AS issued_count
         FROM wishlist w
         JOIN book_db b ON w.book_id = b.book_id
         WHERE w.member_id = ?
@@ -712,16 +1090,8 @@ def user_dashboard():
     """
     wishlist_records = db.execute(wishlist_query, (member_id,)).fetchall()
 
-    # Recommendations
-    recommended_books = []
-    # Get categories the user borrowed most
-    cat_row = db.execute("SELECT b.category, COUNT(*) as cnt FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id WHERE ib.member_id = ? GROUP BY b.category ORDER BY cnt DESC LIMIT 1", (member_id,)).fetchone()
-    if cat_row:
-        # Recommend books from top category not already issued
-        recommended_books = db.execute("SELECT * FROM book_db WHERE category = ? AND book_id NOT IN (SELECT book_id FROM issued_books WHERE member_id = ?) GROUP BY book_id LIMIT 5", (cat_row['category'], member_id)).fetchall()
-    if not recommended_books:
-        # Fallback: most popular books
-        recommended_books = db.execute("SELECT b.*, COUNT(ib.issue_id) as cnt FROM book_db b LEFT JOIN issued_books ib ON b.book_id = ib.book_id GROUP BY b.book_id ORDER BY cnt DESC LIMIT 5").fetchall()
+    # Recommendations, from the co-borrow neighbours the maintenance job builds
+    recommended_books = recommendations.for_member(db, member_id)
 
     message = session.pop('message', None)
 
@@ -732,22 +1102,22 @@ def reserve_book():
     if 'mob_no' not in session:
         return redirect(url_for('login'))
     db = get_db()
-    user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (session['mob_no'],)).fetchone()
+    user = get_current_member()
     member_id = user['member_id']
     book_id = request.form.get('book_id')
     # Check if already reserved
     existing = db.execute('SELECT * FROM reservations WHERE member_id = ? AND book_id = ? AND status = "active"', (member_id, book_id)).fetchone()
     if not existing:
         db.execute('INSERT INTO reservations (member_id, book_id) VALUES (?, ?)', (member_id, book_id))
-        db.commit()
-        # Notify admin(s)
-        admins = db.execute('SELECT member_id FROM member_db WHERE role = "admin"').fetchall()
+        # Notify the user and the admins in the same transaction as the reservation
         book = db.execute('SELECT title FROM book_db WHERE book_id = ?', (book_id,)).fetchone()
-        for admin in admins:
-            create_notification(admin['member_id'], f"New reservation request for '{book['title']}' by {user['first_name']} {user['last_name']}")
-        # Notify user
-        create_notification(member_id, f"You have reserved '{book['title']}'.")
-    log_user_activity(member_id, 'reserve_book', f'book_id={book_id}')
+        notifier.send(db,
+                      messages=[(member_id, f"You have reserved '{book['title']}'.")],
+                      broadcasts=[('admin', f"New reservation request for '{book['title']}' by {user['first_name']} {user['last_name']}")],
+                      commit=False)
+        db.commit()
+        dashboard.invalidate()
+    log_user_activity(member_id, 'reserve_book', book_id=book_id)
     return redirect(url_for('user_dashboard'))
 
 @app.route('/my_reservations')
@@ -755,8 +1125,7 @@ def my_reservations():
     if 'mob_no' not in session:
         return redirect(url_for('login'))
     db = get_db()
-    user = db.execute('SELECT * FROM member_db WHERE mob_no = ?', (session['mob_no'],)).fetchone()
-    member_id = user['member_id']
+    member_id = get_current_member()['member_id']
     reservations = db.execute('SELECT r.*, b.title, b.author_name FROM reservations r JOIN book_db b ON r.book_id = b.book_id WHERE r.member_id = ? ORDER BY r.reserved_date DESC', (member_id,)).fetchall()
     return render_template('my_reservations.html', reservations=reservations)
 
@@ -768,15 +1137,10 @@ def get_chatbot_response():
     Now supports book search and more flexible answers.
     """
     user_message = request.json.get('message', '').lower()
-    db = get_db()
 
     # Book search intent
-    if any(word in user_message for word in ['find book', 'search book', 'book by', 'author', 'category', 'title']):
-        # Try to extract a keyword
-        import re
-        match = re.search(r'(?:book|author|category|title)[:\s]+([\w\s]+)', user_message)
-        keyword = match.group(1).strip() if match else user_message
-        books = db.execute("SELECT title, author_name, category FROM book_db WHERE title LIKE ? OR author_name LIKE ? OR category LIKE ? LIMIT 5", (f"%{keyword}%", f"%{keyword}%", f"%{keyword}%")).fetchall()
+    if any(word in user_message for word in chatbot.SEARCH_WORDS):
+        books = search.search_books(get_db(), chatbot.search_term(user_message), limit=5)
         if books:
             book_lines = [f"{b['title']} by {b['author_name']} ({b['category']})" for b in books]
             response = "Here are some books I found:\n" + "\n".join(book_lines)
@@ -784,57 +1148,47 @@ def get_chatbot_response():
             response = "Sorry, I couldn't find any books matching your query."
         return jsonify({'response': response})
 
-    # Try to find a direct keyword match (improved)
-    response_data = db.execute("SELECT response FROM chatbot_responses WHERE ? LIKE '%' || keyword || '%' OR keyword LIKE '%' || ? || '%'", (user_message, user_message)).fetchone()
-    if response_data:
-        response = response_data['response']
-    else:
-        # Fallback response for unhandled questions
-        response = "I'm sorry, I don't have information on that. Please ask about library hours, fines, renewals, book search, or borrowing limits."
+    # Longest keyword match, from the worker's in-memory copy of chatbot_responses
+    response = chatbot_matcher.match(user_message) or chatbot.FALLBACK
     return jsonify({'response': response})
 
 @app.route('/')
 def home():
-    db = get_db()
-    chatbot_responses = db.execute('SELECT * FROM chatbot_responses').fetchall()
-    db.close()
-    return render_template('index.html', chatbot_responses=chatbot_responses)
+    return render_template('index.html', chatbot_responses=chatbot_matcher.rows())
 
 @app.route('/api/search_books')
 def api_search_books():
-    """API endpoint for dynamic book search (AJAX)."""
+    """
+    API endpoint for dynamic book search (AJAX). The ETag comes from the
+    change counters of book_db and wishlist, so a repeated search is answered
+    with 304 without being run until either table changes.
+    """
     if get_user_role() == 'admin':
-        return jsonify([])
+        return jsonify({'books': [], 'next': None, 'prev': None})
 
     db = get_db()
-    member_id = db.execute("SELECT member_id FROM member_db WHERE mob_no = ?", (session['mob_no'],)).fetchone()['member_id']
+    member_id = get_current_member()['member_id']
+    books_version, wishlist_version = table_versions(db, 'book_db', 'wishlist')
+    query_digest = hashlib.blake2s(request.query_string, digest_size=8).hexdigest()
+    etag = f"s{books_version}-{wishlist_version}-{member_id}-{app.config['PAGE_SIZE']}-{query_digest}"
+    return conditional_json(etag, None, lambda: search_books_page(db, member_id))
+
+def search_books_page(db, member_id):
+    """One page of the catalogue search for the member; reads only book_db, its FTS index and wishlist."""
     search_query = request.args.get('q', '')
     search_filter = request.args.get('filter', 'all')
-    params = [member_id]
-    where_clause = ""
-    if search_query:
-        if search_filter == 'all':
-            where_clause = "WHERE b.title LIKE ? OR b.author_name LIKE ? OR b.category LIKE ?"
-            params.extend([f"%{search_query}%"] * 3)
-        elif search_filter == 'title':
-            where_clause = "WHERE b.title LIKE ?"
-            params.append(f"%{search_query}%")
-        elif search_filter == 'author':
-            where_clause = "WHERE b.author_name LIKE ?"
-            params.append(f"%{search_query}%")
-        elif search_filter == 'category':
-            where_clause = "WHERE b.category LIKE ?"
-            params.append(f"%{search_query}%")
+    join_clause, where_clause, order_clause, search_params = search.catalog_filter(search_query, search_filter)
     books_query = f'''
         SELECT b.book_id, b.title, b.author_name, b.category, b.year, b.total_stock,
-               (SELECT COUNT(*) FROM issued_books ib WHERE ib.book_id = b.book_id AND ib.return_date IS NULL) AS issued_count,
-               (SELECT COUNT(*) FROM wishlist w WHERE w.book_id = b.book_id AND w.member_id = ?) AS in_wishlist
+               b.active_issue_count AS issued_count,
+               (SELECT COUNT(*) FROM wishlist w WHERE w.book_id = b.book_id AND w.member_id = ?) AS in_wishlist,
+               {order_clause} AS sort_key
         FROM book_db b
+        {join_clause}
         {where_clause}
-        ORDER BY b.title
     '''
-    params = [member_id] + params[1:]  # member_id for wishlist check
-    books = db.execute(books_query, tuple(params)).fetchall()
+    params = [member_id] + search_params  # member_id for wishlist check
+    books = pagination.paginate(db, books_query, params, [(order_clause, 'sort_key'), ('b.book_id', 'book_id')], **page_args())
     result = [
         {
             'book_id': book['book_id'],
@@ -848,15 +1202,14 @@ def api_search_books():
         }
         for book in books
     ]
-    return jsonify(result)
+    return {'books': result, 'next': books.next_cursor, 'prev': books.prev_cursor}
 
 @app.route('/api/toggle_wishlist', methods=['POST'])
 def api_toggle_wishlist():
     if 'mob_no' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'}), 401
     db = get_db()
-    user_data = db.execute("SELECT * FROM member_db WHERE mob_no = ?", (session['mob_no'],)).fetchone()
-    member_id = user_data['member_id']
+    member_id = get_current_member()['member_id']
     book_id = request.form.get('book_id')
     if not book_id:
         return jsonify({'success': False, 'error': 'No book_id provided'}), 400
@@ -893,9 +1246,10 @@ def reset_password():
     db = get_db()
     user = db.execute('SELECT * FROM member_db WHERE mob_no = ? AND email_id = ?', (mob_no, email_id)).fetchone()
     if user:
-        hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+        hashed = password_service.hash(new_password)
         db.execute('UPDATE member_db SET password = ? WHERE mob_no = ? AND email_id = ?', (hashed, mob_no, email_id))
         db.commit()
+        members_cache.invalidate(mob_no=mob_no)
         return render_template('login_register.html', error=None, success='Password reset successful. Please log in.')
     else:
         return render_template('reset_password.html', mob_no=mob_no, email_id=email_id, error='User not found or info incorrect.')
@@ -903,19 +1257,11 @@ def reset_password():
 @app.route('/api/search_suggestions')
 def search_suggestions():
     q = request.args.get('q', '').strip()
-    db = get_db()
-    suggestions = set()
-    if q:
-        # Titles
-        for row in db.execute("SELECT title FROM book_db WHERE title LIKE ? LIMIT 5", (f"%{q}%",)):
-            suggestions.add(row['title'])
-        # Authors
-        for row in db.execute("SELECT author_name FROM book_db WHERE author_name LIKE ? LIMIT 5", (f"%{q}%",)):
-            suggestions.add(row['author_name'])
-        # Categories
-        for row in db.execute("SELECT category FROM book_db WHERE category LIKE ? LIMIT 5", (f"%{q}%",)):
-            suggestions.add(row['category'])
-    return jsonify(list(suggestions))
+    if not q:
+        return jsonify([])
+    # Served from this worker's in-memory index; no SQL once it is built
+    index = suggestions.get_index(lambda: get_pool().connect(), app.config['SUGGESTION_INDEX_TTL'])
+    return jsonify(index.suggest(q, limit=10))
 
 @app.route('/admin/book_reservations/<int:book_id>')
 def admin_book_reservations(book_id):
@@ -947,10 +1293,60 @@ def admin_all_reservations():
     ''').fetchall()
     return render_template('admin_all_reservations.html', reservations=reservations)
 
+@app.route('/admin/pool_stats')
+def pool_stats():
+    """Connection pool hit/miss counters for this worker."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(get_pool().stats())
+
+@app.route('/admin/event_hub_stats')
+def event_hub_stats():
+    """Open streams and published events of this worker's live event hub."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(live_events.stats())
+
+@app.route('/admin/activity_log_stats')
+def activity_log_stats():
+    """Queue depth and written/dropped counters of this worker's activity writer."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(activity_log.stats())
+
+@app.route('/admin/sql_stats')
+def sql_stats():
+    """Per-endpoint SQL counts and times of this worker, with each endpoint's costliest statements."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(profiler.stats())
+
+@app.route('/admin/metrics')
+def metrics():
+    """
+    This worker's request latency histograms and SQL counters in Prometheus
+    text format, for an admin session or a scraper sending METRICS_TOKEN.
+    """
+    if not profiler.scrape_allowed(request.headers.get('Authorization')) and get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return app.response_class(profiler.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/compression_stats')
+def compression_stats():
+    """Responses compressed by this worker and the bytes saved."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(compressor.stats())
+
+@app.route('/admin/password_stats')
+def password_stats():
+    """Work factor and completed/refused/rehashed counters of this worker's password pool."""
+    if get_user_role() != 'admin':
+        return redirect(url_for('user_dashboard'))
+    return jsonify(password_service.stats())
+
 def get_pending_reservation_count():
-    db = get_db()
-    row = db.execute("SELECT COUNT(*) as cnt FROM reservations WHERE status = 'active'").fetchone()
-    return row['cnt'] if row else 0
+    return dashboard.get(get_db())['pending_reservations']
 
 import os
 
@@ -0,0 +1,263 @@
+"""
+Static asset build and lookup.
+`python assets.py` minifies the CSS and JavaScript in static/ and joins the
+files a page loads together into one bundle per page (BUNDLES). It re-encodes
+JPEGs when that saves enough. Each result is written to static/dist/ under a
+name carrying a hash of its content, next to .gz and, when the brotli module
+is installed, .br copies for /assets/ to send as they are.
+static/dist/manifest.json maps every logical name to its built file.
+
+Templates ask for assets by logical name through asset_url(). Changed content
+always gets a new name, so built files are served as immutable for a year and
+a repeat page load makes no static requests. Without a build, or for entries
+whose sources changed after it, asset_url() falls back to the plain files in
+static/ and bundles are joined on request, so editing a file needs no rebuild
+in development. The build keeps the files of the previous manifest, for pages
+rendered before a deploy, and deletes anything older.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # .br copies are skipped; every browser takes gzip
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(ROOT, 'static')
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Files each page loads together, in the order it loaded them
+BUNDLES = {
+    'user_dashboard.css': ['dashboard.css', 'chatbot.css'],
+    'user_dashboard.js': ['search_books.js', 'wishlist.js', 'autocomplete.js', 'show_more_books.js'],
+    'profile.css': ['dashboard.css', 'style.css'],
+    'report_page.css': ['admin.css', 'admin2.css'],
+    'manage_fine.css': ['admin.css', 'fine.css'],
+    'manage_return.css': ['admin.css', 'return.css'],
+}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt'}
+MIN_SAVING = 0.9  # a compressed or re-encoded copy is kept only below this share of the original
+JPEG_QUALITY = 82
+
+log = logging.getLogger(__name__)
+
+_BUILT_RE = re.compile(r'[\w.-]+\.[0-9a-f]{10}\.\w+\Z')
+# Strings and unquoted url(...) are copied as they are; comments are dropped
+_CSS_VERBATIM_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)"']*\))|/\*.*?\*/""", re.S | re.I)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(text):
+    """
+    Drops comments and the whitespace CSS does not need, leaving strings and
+    url(...) untouched. Whitespace before ':' is kept (`a :hover`).
+    """
+    verbatim = []
+
+    def hold(match):
+        if match.group(1) is None:
+            return ' '
+        verbatim.append(match.group(1))
+        return f'\0{len(verbatim) - 1}\0'
+
+    text = _CSS_SPACE_RE.sub(' ', _CSS_VERBATIM_RE.sub(hold, text))
+    text = _CSS_PUNCT_RE.sub(r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: verbatim[int(m.group(1))], text) + '\n'
+
+
+def minify_js(text):
+    """
+    Drops indentation, blank lines and whole-line comments. Line breaks are
+    kept, so automatic semicolon insertion is unaffected, and so are the lines
+    of multi-line template literals. Comments after code are left alone:
+    telling them from a regex or string needs a real parser.
+    """
+    lines = []
+    in_template = in_comment = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        elif stripped.startswith('/*'):
+            in_comment = '*/' not in stripped[2:]
+            continue
+        elif stripped and not stripped.startswith('//'):
+            lines.append(stripped)
+        if (line.count('`') - line.count('\\`')) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def _read_source(name, static_folder):
+    with open(os.path.join(static_folder, name), 'rb') as f:
+        return f.read()
+
+
+def join_sources(name, static_folder=STATIC):
+    """A bundle's sources joined as they are, for serving unbuilt in development."""
+    separator = b'\n;\n' if name.endswith('.js') else b'\n'
+    return separator.join(_read_source(source, static_folder) for source in BUNDLES[name])
+
+
+def _content(name, sources, static_folder):
+    """The built bytes of a logical asset made from `sources`."""
+    ext = os.path.splitext(name)[1]
+    if ext == '.css':
+        return ''.join(minify_css(_read_source(s, static_folder).decode('utf-8')) for s in sources).encode('utf-8')
+    if ext == '.js':
+        return '\n;\n'.join(minify_js(_read_source(s, static_folder).decode('utf-8')) for s in sources).encode('utf-8')
+    data = _read_source(sources[0], static_folder)
+    if ext in ('.jpg', '.jpeg'):
+        with Image.open(io.BytesIO(data)) as image:
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        if out.tell() < len(data) * MIN_SAVING:
+            return out.getvalue()
+    return data
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)  # mkstemp makes it private to this user
+    os.replace(tmp, path)
+
+
+def build(static_folder=STATIC):
+    """Builds every asset into static/dist and writes the manifest. Returns the manifest."""
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    assets = {name: [name] for name in sorted(os.listdir(static_folder))
+              if os.path.isfile(os.path.join(static_folder, name)) and not name.startswith('.')}
+    assets.update(BUNDLES)
+    manifest = {}
+    for name, sources in assets.items():
+        data = _content(name, sources, static_folder)
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+        entry = manifest[name] = {'file': filename, 'sources': sources, 'size': len(data), 'encodings': {}}
+        path = os.path.join(dist, filename)
+        if not os.path.exists(path):
+            _write(path, data)
+        if ext not in COMPRESSIBLE:
+            continue
+        compressors = {'gzip': ('.gz', lambda d: gzip.compress(d, 9, mtime=0))}
+        if brotli is not None:
+            compressors['br'] = ('.br', lambda d: brotli.compress(d, quality=11))
+        for encoding, (suffix, compress) in compressors.items():
+            if not os.path.exists(path + suffix):
+                compressed = compress(data)
+                if len(compressed) >= len(data) * MIN_SAVING:
+                    continue
+                _write(path + suffix, compressed)
+            entry['encodings'][encoding] = os.path.getsize(path + suffix)
+
+    previous = _load(os.path.join(dist, MANIFEST))
+    keep = {MANIFEST} | _files(manifest) | _files(previous)
+    for filename in os.listdir(dist):
+        if filename not in keep:
+            os.remove(os.path.join(dist, filename))
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def _files(manifest):
+    files = set()
+    for entry in manifest.values():
+        files.add(entry['file'])
+        files.update(entry['file'] + ('.br' if encoding == 'br' else '.gz') for encoding in entry['encodings'])
+    return files
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class Assets:
+    """This worker's view of the manifest, read once at startup."""
+
+    def __init__(self, static_folder=STATIC):
+        self.static_folder = static_folder
+        self.dist = os.path.join(static_folder, DIST)
+        path = os.path.join(self.dist, MANIFEST)
+        manifest = _load(path)
+        built_at = os.path.getmtime(path) if manifest else 0
+        self.entries = {}
+        stale = []
+        for name, entry in manifest.items():
+            try:
+                changed = any(os.path.getmtime(os.path.join(static_folder, s)) > built_at for s in entry['sources'])
+            except OSError:
+                changed = True
+            if changed:
+                stale.append(name)
+            else:
+                self.entries[name] = entry
+        if stale:
+            log.warning('assets changed since the last build, served unbuilt: %s', ', '.join(stale))
+        self.by_file = {entry['file']: entry for entry in self.entries.values()}
+
+    def built(self, name):
+        """The built file name of a logical asset, or None."""
+        entry = self.entries.get(name)
+        return entry['file'] if entry else None
+
+    def encodings(self, filename):
+        """
+        Precompressed encodings available for a built file, or None if it is
+        not one. Files a previous build left in dist/ count, as found on disk.
+        """
+        entry = self.by_file.get(filename)
+        if entry:
+            return entry['encodings']
+        if not _BUILT_RE.match(filename) or not os.path.isfile(os.path.join(self.dist, filename)):
+            return None
+        path = os.path.join(self.dist, filename)
+        return {encoding: os.path.getsize(path + suffix)
+                for encoding, suffix in (('br', '.br'), ('gzip', '.gz')) if os.path.isfile(path + suffix)}
+
+
+def mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds fingerprinted, precompressed static assets.')
+    parser.add_argument('--static', default=STATIC, help='static folder to build from')
+    args = parser.parse_args()
+    manifest = build(args.static)
+    files = [entry for name, entry in manifest.items() if name not in BUNDLES]
+    original = sum(os.path.getsize(os.path.join(args.static, entry['sources'][0])) for entry in files)
+    built = sum(entry['size'] for entry in files)
+    compressed = sum(min([entry['size'], *entry['encodings'].values()]) for entry in files)
+    print(f"{len(files)} files and {len(BUNDLES)} bundles in {os.path.join(args.static, DIST)}: "
+          f"{original / 1000:.1f} kB of sources, {built / 1000:.1f} kB built, {compressed / 1000:.1f} kB compressed"
+          f"{'' if brotli else ' (no brotli module: gzip only)'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
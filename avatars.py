@@ -0,0 +1,222 @@
+"""
+Profile picture processing.
+An upload is copied to disk CHUNK bytes at a time while it is hashed, so a
+multi-megabyte phone photo is never held in memory whole. It is then decoded
+once, at reduced scale where the format allows, into square thumbnails of
+each of SIZES. The original is not kept.
+
+Thumbnails are named after the upload's SHA-256 as <key>-<size>.<ext>, and
+member_db.profile_pic holds <key>.<ext>. A name therefore always refers to
+the same bytes and can be served with Cache-Control: immutable, and a member
+who uploads a new picture gets new names instead of stale cached copies.
+Files of a replaced picture are deleted once no member refers to them.
+
+Pictures saved before this as a raw '<mob_no>_<name>' upload are served as
+they are until `python avatars.py` converts them. The same command deletes
+any file in the folder that no member refers to.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageOps, features
+
+DEFAULTS = {
+    'AVATAR_MAX_BYTES': 10 * 1024 * 1024,   # larger uploads are refused
+    'AVATAR_MAX_PIXELS': 40000000,          # larger images are refused before they are decoded
+    'AVATAR_FORMAT': 'webp',                # 'webp', or 'jpeg'; webp needs Pillow built with libwebp
+    'AVATAR_QUALITY': 82,
+}
+
+SIZES = (256, 64)  # largest first: each thumbnail is resized from the one before
+CHUNK = 64 * 1024
+INPUT_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+GC_GRACE = 3600  # seconds an unreferenced file is spared, for uploads whose row is not committed yet
+KEEP = {'default.png'}
+
+NAME_RE = re.compile(r'([0-9a-f]{16})\.(webp|jpg)\Z')
+VARIANT_RE = re.compile(r'[0-9a-f]{16}-\d+\.(webp|jpg)\Z')
+
+
+class AvatarError(ValueError):
+    """An upload that is too large or is not a readable picture."""
+
+
+def is_processed(profile_pic):
+    return bool(profile_pic) and NAME_RE.match(profile_pic) is not None
+
+
+def variant(profile_pic, size):
+    """File name of `profile_pic` at `size` pixels; a picture stored before processing is its own only file."""
+    match = NAME_RE.match(profile_pic)
+    if match is None:
+        return os.path.basename(profile_pic)
+    return f'{match.group(1)}-{size}.{match.group(2)}'
+
+
+def files(profile_pic):
+    """Every file in the folder that belongs to `profile_pic`."""
+    if is_processed(profile_pic):
+        return [variant(profile_pic, size) for size in SIZES]
+    return [os.path.basename(profile_pic)]
+
+
+def is_immutable(filename):
+    return VARIANT_RE.match(filename) is not None
+
+
+def _output(settings):
+    """(Pillow format, extension) thumbnails are written in."""
+    if settings['AVATAR_FORMAT'] == 'webp' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def save_upload(stream, folder, settings):
+    """
+    Copies a file-like upload into `folder`, makes its thumbnails and returns
+    the value for member_db.profile_pic. Raises AvatarError for uploads over
+    AVATAR_MAX_BYTES or that are not a picture.
+    """
+    s = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+    fd, path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > s['AVATAR_MAX_BYTES']:
+                    raise AvatarError(f"The picture is larger than {s['AVATAR_MAX_BYTES'] // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise AvatarError('The picture is empty.')
+        return make_thumbnails(path, digest.hexdigest()[:16], folder, s)
+    finally:
+        os.remove(path)
+
+
+def make_thumbnails(path, key, folder, settings):
+    """Writes the thumbnails of the picture at `path` under `key`, unless they exist. Returns <key>.<ext>."""
+    pil_format, extension = _output(settings)
+    name = f'{key}.{extension}'
+    if all(os.path.exists(os.path.join(folder, filename)) for filename in files(name)):
+        return name  # the same picture was uploaded before
+    try:
+        with Image.open(path) as image:
+            if image.format not in INPUT_FORMATS:
+                raise AvatarError('Only JPEG, PNG, GIF and WebP pictures can be used.')
+            if image.width * image.height > settings['AVATAR_MAX_PIXELS']:
+                raise AvatarError('The picture has too many pixels.')
+            # JPEGs are decoded at 1/2 to 1/8 scale when that still covers twice the largest thumbnail
+            image.draft('RGB', (SIZES[0] * 2, SIZES[0] * 2))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+                image = image.convert('RGBA')
+                if pil_format == 'JPEG':
+                    image = Image.alpha_composite(Image.new('RGBA', image.size, 'white'), image)
+            image = image.convert('RGBA' if image.mode == 'RGBA' and pil_format == 'WEBP' else 'RGB')
+            for size in SIZES:
+                image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+                _write(image, os.path.join(folder, variant(name, size)), pil_format, settings['AVATAR_QUALITY'])
+    except (OSError, Image.DecompressionBombError) as e:
+        raise AvatarError('The file is not a picture that can be read.') from e
+    return name
+
+
+def _write(image, path, pil_format, quality):
+    # Written aside and renamed, so a name never refers to a half-written file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.save(out, pil_format, quality=quality, optimize=True)
+        os.chmod(tmp, 0o644)  # mkstemp makes it private to this user
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def release(conn, folder, profile_pic):
+    """Deletes the files of a replaced picture unless another member still has it. Returns how many went."""
+    if not profile_pic or conn.execute('SELECT 1 FROM member_db WHERE profile_pic = ?', (profile_pic,)).fetchone():
+        return 0
+    removed = 0
+    for filename in files(profile_pic):
+        if filename in KEEP:
+            continue
+        try:
+            os.remove(os.path.join(folder, filename))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def backfill(conn, folder, settings):
+    """Makes thumbnails for pictures stored before processing. Returns (converted, failed)."""
+    converted, failed = 0, []
+    for (profile_pic,) in conn.execute('''
+        SELECT DISTINCT profile_pic FROM member_db WHERE profile_pic IS NOT NULL AND profile_pic != ''
+    ''').fetchall():
+        if is_processed(profile_pic):
+            continue
+        try:
+            with open(os.path.join(folder, os.path.basename(profile_pic)), 'rb') as f:
+                name = save_upload(f, folder, settings)
+        except (OSError, AvatarError) as e:
+            failed.append(f'{profile_pic}: {e}')
+            continue
+        with conn:
+            conn.execute('UPDATE member_db SET profile_pic = ? WHERE profile_pic = ?', (name, profile_pic))
+        converted += 1
+    return converted, failed
+
+
+def collect_garbage(conn, folder, grace=GC_GRACE):
+    """Deletes files no member refers to that are older than `grace` seconds. Returns how many went."""
+    referenced = set(KEEP)
+    for (profile_pic,) in conn.execute('SELECT DISTINCT profile_pic FROM member_db WHERE profile_pic IS NOT NULL'):
+        referenced.update(files(profile_pic))
+    cutoff = time.time() - grace
+    removed = 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name in referenced or not entry.is_file() or entry.stat().st_mtime > cutoff:
+                continue
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Makes thumbnails for unprocessed profile pictures and deletes unused files.')
+    parser.add_argument('db_path', nargs='?', default='library.db')
+    parser.add_argument('--folder', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'profile_pics'))
+    parser.add_argument('--no-gc', action='store_true', help='keep files no member refers to')
+    args = parser.parse_args()
+
+    settings = {key: type(default)(os.environ.get(key, default)) for key, default in DEFAULTS.items()}
+    conn = sqlite3.connect(args.db_path)
+    try:
+        converted, failed = backfill(conn, args.folder, settings)
+        removed = 0 if args.no_gc else collect_garbage(conn, args.folder)
+    finally:
+        conn.close()
+    for failure in failed:
+        print(f"failed: {failure}")
+    print(f"{converted} pictures converted, {len(failed)} failed, {removed} unused files deleted")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
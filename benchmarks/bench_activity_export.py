@@ -0,0 +1,97 @@
+"""
+Peak memory of a streamed activity-log export. Seeds user_activity with
+--rows rows, downloads the whole export through the Flask app and fails if the
+process's peak RSS grew by more than --max-rss-mb while doing so.
+
+    python benchmarks/bench_activity_export.py --rows 5000000 --format jsonl
+"""
+import argparse
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+import app as app_module
+
+
+def add_activity(path, rows, members=2000):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO user_activity (user_id, action, book_id, created_at)
+        SELECT 6 + i % (? - 6),
+               CASE i % 3 WHEN 0 THEN 'add_wishlist' WHEN 1 THEN 'remove_wishlist' ELSE 'reserve_book' END,
+               1 + i % 5000,
+               datetime('now', '-' || (i % 31536000) || ' seconds')
+        FROM n
+    """, (rows, members))
+    conn.commit()
+    conn.close()
+
+
+def reset_peak_rss():
+    """Resets VmHWM on Linux so the next reading covers only what follows."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--max-rss-mb', type=float, default=128)
+    args = parser.parse_args()
+
+    app = app_module.app
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        logins = seed(db_path)
+        add_activity(db_path, args.rows)
+        app.config['LOCAL_DATABASE'] = db_path
+        client = app.test_client()
+        client.post('/login', data={'mob_no': logins['admin'], 'password': logins['password']})
+
+        if not reset_peak_rss():
+            print('note: cannot reset peak RSS here, so the reading includes seeding')
+        before = peak_rss_mb()
+        start = time.perf_counter()
+        response = client.get(f'/admin/export_activity_log?format={args.format}', buffered=False)
+        lines = size = 0
+        for chunk in response.response:
+            lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+            size += len(chunk)
+        response.close()
+        elapsed = time.perf_counter() - start
+        growth = peak_rss_mb() - before
+
+    print(f"{args.format}: {lines} lines, {size / 2**20:.0f} MiB in {elapsed:.1f}s "
+          f"({lines / elapsed:.0f} rows/s), peak RSS +{growth:.1f} MiB")
+    if growth > args.max_rss_mb:
+        print(f"FAIL: peak RSS grew by more than {args.max_rss_mb} MiB")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
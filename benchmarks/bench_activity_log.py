@@ -0,0 +1,51 @@
+"""
+Latency of a request that logs user activity, with the activity row written
+inside the request (ACTIVITY_LOG_ASYNC=0) versus queued for the writer thread.
+
+    python benchmarks/bench_activity_log.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+import app as app_module
+
+
+def run(app, logins, asynchronous, requests):
+    writer = app_module.activity_log
+    writer.settings['ACTIVITY_LOG_ASYNC'] = asynchronous
+    client = app.test_client()
+    client.post('/login', data={'mob_no': logins['user'], 'password': logins['password']})
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        client.post('/user_dashboard', data={'toggle_wishlist': '1', 'book_id': str(1 + i % 50)})
+        timings.append(time.perf_counter() - start)
+    writer.close()  # waits for the batch the thread is holding
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = app_module.app
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        logins = seed(db_path)
+        app.config['LOCAL_DATABASE'] = db_path
+        for label, asynchronous in [('write in request', 0), ('writer thread', 1)]:
+            p50, p99 = run(app, logins, asynchronous, args.requests)
+            print(f"{label:<18} p50 {p50:6.2f} ms   p99 {p99:6.2f} ms   {app_module.activity_log.stats()}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
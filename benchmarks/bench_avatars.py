@@ -0,0 +1,78 @@
+"""
+Processing time and output size of a profile picture upload: a phone-sized
+JPEG through avatars.save_upload against decoding it at full size, as
+resizing without draft() would. Also checks that uploading the same picture
+again gives the same name without rewriting the thumbnails, and that peak
+Python memory stays far below the upload's size.
+
+    python benchmarks/bench_avatars.py [--width 4032] [--height 3024]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fixtures  # noqa: F401 -- puts the app on sys.path
+
+from PIL import Image, ImageFilter, ImageOps
+
+import avatars
+
+
+def photo(width, height):
+    """A noisy JPEG that compresses about as badly as a real photo."""
+    image = Image.effect_noise((width // 4, height // 4), 64).resize((width, height)).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    Image.merge('RGB', (image, image.rotate(90, expand=False), image)).save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    args = parser.parse_args()
+
+    data = photo(args.width, args.height)
+    failures = []
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        name = avatars.save_upload(io.BytesIO(data), folder, {})
+        elapsed = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as other:
+            tracemalloc.start()
+            avatars.save_upload(io.BytesIO(data), other, {})
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        sizes = {size: os.path.getsize(os.path.join(folder, avatars.variant(name, size))) for size in avatars.SIZES}
+
+        start = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as image:
+            ImageOps.fit(image.convert('RGB'), (avatars.SIZES[0],) * 2, Image.Resampling.LANCZOS)
+        full = time.perf_counter() - start
+
+        print(f"{args.width}x{args.height} JPEG, {len(data) / 1e6:.1f} MB")
+        print(f"save_upload {elapsed * 1000:7.1f} ms (full-size decode and resize alone {full * 1000:.1f} ms), "
+              f"peak traced memory {peak / 1e6:.2f} MB")
+        print('thumbnails: ' + ', '.join(f'{size}px {nbytes / 1000:.1f} kB' for size, nbytes in sizes.items()))
+
+        mtimes = {f: os.stat(os.path.join(folder, f)).st_mtime_ns for f in avatars.files(name)}
+        if avatars.save_upload(io.BytesIO(data), folder, {}) != name:
+            failures.append('the same picture got a different name')
+        if {f: os.stat(os.path.join(folder, f)).st_mtime_ns for f in avatars.files(name)} != mtimes:
+            failures.append('uploading the same picture rewrote its thumbnails')
+        if peak > len(data) / 2:
+            failures.append('the upload was held in memory')
+        if sorted(os.listdir(folder)) != sorted(avatars.files(name)):
+            failures.append(f'unexpected files left behind: {sorted(os.listdir(folder))}')
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
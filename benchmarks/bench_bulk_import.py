@@ -0,0 +1,145 @@
+"""
+Times bulk_import.py on a seeded database and checks what it leaves behind.
+Books come from a generated CSV in which some rows repeat earlier ones or
+books already in the catalog with different case and spacing, and some are
+invalid; members from a generated JSONL file with repeated mobile numbers.
+Afterwards no two books may share a dedupe key, stock must add up, the search
+index must cover every book, and every index and trigger dropped for the
+import must be back.
+
+    python benchmarks/bench_bulk_import.py [--books 200000] [--members 2000] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+from fixtures import ROOT, seed
+
+import bulk_import
+
+BOOK_FIELDS = ['title', 'author_name', 'category', 'publisher', 'year', 'edition', 'total_stock']
+
+
+def book_csv(path, count, catalog, rng):
+    """Writes `count` rows; returns the total_stock the valid ones carry."""
+    stock = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, BOOK_FIELDS)
+        writer.writeheader()
+        for i in range(count):
+            roll = rng.random()
+            if roll < 0.05 and catalog:
+                title, author = rng.choice(catalog)
+                title, author = f'  {title.upper()} ', author.lower()
+            elif roll < 0.10 and i:
+                n = rng.randrange(i)
+                title, author = f'imported   book {n}', f'WRITER {n % 5000}'
+            else:
+                title, author = f'Imported Book {i}', f'Writer {i % 5000}'
+            copies = rng.randint(1, 5)
+            if roll > 0.99:
+                title = ''  # invalid: no title
+            elif roll > 0.98:
+                copies = 'several'
+            else:
+                stock += copies
+            writer.writerow({'title': title, 'author_name': author, 'category': rng.choice(['Fiction', 'History', 'Science']),
+                             'publisher': 'Press', 'year': str(rng.randint(1950, 2024)), 'edition': '1st', 'total_stock': copies})
+    return stock
+
+
+def member_jsonl(path, count, rng):
+    with open(path, 'w') as f:
+        for i in range(count):
+            mob_no = f'8{rng.randrange(count * 9 // 10):09d}' if rng.random() < 0.1 else f'8{i:09d}'
+            f.write(json.dumps({'first_name': f'Imported{i}', 'last_name': 'Member', 'mob_no': mob_no,
+                                'email_id': f'i{i}@example.com', 'password': f'secret{i}'}) + '\n')
+
+
+def check(conn, expected_stock, stock_before, failures):
+    dupes = conn.execute('''
+        SELECT COUNT(*) FROM (SELECT 1 FROM book_db
+                              GROUP BY lower(trim(title)), lower(trim(COALESCE(author_name, ''))) HAVING COUNT(*) > 1)
+    ''').fetchone()[0]
+    if dupes:
+        failures.append(f'{dupes} dedupe keys have more than one book')
+    stock = conn.execute('SELECT SUM(total_stock) FROM book_db').fetchone()[0]
+    if stock != stock_before + expected_stock:
+        failures.append(f'total stock is {stock}, expected {stock_before + expected_stock}')
+    books, indexed = conn.execute('SELECT (SELECT COUNT(*) FROM book_db), (SELECT COUNT(*) FROM book_search)').fetchone()
+    if books != indexed:
+        failures.append(f'{books} books but {indexed} rows in the search index')
+    names = {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+    missing = [name for names_ in bulk_import.DEFERRED.values() for name in names_ if name not in names]
+    if missing or bulk_import.pending_restore(conn):
+        failures.append(f'not restored: {missing or bulk_import.pending_restore(conn)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--bcrypt-rounds', type=int, default=bulk_import.DEFAULTS['IMPORT_BCRYPT_ROUNDS'])
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'import.db')
+        seed(db_path)
+        conn = sqlite3.connect(db_path)
+        catalog = conn.execute('SELECT title, author_name FROM book_db').fetchall()
+        stock_before = conn.execute('SELECT SUM(total_stock) FROM book_db').fetchone()[0]
+
+        books_path = os.path.join(tmp, 'books.csv')
+        expected_stock = book_csv(books_path, args.books, catalog, rng)
+        for label, defer_indexes in (('indexes deferred', True), ('indexes kept', False)):
+            work = os.path.join(tmp, f'work-{defer_indexes}.db')
+            conn.execute('VACUUM INTO ?', (work,))
+            target = sqlite3.connect(work)
+            with open(books_path, 'rb') as f:
+                report = bulk_import.run_import(target, 'books', f, 'csv', {}, defer_indexes=defer_indexes)
+            print(f"books, {label}: {report.summary()}")
+            check(target, expected_stock, stock_before, failures)
+            target.close()
+
+        # Of two imports deferring indexes, the second finds them claimed
+        other = sqlite3.connect(db_path)
+        bulk_import.defer(conn, bulk_import.DEFERRED['books'])
+        try:
+            bulk_import.defer(other, bulk_import.DEFERRED['members'])
+            failures.append('a second import deferred indexes while the first held them')
+        except bulk_import.BulkImportError:
+            pass
+        if bulk_import.restore_deferred(conn) != bulk_import.DEFERRED['books']:
+            failures.append('restore did not recreate exactly what the first import dropped')
+        other.close()
+
+        members_path = os.path.join(tmp, 'members.jsonl')
+        member_jsonl(members_path, args.members, rng)
+        settings = {'IMPORT_WORKERS': args.workers, 'IMPORT_BCRYPT_ROUNDS': args.bcrypt_rounds}
+        with open(members_path, 'rb') as f:
+            report = bulk_import.run_import(conn, 'members', f, 'jsonl', settings)
+        print(f"members, {args.workers or os.cpu_count()} worker(s): {report.summary()}")
+        distinct = len({json.loads(line)['mob_no'] for line in open(members_path)})
+        if report.inserted != distinct:
+            failures.append(f'{report.inserted} members inserted, expected {distinct}')
+        with open(members_path, 'rb') as f:
+            again = bulk_import.run_import(conn, 'members', f, 'jsonl', settings)
+        if again.inserted:
+            failures.append(f'a second member import inserted {again.inserted}')
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Times chatbot keyword matching: the LIKE query get_chatbot_response used to
+run per message against the in-memory matcher, with the seeded responses plus
+--keywords generated ones. Also checks that the longest keyword wins and that
+an edit made through another connection is picked up after the reload
+interval and not before.
+
+    python benchmarks/bench_chatbot.py [--keywords 1000] [--repeat 2000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+import chatbot
+
+OLD_QUERY = "SELECT response FROM chatbot_responses WHERE ? LIKE '%' || keyword || '%' OR keyword LIKE '%' || ? || '%'"
+
+MESSAGES = ['what are your hours', 'good morning! hi', 'how do i renew a book', 'thank you so much',
+            'self', 'is there a fine for late returns', 'quantum entanglement', 'topic 377 please']
+
+# message -> keyword whose response must win
+EXPECTED = {'good morning! hi': 'good morning', 'self': 'self development', 'thank you very much': 'thank you'}
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(MESSAGES[i % len(MESSAGES)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--keywords', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chatbot.db')
+        seed(db_path, issues=100)
+        conn = sqlite3.connect(db_path)
+        with open(os.path.join(ROOT, 'schema.sql')) as f:
+            seed_rows = f.read().split('INSERT OR IGNORE INTO chatbot_responses')[1]
+        conn.execute('INSERT OR IGNORE INTO chatbot_responses' + seed_rows.split(';')[0])
+        conn.executemany('INSERT INTO chatbot_responses (keyword, response) VALUES (?, ?)',
+                         [(f'topic {i}', f'About topic {i}.') for i in range(args.keywords)])
+        conn.commit()
+        responses = dict(conn.execute('SELECT keyword, response FROM chatbot_responses'))
+
+        matcher = chatbot.KeywordMatcher(lambda: sqlite3.connect(db_path, check_same_thread=False),
+                                         {'CHATBOT_RELOAD_INTERVAL': 0.2})
+        for message, keyword in EXPECTED.items():
+            if matcher.match(message) != responses[keyword]:
+                failures.append(f'{message!r} did not get the response for {keyword!r}')
+
+        old = per_call_us(lambda message: conn.execute(OLD_QUERY, (message, message)).fetchone(), args.repeat)
+        new = per_call_us(matcher.match, args.repeat)
+        print(f"{len(responses)} keywords: LIKE query {old:8.1f} us/message, matcher {new:6.1f} us/message")
+
+        loads = matcher.loads
+        conn.execute("UPDATE chatbot_responses SET response = 'Open 24 hours.' WHERE keyword = 'hours'")
+        conn.commit()
+        if matcher.match('hours') != responses['hours'] or matcher.loads != loads:
+            failures.append('the matcher reloaded before its interval was up')
+        time.sleep(0.25)
+        if matcher.match('hours') != 'Open 24 hours.':
+            failures.append('an edited response was not picked up after the reload interval')
+        conn.execute("INSERT INTO notifications (user_id, message) VALUES (1, 'unrelated write')")
+        conn.commit()
+        loads = matcher.loads
+        time.sleep(0.25)
+        matcher.match('hours')
+        if matcher.loads != loads:
+            failures.append('a write to another table reloaded the responses')
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
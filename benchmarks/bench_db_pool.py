@@ -0,0 +1,55 @@
+"""
+Requests/sec through the Flask app with pooled connections versus opening a
+connection per request (DB_POOL_SIZE=0).
+
+    python benchmarks/bench_db_pool.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+import app as app_module
+import db_pool
+
+ROUTES = ['/notifications', '/my_reservations', '/api/search_suggestions?q=pow']
+
+
+def run(app, logins, pool_size, requests):
+    app.config['DB_POOL_SIZE'] = pool_size
+    for pool in db_pool._pools.values():
+        pool.close_all()
+    db_pool._pools.clear()
+    client = app.test_client()
+    client.post('/login', data={'mob_no': logins['user'], 'password': logins['password']})
+    for url in ROUTES:
+        client.get(url)  # warm up templates and the suggestion index
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(ROUTES[i % len(ROUTES)])
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = app_module.app
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        logins = seed(db_path)
+        app.config['LOCAL_DATABASE'] = db_path
+        for label, pool_size in [('connect per request', 0), ('pooled', 8)]:
+            rps = run(app, logins, pool_size, args.requests)
+            stats = db_pool.get_pool(db_path, app.config).stats()
+            print(f"{label:<22}{rps:>10.0f} req/s   pool {stats}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Login throughput under concurrent load, and what a login burst does to the
+other requests of the same worker. Logins and suggestion lookups run side by
+side against gunicorn, twice: once with as many bcrypt threads as logging-in
+clients, which is what hashing inline on every request thread amounted to,
+and once with the default pool of one thread per core. A final run lowers
+BCRYPT_ROUNDS and checks that the members who signed in were rehashed at the
+new cost and can still sign in.
+
+    python benchmarks/generate_data.py /tmp/load
+    python benchmarks/bench_login.py /tmp/load [--logins 16] [--readers 4] [--duration 10]
+
+Each run works on its own copy of the database.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from load_test import Client, start_server, summarize
+
+from generate_data import ADMINS, WORDS, mob_no
+
+
+def run(data_dir, port, settings, logins, readers, duration, users):
+    """Logs in with `logins` clients while `readers` clients fetch suggestions. Returns their summaries."""
+    server = start_server(data_dir, port, 1, logins + readers + 4, settings)
+    results = {'login': ([], [0]), 'search_suggestions': ([], [0])}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+    signed_in = set()
+
+    def worker(kind, index):
+        rng = random.Random(index)
+        client = Client('127.0.0.1', port)
+        if kind == 'search_suggestions':
+            client.login(mob_no(ADMINS + 5))
+        mine, failed = [], 0
+        while time.monotonic() < stop_at:
+            began = time.perf_counter()
+            if kind == 'login':
+                client.cookie = None
+                mob = mob_no(ADMINS + 5 + rng.randrange(users))
+                status, expected = client.login(mob), 302
+                if status == expected:
+                    with lock:
+                        signed_in.add(mob)
+            else:
+                status, expected = client.request('GET', f'/api/search_suggestions?q={rng.choice(WORDS)[:3]}'), 200
+            mine.append((time.perf_counter() - began) * 1000)
+            failed += status != expected
+        with lock:
+            results[kind][0].extend(mine)
+            results[kind][1][0] += failed
+
+    threads = [threading.Thread(target=worker, args=('login', i)) for i in range(logins)]
+    threads += [threading.Thread(target=worker, args=('search_suggestions', logins + i)) for i in range(readers)]
+    began = time.monotonic()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    seconds = time.monotonic() - began
+    return {kind: summarize(latencies, errors[0], seconds) for kind, (latencies, errors) in results.items()}, signed_in
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', help='directory holding a library.db from generate_data.py')
+    parser.add_argument('--logins', type=int, default=16, help='clients logging in concurrently')
+    parser.add_argument('--readers', type=int, default=4, help='clients fetching suggestions meanwhile')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    source = os.path.join(args.data_dir, 'library.db')
+    with sqlite3.connect(source) as conn:
+        rounds = int(conn.execute('SELECT substr(password, 5, 2) FROM member_db LIMIT 1').fetchone()[0])
+        users = min(conn.execute('SELECT COUNT(*) FROM member_db').fetchone()[0] - ADMINS - 5, 200)
+    failures = []
+    print(f"{args.logins} clients logging in, {args.readers} fetching suggestions, {args.duration:g}s, cost {rounds}")
+    print(f"{'bcrypt threads':<16}{'logins/s':>9}{'login p95':>11}{'suggest/s':>11}{'suggest p50':>13}{'suggest p95':>13}")
+    for label, settings in ((str(args.logins), {'BCRYPT_WORKERS': str(args.logins), 'BCRYPT_QUEUE_SIZE': str(args.logins)}),
+                            ('cores (default)', {}),
+                            (f'rehash to {rounds - 2}', {'BCRYPT_ROUNDS': str(rounds - 2)})):
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy(source, os.path.join(tmp, 'library.db'))
+            summary, signed_in = run(tmp, args.port, settings, args.logins, args.readers, args.duration, users)
+            login, suggest = summary['login'], summary['search_suggestions']
+            print(f"{label:<16}{login['rps']:>9}{login['p95']:>11}{suggest['rps']:>11}{suggest['p50']:>13}{suggest['p95']:>13}")
+            if login['errors'] or suggest['errors']:
+                failures.append(f"{label}: {login['errors']} failed logins, {suggest['errors']} failed lookups")
+            if 'BCRYPT_ROUNDS' in settings:
+                with sqlite3.connect(os.path.join(tmp, 'library.db')) as conn:
+                    costs = dict(conn.execute(f'''
+                        SELECT mob_no, CAST(substr(password, 5, 2) AS INTEGER) FROM member_db
+                        WHERE mob_no IN ({', '.join('?' for _ in signed_in)})
+                    ''', sorted(signed_in)))
+                stale = [mob for mob, cost in costs.items() if cost != rounds - 2]
+                if not signed_in or stale:
+                    failures.append(f'{len(stale)} of {len(signed_in)} signed-in members were not rehashed')
+                client = Client('127.0.0.1', args.port)
+                server = start_server(tmp, args.port, 1, 4, settings)
+                try:
+                    if signed_in and client.login(min(signed_in)) != 302:
+                        failures.append('a rehashed member could not sign in again')
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
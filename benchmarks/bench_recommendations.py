@@ -0,0 +1,113 @@
+"""
+Build time of the co-borrow neighbours and latency of a member's
+recommendations against the category-and-popularity queries user_dashboard
+ran before. Also checks that an incremental build after new issues gives the
+recomputed books the same neighbours a full build does, and that a build holds
+the write lock only to replace the rows.
+
+    python benchmarks/bench_recommendations.py [--issues 200000] [--new-issues 500]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+import recommendations
+
+
+def previous(db, member_id):
+    """What user_dashboard used to run on every load."""
+    cat_row = db.execute("SELECT b.category, COUNT(*) as cnt FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id WHERE ib.member_id = ? GROUP BY b.category ORDER BY cnt DESC LIMIT 1", (member_id,)).fetchone()
+    rows = []
+    if cat_row:
+        rows = db.execute("SELECT * FROM book_db WHERE category = ? AND book_id NOT IN (SELECT book_id FROM issued_books WHERE member_id = ?) GROUP BY book_id LIMIT 5", (cat_row[0], member_id)).fetchall()
+    if not rows:
+        rows = db.execute("SELECT b.*, COUNT(ib.issue_id) as cnt FROM book_db b LEFT JOIN issued_books ib ON b.book_id = ib.book_id GROUP BY b.book_id ORDER BY cnt DESC LIMIT 5").fetchall()
+    return rows
+
+
+def timed(fn, conn, member_ids):
+    samples = []
+    for member_id in member_ids:
+        start = time.perf_counter()
+        fn(conn, member_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def neighbours(conn, book_ids):
+    return conn.execute(f'''
+        SELECT book_id, neighbour_id, ROUND(score, 9) FROM book_neighbours
+        WHERE book_id IN ({', '.join('?' for _ in book_ids)}) ORDER BY 1, 2
+    ''', book_ids).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--issues', type=int, default=200000)
+    parser.add_argument('--new-issues', type=int, default=500)
+    parser.add_argument('--members', type=int, default=200, help='members whose recommendations are timed')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'recommend.db')
+        seed(db_path, issues=args.issues)
+        conn = sqlite3.connect(db_path)
+
+        start = time.perf_counter()
+        plan = recommendations.plan(conn)
+        planned = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        books = recommendations.apply(conn, plan)
+        conn.commit()
+        print(f"full build: {books} books in {time.perf_counter() - start:.2f}s, "
+              f"write lock held {time.perf_counter() - planned:.2f}s, "
+              f"{conn.execute('SELECT COUNT(*) FROM book_neighbours').fetchone()[0]} neighbour rows")
+        if time.perf_counter() - planned > 1:
+            failures.append('the build held the write lock for over a second')
+
+        members, catalog, last_issue_id = conn.execute('SELECT MAX(member_id), MAX(book_id), MAX(issue_id) FROM issued_books').fetchone()
+        conn.executemany("INSERT INTO issued_books (member_id, book_id, issue_date, due_date) VALUES (?, ?, date('now'), date('now', '+14 days'))",
+                         [(rng.randint(6, members), rng.randint(1, catalog)) for _ in range(args.new_issues)])
+        conn.commit()
+        start = time.perf_counter()
+        books = recommendations.build(conn)
+        conn.commit()
+        print(f"incremental build after {args.new_issues} issues: {books} books in {time.perf_counter() - start:.2f}s")
+
+        recomputed = [row[0] for row in conn.execute('''
+            SELECT DISTINCT book_id FROM issued_books
+            WHERE member_id IN (SELECT member_id FROM issued_books WHERE issue_id > ?) ORDER BY RANDOM() LIMIT 900
+        ''', (last_issue_id,))]
+        incremental = neighbours(conn, recomputed)
+        recommendations.build(conn, full=True)
+        conn.commit()
+        if neighbours(conn, recomputed) != incremental:
+            failures.append('the incremental build differs from a full build for the books it recomputed')
+
+        # Members without history got the popularity fallback, which grouped all of issued_books
+        newcomers = [conn.execute("INSERT INTO member_db (first_name, last_name, address, mob_no, email_id, password, role) VALUES ('New', 'Member', '', ?, '', '', 'user')",
+                                  (f'7{i:09d}',)).lastrowid for i in range(20)]
+        conn.commit()
+        sample = rng.sample(range(6, members + 1), min(args.members, members - 5))
+        for who, member_ids in (('borrowers', sample), ('newcomers', newcomers)):
+            for label, fn in (('before', previous), ('co-borrow', recommendations.for_member)):
+                median, worst = timed(fn, conn, member_ids)
+                print(f"{who:<10} {label:<10} median {median:7.2f} ms  max {worst:7.2f} ms")
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Latency of /report_page as issue history grows. The seeded database is grown
+to each --sizes total of issued_books rows (with a paid fine on every tenth
+issue) and the report is rendered --repeat times at each size; with the report
+reading rollups the median should stay flat instead of tracking history.
+
+    python benchmarks/bench_report_page.py --sizes 20000,200000,1000000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+import app as app_module
+
+
+def add_issues(path, rows, members=2000, books=5000):
+    """Appends `rows` issues spread over the last ten years; the report triggers run for each."""
+    conn = sqlite3.connect(path)
+    start = conn.execute("SELECT COALESCE(MAX(issue_id), 0) FROM issued_books").fetchone()[0]
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO issued_books (member_id, book_id, issue_date, due_date, return_date)
+        SELECT 6 + i % (? - 6), 1 + i % ?,
+               date('now', '-' || (i % 3650) || ' days'),
+               date('now', '-' || (i % 3650) || ' days', '+14 days'),
+               date('now', '-' || (i % 3650) || ' days', '+10 days')
+        FROM n
+    """, (rows, members, books))
+    conn.execute("""
+        INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date, payment_date)
+        SELECT issue_id, 10, 2, 'Paid', due_date, return_date FROM issued_books
+        WHERE issue_id > ? AND issue_id % 10 = 0
+    """, (start,))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='20000,200000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    app = app_module.app
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        logins = seed(db_path, issues=sizes[0])
+        app.config['LOCAL_DATABASE'] = db_path
+        client = app.test_client()
+        client.post('/login', data={'mob_no': logins['admin'], 'password': logins['password']})
+
+        current = sizes[0]
+        for size in sizes:
+            if size > current:
+                add_issues(db_path, size - current)
+                current = size
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.get('/report_page?tf=monthly')
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+            print(f"{size:>9} issues: median {statistics.median(timings) * 1000:.1f} ms, "
+                  f"max {max(timings) * 1000:.1f} ms over {args.repeat} renders")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Compares catalog search through the FTS5 index with the old LIKE '%q%' scans.
+
+    python benchmarks/bench_search.py --books 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search
+
+WORDS = ['power', 'habit', 'mind', 'deep', 'work', 'focus', 'atomic', 'success', 'art', 'war',
+         'thinking', 'happiness', 'discipline', 'meaning', 'courage', 'learning', 'less', 'now']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vor', 'shi', 'dan', 'el', 'qu', 'ber', 'tho', 'ny', 'za']
+NAMES = ['James', 'Clear', 'Cal', 'Newport', 'Brian', 'Tracy', 'Robin', 'Sharma', 'Ryan', 'Holiday']
+CATEGORIES = ['Self Development', 'Fiction', 'History', 'Science', 'Business', 'Biography']
+
+LIKE_QUERIES = {
+    'all': "SELECT book_id FROM book_db WHERE title LIKE ? OR author_name LIKE ? OR category LIKE ? ORDER BY title",
+    'title': "SELECT book_id FROM book_db WHERE title LIKE ? ORDER BY title",
+    'author': "SELECT book_id FROM book_db WHERE author_name LIKE ? ORDER BY title",
+    'category': "SELECT book_id FROM book_db WHERE category LIKE ? ORDER BY title",
+}
+
+
+def build_db(path, books, seed=42):
+    rng = random.Random(seed)
+    # A few thousand made-up words so that most searches are selective, as in a real catalog.
+    vocabulary = WORDS + [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    conn = sqlite3.connect(path)
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'full_schema.sql')) as f:
+        conn.executescript(f.read())
+    rows = (
+        (' '.join(rng.choice(vocabulary).capitalize() for _ in range(rng.randint(2, 5))),
+         rng.choice(CATEGORIES), 'Publisher', str(rng.randint(1900, 2024)), '1st', rng.randint(0, 10),
+         f'{rng.choice(NAMES)} {rng.choice(NAMES)}')
+        for _ in range(books)
+    )
+    conn.executemany("INSERT INTO book_db (title, category, publisher, year, edition, total_stock, author_name) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_db(os.path.join(tmp, 'bench.db'), args.books)
+        print(f"{args.books} books, mean of {args.repeat} runs")
+        print(f"{'query':<24}{'filter':<10}{'LIKE ms':>10}{'FTS ms':>10}{'rows':>14}")
+        for q, search_filter in [('habit', 'all'), ('deep work', 'title'), ('newport', 'author'), ('fict', 'category'), ('kalo', 'all')]:
+            params = [f'%{q}%'] * (3 if search_filter == 'all' else 1)
+            like_sql = LIKE_QUERIES[search_filter]
+            join, where, order_by, fts_params = search.catalog_filter(q, search_filter)
+            fts_sql = f"SELECT b.book_id FROM book_db b {join} {where} ORDER BY {order_by}"
+            like_ms = time_it(lambda: conn.execute(like_sql, params).fetchall(), args.repeat)
+            fts_ms = time_it(lambda: conn.execute(fts_sql, fts_params).fetchall(), args.repeat)
+            like_rows = len(conn.execute(like_sql, params).fetchall())
+            fts_rows = len(conn.execute(fts_sql, fts_params).fetchall())
+            print(f"{q!r:<24}{search_filter:<10}{like_ms:>10.2f}{fts_ms:>10.2f}{f'{like_rows}/{fts_rows}':>14}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
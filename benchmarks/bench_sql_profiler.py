@@ -0,0 +1,88 @@
+"""
+Overhead of SQL profiling: a request-shaped mix of point lookups, a joined
+page and a COUNT, run on a plain connection and on a ProfiledConnection, then
+folded into the profiler as one request each. Also checks that normalization
+groups statements that differ only in literals and IN-list lengths, and that
+a slow statement is logged with its plan.
+
+    python benchmarks/bench_sql_profiler.py [--requests 2000]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from fixtures import seed
+
+import sql_profiler
+
+
+def request(db, member_id):
+    """Roughly what user_dashboard runs."""
+    db.execute('SELECT * FROM member_db WHERE member_id = ?', (member_id,)).fetchone()
+    db.execute('''
+        SELECT b.title, ib.issue_date, ib.due_date FROM issued_books ib JOIN book_db b ON b.book_id = ib.book_id
+        WHERE ib.member_id = ? ORDER BY ib.issue_id DESC LIMIT 20
+    ''', (member_id,)).fetchall()
+    for _ in db.execute('SELECT book_id, title FROM book_db WHERE book_id > ? ORDER BY book_id LIMIT 50', (member_id,)):
+        pass
+    db.execute('SELECT COUNT(*) FROM issued_books WHERE member_id = ? AND return_date IS NULL', (member_id,)).fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'profile.db')
+        seed(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        profiler = sql_profiler.Profiler({})
+        members = [6 + i % 1990 for i in range(args.requests)]
+
+        for label in ('plain', 'profiled', 'plain', 'profiled'):
+            start = time.perf_counter()
+            for member_id in members:
+                if label == 'plain':
+                    request(conn, member_id)
+                else:
+                    profile = profiler.start()
+                    request(profiler.wrap(conn, profile), member_id)
+                    profiler.finish(profile, 'user_dashboard', conn)
+            per_request = (time.perf_counter() - start) / args.requests * 1e6
+            print(f"{label:<9} {per_request:7.1f} us/request")
+        stats = profiler.stats()['user_dashboard']
+        print(f"{stats['sql_statements_per_request']} statements and {stats['sql_ms_per_request']} ms SQL per request, "
+              f"{len(stats['statements'])} distinct statements")
+        if len(stats['statements']) != 4:
+            failures.append(f"expected 4 distinct statements, got {len(stats['statements'])}")
+
+        if sql_profiler.normalize("SELECT * FROM t WHERE a = 'x' AND b IN (?, ?, ?) LIMIT 5") != \
+                sql_profiler.normalize("SELECT *\n  FROM t WHERE a = 'it''s' AND b IN (?,?) LIMIT 50"):
+            failures.append('statements differing only in literals and IN lists normalized differently')
+
+        logged = []
+        handler = logging.Handler()
+        handler.emit = lambda record: logged.append(record.getMessage())
+        profiler.slow_log.addHandler(handler)
+        profiler.slow_seconds = 0
+        profile = profiler.start()
+        profiler.wrap(conn, profile).execute('SELECT * FROM book_db WHERE book_id = ?', (1,)).fetchone()
+        profiler.finish(profile, 'book', conn)
+        if not logged or 'plan: SEARCH book_db' not in logged[0]:
+            failures.append(f'slow statement was not logged with its plan: {logged}')
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Times /api/search_suggestions lookups against the in-memory prefix index.
+
+    python benchmarks/bench_suggestions.py --books 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suggestions
+from bench_search import build_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_db(os.path.join(tmp, 'bench.db'), args.books)
+        start = time.perf_counter()
+        index = suggestions.SuggestionIndex.build(conn)
+        print(f"{args.books} books, index built in {time.perf_counter() - start:.2f}s")
+        for prefix in ['p', 'po', 'pow', 'power o', 'newp', 'kalo', 'zzz']:
+            index.suggest(prefix)  # first call fills the memo for wide prefixes
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                index.suggest(prefix)
+            per_call = (time.perf_counter() - start) / args.repeat * 1e6
+            print(f"{prefix!r:<12}{per_call:>10.1f} us  {index.suggest(prefix)[:3]}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Builds the static assets into a scratch copy of static/ and checks them: every
+minified script still parses (with `node --check`, when node is installed),
+every stylesheet keeps its rules and balanced braces, strings and url(...)
+survive minification as written, and a second build of
+unchanged sources gives the same names. Files of the previous build must
+stay servable after a source changes. Prints what each page bundle saves in
+requests and bytes.
+
+    python benchmarks/check_assets.py
+"""
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from fixtures import ROOT
+
+import assets
+
+
+def rules(css):
+    """Selectors of a stylesheet, whitespace-normalized, in order."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    return [re.sub(r'\s+', '', selector) for selector in re.findall(r'([^{};]+)\{', css)]
+
+
+# Declarations whose quoted or url(...) values minify_css must leave alone
+VERBATIM_CSS = [
+    '"a  ;  b /* not a comment */ , c"',
+    "'Open  Sans'",
+    'url( images/a  b.png )',
+    'url("a;b.png")',
+]
+
+
+def main():
+    failures = []
+    for value in VERBATIM_CSS:
+        if value not in assets.minify_css(f'.x {{ content : {value} ; }}'):
+            failures.append(f'minify_css changed {value}')
+    node = shutil.which('node')
+    with tempfile.TemporaryDirectory() as tmp:
+        static = os.path.join(tmp, 'static')
+        shutil.copytree(os.path.join(ROOT, 'static'), static, ignore=shutil.ignore_patterns('dist', 'profile_pics'))
+        manifest = assets.build(static)
+        dist = os.path.join(static, assets.DIST)
+
+        for name, entry in manifest.items():
+            path = os.path.join(dist, entry['file'])
+            if name.endswith('.js') and node:
+                result = subprocess.run([node, '--check', path], capture_output=True, text=True)
+                if result.returncode:
+                    failures.append(f'{name} does not parse: {result.stderr.strip().splitlines()[-1]}')
+            elif name.endswith('.css'):
+                with open(path) as f:
+                    built = f.read()
+                original = ''.join(open(os.path.join(static, s)).read() for s in entry['sources'])
+                if built.count('{') != built.count('}') or rules(built) != rules(original):
+                    failures.append(f'{name} lost or changed rules')
+            if 'gzip' in entry['encodings']:
+                with open(path, 'rb') as f, gzip.open(path + '.gz') as g:
+                    if f.read() != g.read():
+                        failures.append(f'{name}.gz does not match {name}')
+
+        if assets.build(static) != manifest:
+            failures.append('a rebuild of unchanged sources changed the manifest')
+
+        print(f"{'bundle':<22}{'requests':>9}{'source kB':>11}{'built kB':>10}{'gzip kB':>9}")
+        for name in assets.BUNDLES:
+            entry = manifest[name]
+            source = sum(os.path.getsize(os.path.join(static, s)) for s in entry['sources'])
+            print(f"{name:<22}{len(entry['sources']):>6} -> 1{source / 1000:>11.1f}{entry['size'] / 1000:>10.1f}"
+                  f"{entry['encodings'].get('gzip', entry['size']) / 1000:>9.1f}")
+        if not node:
+            print('node not found: scripts were not parsed')
+
+        # A page rendered before a rebuild still gets the files it names
+        with open(os.path.join(static, assets.BUNDLES['user_dashboard.css'][0]), 'a') as f:
+            f.write('\n.check-assets{color:red}\n')
+        rebuilt = assets.build(static)
+        old = manifest['user_dashboard.css']['file']
+        if rebuilt['user_dashboard.css']['file'] == old:
+            failures.append('a changed source kept its name')
+        if assets.Assets(static).encodings(old) is None:
+            failures.append(f'{old} from the previous build is no longer served')
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Counts the header-tile queries of admin_page, manage_fine and manage_return.
+Each page is requested with an empty tile cache, again with a warm one, and
+once more after a fine payment invalidates it. Tile queries are the aggregate
+(COUNT/SUM) statements a request runs; there must be at most one per request,
+and none while the cache is warm.
+
+    python benchmarks/check_dashboard_queries.py
+"""
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+PAGES = ['/admin_page', '/manage_fine', '/manage_return']
+
+_AGGREGATE_RE = re.compile(r'\b(?:COUNT|SUM)\s*\(', re.IGNORECASE)
+
+
+def trace(pool, client, method, url, **kwargs):
+    """Returns (all SELECT statements, aggregate statements, seconds) for one request."""
+    statements = []
+    acquire = pool.acquire
+
+    def traced_acquire():
+        conn = acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    pool.acquire = traced_acquire
+    try:
+        start = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        elapsed = time.perf_counter() - start
+        assert response.status_code in (200, 302), (url, response.status_code)
+    finally:
+        del pool.acquire
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+    return len(selects), len([sql for sql in selects if _AGGREGATE_RE.search(sql)]), elapsed
+
+
+def main():
+    import app as app_module
+    app = app_module.app
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'tiles.db')
+        logins = seed(db_path)
+        app.config['LOCAL_DATABASE'] = db_path
+        pool = app_module.get_pool()
+        client = app.test_client()
+        client.post('/login', data={'mob_no': logins['admin'], 'password': logins['password']})
+
+        for url in PAGES:
+            app_module.dashboard.invalidate()
+            cold = trace(pool, client, 'get', url)
+            warm = [trace(pool, client, 'get', url) for _ in range(20)]
+            with sqlite3.connect(db_path) as conn:
+                fine_id = conn.execute("SELECT MIN(fine_id) FROM fines WHERE status = 'Pending'").fetchone()[0]
+            client.post('/manage_fine', data={'pay_fine': '1', 'fine_id': str(fine_id)})
+            after_write = trace(pool, client, 'get', url)
+            print(f"{url:<15} tile queries: cold {cold[1]}, warm {warm[0][1]}, after a write {after_write[1]} "
+                  f"({cold[0]} / {warm[0][0]} SELECTs in all); warm median {statistics.median(w[2] for w in warm) * 1000:.1f} ms")
+            if cold[1] > 1 or after_write[1] > 1 or any(w[1] for w in warm):
+                print(f"FAIL: {url} runs more than one tile query per request")
+                failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Checks that the admin activity feed costs a fixed number of queries however
+many entries it shows: the feed is rendered at several ACTIVITY_FEED_SIZE
+values, with a cold and a warm title cache, and the statement counts must not
+change with the size.
+
+    python benchmarks/check_feed_queries.py
+"""
+import os
+import sys
+import tempfile
+
+from fixtures import ROOT, seed
+
+os.chdir(ROOT)
+
+SIZES = [5, 20, 100]
+
+
+def count_statements(pool, client, url):
+    statements = []
+    acquire = pool.acquire
+
+    def traced_acquire():
+        conn = acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    pool.acquire = traced_acquire
+    try:
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    finally:
+        del pool.acquire
+    return len([sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))])
+
+
+def main():
+    import app as app_module
+    app = app_module.app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'feed.db')
+        logins = seed(db_path)
+        app.config['LOCAL_DATABASE'] = db_path
+        pool = app_module.get_pool()
+        client = app.test_client()
+        client.post('/login', data={'mob_no': logins['admin'], 'password': logins['password']})
+
+        counts = {}
+        for size in SIZES:
+            app.config['ACTIVITY_FEED_SIZE'] = size
+            app_module.book_titles.clear()
+            cold = count_statements(pool, client, '/admin_page?ajax=1')
+            warm = count_statements(pool, client, '/admin_page?ajax=1')
+            counts[size] = (cold, warm)
+            print(f"{size:>4} entries: {cold} queries with a cold title cache, {warm} warm")
+
+    if len(set(counts.values())) != 1:
+        print("FAIL: the feed's query count depends on its size")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Checks the nightly maintenance jobs on a seeded database: days_overdue and
+Pending fines must match what the old per-row JULIANDAY arithmetic gives, a
+second run the same day must change nothing and send no reminders, a dry run
+must leave the database untouched, a job past its time box must be rolled
+back, and the next day's run must move every open overdue issue on by a day.
+
+    python benchmarks/check_maintenance.py [--issues 200000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from fixtures import ROOT, seed
+
+import maintenance
+
+EXPECTED_DAYS = '''
+    SELECT COUNT(*) FROM issued_books
+    WHERE days_overdue != CASE
+        WHEN return_date IS NULL AND due_date < :today THEN CAST(JULIANDAY(:today) - JULIANDAY(due_date) AS INTEGER)
+        WHEN return_date IS NULL THEN 0 ELSE days_overdue END
+'''
+
+EXPECTED_FINES = '''
+    SELECT COUNT(*) FROM issued_books ib
+    WHERE ib.return_date IS NULL AND ib.days_overdue > 0
+      AND ib.days_overdue * 5 - COALESCE((SELECT SUM(fine_amount) FROM fines WHERE issue_id = ib.issue_id AND status = 'Paid'), 0) > 0
+      AND NOT EXISTS (SELECT 1 FROM fines f WHERE f.issue_id = ib.issue_id AND f.status = 'Pending'
+                      AND f.fine_amount = ib.days_overdue * 5 - COALESCE((SELECT SUM(fine_amount) FROM fines
+                                                                          WHERE issue_id = ib.issue_id AND status = 'Paid'), 0))
+'''
+
+
+def snapshot(conn):
+    return tuple(conn.execute(f'SELECT COUNT(*), TOTAL({column}) FROM {table}').fetchone()
+                 for table, column in (('fines', 'fine_amount'), ('notifications', 'notification_id'),
+                                       ('issued_books', 'days_overdue'), ('issue_reminders', 'issue_id')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--issues', type=int, default=20000)
+    args = parser.parse_args()
+
+    failures = []
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'maintenance.db')
+        seed(db_path, issues=args.issues)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        # Start from stale values, as if the jobs had not run for a week
+        conn.execute('UPDATE issued_books SET days_overdue = MAX(0, days_overdue - 7) WHERE return_date IS NULL')
+        conn.commit()
+
+        before = snapshot(conn)
+        dry = maintenance.run_all(conn, today, timeout=60, dry_run=True)
+        if snapshot(conn) != before:
+            failures.append('the dry run changed the database')
+
+        for name in maintenance.JOBS:
+            start = time.perf_counter()
+            rows = maintenance.run_job(conn, name, today, timeout=60)
+            print(f"{name:<15} {rows:>7} rows in {(time.perf_counter() - start) * 1000:.0f} ms (dry run said {dry[name]})")
+            if rows != dry[name]:
+                failures.append(f'{name} changed {rows} rows but the dry run reported {dry[name]}')
+
+        params = {'today': today.isoformat()}
+        if conn.execute(EXPECTED_DAYS, params).fetchone()[0]:
+            failures.append('days_overdue differs from the JULIANDAY computation')
+        if conn.execute(EXPECTED_FINES, params).fetchone()[0]:
+            failures.append('an overdue issue lacks the right Pending fine')
+
+        before = snapshot(conn)
+        rerun = maintenance.run_all(conn, today, timeout=60)
+        if any(rerun.values()) or snapshot(conn) != before:
+            failures.append(f'a second run the same day changed something: {rerun}')
+
+        conn.set_trace_callback(lambda sql: time.sleep(0.05) if 'UPDATE issued_books' in sql else None)
+        timed_out = maintenance.run_all(conn, today + timedelta(days=1), timeout=0.01, jobs=['days_overdue'])
+        conn.set_trace_callback(None)
+        if timed_out != {'days_overdue': 'timeout'} or snapshot(conn) != before:
+            failures.append(f'a timed-out job was not rolled back: {timed_out}')
+
+        overdue = conn.execute("SELECT COUNT(*) FROM issued_books WHERE return_date IS NULL AND due_date < ?",
+                               (today.isoformat(),)).fetchone()[0]
+        next_day = maintenance.run_all(conn, today + timedelta(days=1), timeout=60)
+        print(f"next day: {next_day}")
+        if next_day['days_overdue'] < overdue:
+            failures.append('the next day did not move every overdue issue on')
+        if conn.execute(EXPECTED_DAYS, {'today': (today + timedelta(days=1)).isoformat()}).fetchone()[0]:
+            failures.append("days_overdue differs from the JULIANDAY computation on the next day")
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Query-plan regression check for the SQL issued by app.py.
+
+Seeds a throwaway database, drives every route through the Flask test client
+while recording each statement the app executes, then runs EXPLAIN QUERY PLAN
+on all of them. Exits non-zero if a statement does a full SCAN of one of the
+large tables and is not listed in ALLOWED_SCANS.
+
+    python benchmarks/check_query_plans.py [-v]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fixtures import seed
+
+LARGE_TABLES = {'member_db', 'book_db', 'issued_books', 'fines', 'wishlist',
+                'reservations', 'notifications', 'user_activity'}
+
+# (endpoint, table) pairs whose full scan is inherent to what the page shows
+# today: whole-table listings and all-time aggregates.
+ALLOWED_SCANS = {
+    ('dashboard_tiles', 'book_db:count'): 'total book count',
+    ('dashboard_tiles', 'fines:count'): 'total fine count',
+    ('dashboard_tiles', 'issued_books:count'): 'total issue count',
+    ('search_suggestions', 'book_db'): 'autocomplete index build reads the catalog once per worker',
+    ('export_activity_log', 'user_activity'): 'an unfiltered export reads the whole log',
+}
+
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIAS = {'where', 'join', 'left', 'inner', 'on', 'order', 'group', 'limit', 'set', 'using'}
+_SCAN_RE = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+
+
+def exercise_routes(app, logins):
+    """Requests every route once as the role that can see it."""
+    def client_for(role):
+        client = app.test_client()
+        client.post('/login', data={'mob_no': logins[role], 'password': logins['password']})
+        return client
+
+    user = client_for('user')
+    for url in ['/user_dashboard', '/user_dashboard?search=habits&filter=title', '/api/search_books?q=',
+                '/api/search_books?q=power&filter=all', '/api/search_suggestions?q=pow', '/my_reservations',
+                '/notifications', '/profile']:
+        yield 'GET', url, user.get(url)
+    for url, data in [('/user_dashboard', {'toggle_wishlist': '1', 'book_id': '3'}),
+                      ('/api/toggle_wishlist', {'book_id': '4'}),
+                      ('/reserve_book', {'book_id': '5'})]:
+        yield 'POST', url, user.post(url, data=data)
+    yield 'POST', '/get_chatbot_response', user.post('/get_chatbot_response', json={'message': 'find book title: power'})
+    yield 'POST', '/get_chatbot_response', user.post('/get_chatbot_response', json={'message': 'what are the hours'})
+
+    admin = client_for('admin')
+    for url in ['/admin_page', '/admin_page?ajax=1', '/admin/export_activity_log',
+                '/admin/export_activity_log?format=jsonl&user_id=7', '/admin/export_activity_log?start=2024-01-01&end=2024-01-31',
+                '/manage_member', '/manage_book',
+                '/manage_issue', '/manage_fine', '/manage_fine?status=Pending&member=First1', '/manage_return',
+                '/manage_return?status=pending', '/report_page', '/report_page?tf=monthly', '/wishlist_data',
+                '/admin/reservations', '/admin/book_reservations/5']:
+        yield 'GET', url, admin.get(url)
+    for url, data in [('/manage_return', {'process_return': '1', 'issue_id': '10'}),
+                      ('/manage_fine', {'pay_fine': '1', 'fine_id': '1'}),
+                      ('/wishlist_data', {'issue_book': '1', 'member_id': '7', 'book_id': '8'})]:
+        yield 'POST', url, admin.post(url, data=data)
+
+
+def scanned_tables(sql, plan, partial_indexes):
+    """
+    Returns the real table names that the plan reads with a full SCAN.
+    Walking a partial index only visits the rows it covers, and walking an
+    index (or the rowid b-tree) in ORDER BY order under a LIMIT stops early,
+    so neither counts.
+    """
+    aliases = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias] = table
+    ordered_limit = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) and not any('TEMP B-TREE' in row[3] for row in plan)
+    ordered = ordered_limit and re.search(r'\bORDER BY\b', sql, re.IGNORECASE)
+    tables = set()
+    for row in plan:
+        match = _SCAN_RE.match(row[3])
+        if not match:
+            continue
+        index = match.group(2)
+        if index in partial_indexes or (index and ordered_limit) or ordered:
+            continue
+        tables.add(aliases.get(match.group(1), match.group(1)))
+    return tables & LARGE_TABLES
+
+
+def is_allowed(endpoint, table, sql):
+    if (endpoint, table) in ALLOWED_SCANS:
+        return True
+    # Unfiltered COUNT(*) tiles are allowed per page; filtered counts are not.
+    if re.match(r'\s*SELECT COUNT\(\*\) AS \w+ FROM \w+\s*$', sql, re.IGNORECASE):
+        return (endpoint, f'{table}:count') in ALLOWED_SCANS or (endpoint, table) in ALLOWED_SCANS
+    # The admin header tiles are one statement of scalar subqueries
+    # (dashboard_metrics), run by whichever page finds the cache empty.
+    if re.search(rf'\(SELECT COUNT\(\*\) FROM {table}\)', sql, re.IGNORECASE):
+        return ('dashboard_tiles', f'{table}:count') in ALLOWED_SCANS
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every statement with its plan')
+    args = parser.parse_args()
+
+    from flask import has_request_context, request
+    import app as app_module
+    app = app_module.app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        logins = seed(db_path)
+        app.config['LOCAL_DATABASE'] = db_path
+
+        statements = []
+
+        pool = app_module.get_pool()
+        acquire = pool.acquire
+
+        def traced_acquire():
+            # Traced at checkout so streamed responses, which take their own
+            # connection, are covered too.
+            conn = acquire()
+            endpoint = request.endpoint if has_request_context() else None
+            conn.set_trace_callback(lambda sql: statements.append((endpoint, sql)))
+            return conn
+
+        pool.acquire = traced_acquire
+
+        for method, url, response in exercise_routes(app, logins):
+            response.get_data()  # runs streamed bodies before the next request
+            response.close()
+            if response.status_code >= 500:
+                print(f"{method} {url} failed with {response.status_code}")
+                return 1
+
+        conn = sqlite3.connect(db_path)
+        partial_indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '%WHERE%'")}
+        failures = []
+        seen = set()
+        for endpoint, sql in statements:
+            sql = sql.strip()
+            if not re.match(r'(SELECT|UPDATE|DELETE|WITH)\b', sql, re.IGNORECASE) or (endpoint, sql) in seen:
+                continue
+            seen.add((endpoint, sql))
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            offending = {t for t in scanned_tables(sql, plan, partial_indexes) if not is_allowed(endpoint, t, sql)}
+            if args.verbose or offending:
+                print(f"[{endpoint}] {' '.join(sql.split())[:200]}")
+                for row in plan:
+                    print(f"    {row[3]}")
+            if offending:
+                failures.append((endpoint, sql, offending))
+        conn.close()
+
+    print(f"{len(seen)} distinct statements checked, {len(failures)} full scans of large tables.")
+    for endpoint, sql, tables in failures:
+        print(f"  FAIL [{endpoint}] scans {', '.join(sorted(tables))}: {' '.join(sql.split())[:120]}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Checks that the report_* rollups agree with the aggregates report_page used to
+compute from issued_books and fines. A seeded database is put through random
+issues, returns, deletions, re-dated and re-assigned issues, fine payments and
+book edits and deletions; after each round every rollup is compared with the
+same figure grouped from history, and finally with a full rebuild.
+
+    python benchmarks/check_report_rollups.py
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from fixtures import ROOT, seed
+
+import counters
+
+# (rollup query, the same figure computed from history); both ordered the same way
+PAIRS = {
+    'daily borrows': (
+        "SELECT day, borrows FROM report_daily WHERE borrows != 0 ORDER BY day",
+        "SELECT SUBSTR(issue_date, 1, 10), COUNT(*) FROM issued_books GROUP BY 1 ORDER BY 1"),
+    'daily fines': (
+        "SELECT day, ROUND(fines_collected, 2), fines_paid FROM report_daily WHERE fines_paid != 0 ORDER BY day",
+        "SELECT SUBSTR(payment_date, 1, 10), ROUND(SUM(fine_amount), 2), COUNT(*) FROM fines WHERE status = 'Paid' AND payment_date IS NOT NULL GROUP BY 1 ORDER BY 1"),
+    'monthly borrows': (
+        "SELECT month, borrows FROM report_monthly WHERE borrows != 0 ORDER BY month",
+        "SELECT SUBSTR(issue_date, 1, 7), COUNT(*) FROM issued_books GROUP BY 1 ORDER BY 1"),
+    'monthly fines': (
+        "SELECT month, ROUND(fines_collected, 2), fines_paid FROM report_monthly WHERE fines_paid != 0 ORDER BY month",
+        "SELECT SUBSTR(payment_date, 1, 7), ROUND(SUM(fine_amount), 2), COUNT(*) FROM fines WHERE status = 'Paid' AND payment_date IS NOT NULL GROUP BY 1 ORDER BY 1"),
+    'book borrows': (
+        "SELECT book_id, borrows FROM report_book_borrows WHERE borrows != 0 ORDER BY book_id",
+        "SELECT book_id, COUNT(*) FROM issued_books GROUP BY book_id ORDER BY book_id"),
+    'member borrows': (
+        "SELECT member_id, borrows FROM report_member_borrows WHERE borrows != 0 ORDER BY member_id",
+        "SELECT member_id, COUNT(*) FROM issued_books GROUP BY member_id ORDER BY member_id"),
+    'category borrows': (
+        "SELECT category, borrows FROM report_category_borrows WHERE borrows != 0 ORDER BY category",
+        "SELECT COALESCE(b.category, ''), COUNT(*) FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id GROUP BY 1 ORDER BY 1"),
+    'author borrows': (
+        "SELECT author_name, borrows FROM report_author_borrows WHERE borrows != 0 ORDER BY author_name",
+        "SELECT COALESCE(b.author_name, ''), COUNT(*) FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id GROUP BY 1 ORDER BY 1"),
+}
+
+
+def mutate(conn, rng, books, members):
+    today = date.today()
+    for _ in range(200):
+        issued = (today - timedelta(days=rng.randint(0, 800))).isoformat()
+        conn.execute("INSERT INTO issued_books (member_id, book_id, issue_date, due_date) VALUES (?, ?, ?, ?)",
+                     (rng.randint(6, members), rng.randint(1, books), issued, issued))
+    issue_ids = [row[0] for row in conn.execute("SELECT issue_id FROM issued_books ORDER BY RANDOM() LIMIT 300")]
+    for issue_id in issue_ids[:50]:
+        conn.execute("UPDATE issued_books SET return_date = ? WHERE issue_id = ?", (today.isoformat(), issue_id))
+        conn.execute("INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date, payment_date) VALUES (?, ?, 3, ?, ?, ?)",
+                     (issue_id, rng.choice([0, 5, 12.5]), rng.choice(['Paid', 'Pending']), today.isoformat(),
+                      rng.choice([None, (today - timedelta(days=rng.randint(0, 90))).isoformat()])))
+    for issue_id in issue_ids[50:100]:
+        conn.execute("DELETE FROM issued_books WHERE issue_id = ?", (issue_id,))
+    for issue_id in issue_ids[100:150]:
+        conn.execute("UPDATE issued_books SET issue_date = ?, book_id = ?, member_id = ? WHERE issue_id = ?",
+                     ((today - timedelta(days=rng.randint(0, 800))).isoformat(), rng.randint(1, books), rng.randint(6, members), issue_id))
+    for fine_id, in conn.execute("SELECT fine_id FROM fines ORDER BY RANDOM() LIMIT 100").fetchall():
+        action = rng.choice(['pay', 'unpay', 'amount', 'delete'])
+        if action == 'pay':
+            conn.execute("UPDATE fines SET status = 'Paid', payment_date = ? WHERE fine_id = ?", (today.isoformat(), fine_id))
+        elif action == 'unpay':
+            conn.execute("UPDATE fines SET status = 'Pending', payment_date = NULL WHERE fine_id = ?", (fine_id,))
+        elif action == 'amount':
+            conn.execute("UPDATE fines SET fine_amount = fine_amount + 5 WHERE fine_id = ?", (fine_id,))
+        else:
+            conn.execute("DELETE FROM fines WHERE fine_id = ?", (fine_id,))
+    for _ in range(20):
+        conn.execute("UPDATE book_db SET category = ?, author_name = ? WHERE book_id = ?",
+                     (rng.choice(['Fiction', 'History', None, 'Poetry']), rng.choice([f'Author {rng.randint(0, 800)}', None]),
+                      rng.randint(1, books)))
+    for _ in range(5):
+        conn.execute("DELETE FROM book_db WHERE book_id = ?", (rng.randint(1, books),))
+    conn.commit()
+
+
+def compare(conn, label):
+    failures = 0
+    for name, (rollup_sql, history_sql) in PAIRS.items():
+        rollup = [tuple(row) for row in conn.execute(rollup_sql)]
+        history = [tuple(row) for row in conn.execute(history_sql)]
+        if rollup != history:
+            failures += 1
+            diff = sorted(set(rollup) ^ set(history))[:5]
+            print(f"FAIL {label}: {name} differs, e.g. {diff}")
+    return failures
+
+
+def main():
+    rng = random.Random(11)
+    books, members = 500, 300
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'rollups.db')
+        seed(db_path, members=members, books=books, issues=5000)
+        conn = sqlite3.connect(db_path)
+        failures += compare(conn, 'after migration backfill')
+        for round_no in range(1, 6):
+            mutate(conn, rng, books, members)
+            failures += compare(conn, f'round {round_no}')
+        counters.rebuild_report_rollups(conn)
+        failures += compare(conn, 'after rebuild')
+        conn.close()
+    print(f"{len(PAIRS)} rollups checked over 5 rounds of changes, {failures} mismatch(es).")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
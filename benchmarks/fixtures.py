@@ -0,0 +1,61 @@
+"""
+Seeded databases shared by the benchmark and plan-check scripts.
+"""
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import bcrypt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrate
+import search
+
+
+def seed(path, members=2000, books=5000, issues=20000, seed=7):
+    """Creates a schema-complete database with enough rows for the planner to care."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    with open(os.path.join(ROOT, 'full_schema.sql')) as f:
+        conn.executescript(f.read())
+    migrate.migrate(conn)
+    search.ensure_search_index(conn)
+
+    password = bcrypt.hashpw(b'password', bcrypt.gensalt(4))
+    conn.executemany("INSERT INTO member_db (first_name, last_name, address, mob_no, email_id, password, role) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [(f'First{i}', f'Last{i}', 'Street', f'9{i:09d}', f'm{i}@example.com', password,
+                       'admin' if i < 5 else 'user') for i in range(members)])
+    conn.executemany("INSERT INTO book_db (title, category, publisher, year, edition, total_stock, author_name, read_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(f'Title {i} {rng.choice(["Habits", "Power", "Mind", "Work"])}', rng.choice(['Fiction', 'History', 'Science']),
+                       'Publisher', str(rng.randint(1950, 2024)), '1st', rng.randint(0, 10), f'Author {i % 700}', 0)
+                      for i in range(books)])
+    today = date.today()
+    issue_rows = []
+    for _ in range(issues):
+        issued = today - timedelta(days=rng.randint(0, 720))
+        due = issued + timedelta(days=14)
+        returned = None if rng.random() < 0.1 else (issued + timedelta(days=rng.randint(1, 30))).isoformat()
+        issue_rows.append((rng.randint(6, members), rng.randint(1, books), issued.isoformat(), due.isoformat(), returned))
+    conn.executemany("INSERT INTO issued_books (member_id, book_id, issue_date, due_date, return_date) VALUES (?, ?, ?, ?, ?)", issue_rows)
+    conn.execute("""INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date, payment_date)
+                    SELECT issue_id, 25, 5, CASE WHEN issue_id % 2 THEN 'Paid' ELSE 'Pending' END, due_date,
+                           CASE WHEN issue_id % 2 THEN return_date END
+                    FROM issued_books WHERE issue_id % 10 = 0""")
+    conn.executemany("INSERT OR IGNORE INTO wishlist (member_id, book_id) VALUES (?, ?)",
+                     [(rng.randint(6, members), rng.randint(1, books)) for _ in range(issues // 4)])
+    conn.executemany("INSERT INTO reservations (member_id, book_id, status) VALUES (?, ?, ?)",
+                     [(rng.randint(6, members), rng.randint(1, books), rng.choice(['active', 'fulfilled', 'cancelled']))
+                      for _ in range(issues // 4)])
+    conn.executemany("INSERT INTO notifications (user_id, message, is_read) VALUES (?, ?, ?)",
+                     [(rng.randint(1, members), 'Seeded notification', rng.randint(0, 1)) for _ in range(issues)])
+    conn.executemany("INSERT INTO user_activity (user_id, action, book_id) VALUES (?, ?, ?)",
+                     [(rng.randint(6, members), rng.choice(['add_wishlist', 'reserve_book']), rng.randint(1, books))
+                      for _ in range(issues)])
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return {'admin': '9000000000', 'user': '9000000010', 'password': 'password'}
@@ -0,0 +1,222 @@
+"""
+Generates a library database of a chosen size for load testing. The same
+seed, sizes and --today always give the same rows.
+
+Rows are inserted with every trigger and secondary index dropped. The indexes
+and triggers are then recreated, and the data they maintain is rebuilt in
+bulk: availability counters, report rollups, the search index and
+recommendation neighbours. The result is what the app would have built row by
+row.
+
+    python benchmarks/generate_data.py DIR [--scale small|medium|large] [--issues N ...] [--seed 7]
+
+writes DIR/library.db. Member 9000000000 is an admin, 9000000010 and every
+later mobile number is a user, and all of them have the password 'password'.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import bcrypt
+
+from fixtures import ROOT
+
+import counters
+import migrate
+import recommendations
+import search
+
+# Issues set the scale. The other tables default to a fixed share of it.
+SCALES = {
+    'small': {'members': 2000, 'books': 5000, 'issues': 10000},
+    'medium': {'members': 50000, 'books': 200000, 'issues': 1000000},
+    'large': {'members': 500000, 'books': 1000000, 'issues': 10000000},
+}
+PER_ISSUE = {'fines': 0.1, 'reservations': 0.05, 'wishlist': 0.1, 'notifications': 1.0, 'activity': 1.0}
+TABLES = {'members': 'member_db', 'books': 'book_db', 'issues': 'issued_books', 'fines': 'fines', 'reservations': 'reservations',
+          'wishlist': 'wishlist', 'notifications': 'notifications', 'activity': 'user_activity'}
+
+ADMINS = 5
+PASSWORD = 'password'
+CHUNK = 50000
+HISTORY_DAYS = 730
+
+WORDS = ['atomic', 'habits', 'power', 'mind', 'work', 'deep', 'history', 'river', 'silent', 'garden', 'empire',
+         'quantum', 'ocean', 'winter', 'code', 'stars', 'journey', 'shadow', 'light', 'city', 'forest', 'secret',
+         'modern', 'ancient', 'data', 'design', 'money', 'health', 'story', 'war']
+CATEGORIES = ['Fiction', 'History', 'Science', 'Self Development', 'Biography', 'Technology', 'Poetry', 'Business']
+SURNAMES = ['Clear', 'Covey', 'Rao', 'Singh', 'Patel', 'Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Kim', 'Silva']
+ACTIONS = ['add_wishlist', 'remove_wishlist', 'reserve_book', 'return_book']
+
+
+def mob_no(index):
+    return f'9{index:09d}'
+
+
+def _insert(conn, sql, rows):
+    """Writes a row generator in CHUNK-sized executemany calls. Returns the number of rows."""
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK:
+            conn.executemany(sql, chunk)
+            total += len(chunk)
+            chunk = []
+    conn.executemany(sql, chunk)
+    return total + len(chunk)
+
+
+def _timestamp(day, rng):
+    return f'{day.isoformat()} {rng.randrange(8, 20):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}'
+
+
+def _day(index, count, days, today):
+    """Day of the index-th of `count` rows spread over the last `days`, busier towards today, so ids rise with time."""
+    return today - timedelta(days=int(days * (1 - ((index + 0.5) / count) ** 0.5)))
+
+
+def _member(rng, sizes):
+    return ADMINS + 1 + rng.randrange(sizes['members'] - ADMINS)
+
+
+def members(rng, count):
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt())  # the app's default cost, shared by all
+    for i in range(count):
+        yield (f'First{i}', rng.choice(SURNAMES), f'{rng.randrange(1, 999)} Street', mob_no(i), f'member{i}@example.com',
+               hashed, 'admin' if i < ADMINS else 'user')
+
+
+def books(rng, count):
+    for i in range(count):
+        title = ' '.join(rng.sample(WORDS, rng.randint(1, 3))).title() + f' {i}'
+        yield (title, rng.choice(CATEGORIES), f'{rng.choice(SURNAMES)} Press', str(rng.randint(1950, 2025)), '1st',
+               rng.randint(1, 8), f'{rng.choice(WORDS).title()} {rng.choice(SURNAMES)}', 0)
+
+
+def issues_and_fines(rng, sizes, today, fines_out):
+    """Yields issued_books rows and appends a fine for about sizes['fines'] of them to `fines_out`."""
+    count, book_count = sizes['issues'], sizes['books']
+    fine_share = sizes['fines'] / max(count, 1)
+    for issue_id in range(1, count + 1):
+        issued = _day(issue_id - 1, count, HISTORY_DAYS, today)
+        due = issued + timedelta(days=14)
+        open_issue = (today - issued).days < 30 and rng.random() < 0.6
+        returned = None if open_issue else min(today, issued + timedelta(days=rng.randint(1, 30)))
+        days_overdue = max(0, ((returned or today) - due).days)
+        # Popular books are borrowed more: skew book ids towards the low end
+        book_id = 1 + int(book_count * rng.random() ** 2)
+        yield (issue_id, _member(rng, sizes), min(book_id, book_count),
+               _timestamp(issued, rng), due.isoformat(), returned and returned.isoformat(), days_overdue)
+        if rng.random() < fine_share:
+            days_late = max(days_overdue, 1)
+            paid = returned is not None and rng.random() < 0.7
+            fines_out.append((issue_id, days_late * 5.0, days_late, 'Paid' if paid else 'Pending',
+                              due.isoformat(), returned.isoformat() if paid else None))
+
+
+def generate(path, sizes, seed=7, today=None, build_recommendations=True):
+    """Builds `path` with the row counts in `sizes`. Returns {table: rows}."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    conn = sqlite3.connect(path)
+    with open(os.path.join(ROOT, 'full_schema.sql')) as f:
+        conn.executescript(f.read())
+    migrate.migrate(conn)
+    search.ensure_search_index(conn)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    deferred = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL").fetchall()
+    for kind, name, _ in deferred:
+        conn.execute(f'DROP {kind.upper()} {name}')
+
+    _insert(conn, 'INSERT INTO member_db (first_name, last_name, address, mob_no, email_id, password, role) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            members(rng, sizes['members']))
+    _insert(conn, 'INSERT INTO book_db (title, category, publisher, year, edition, total_stock, author_name, read_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            books(rng, sizes['books']))
+    fines = []
+    issue_rows = issues_and_fines(rng, sizes, today, fines)
+    while True:
+        # Fines are written after every ten chunks of issues so that they are never held for long
+        written = _insert(conn, 'INSERT INTO issued_books (issue_id, member_id, book_id, issue_date, due_date, return_date, days_overdue) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (row for _, row in zip(range(CHUNK * 10), issue_rows)))
+        conn.executemany('INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date, payment_date) VALUES (?, ?, ?, ?, ?, ?)', fines)
+        fines.clear()
+        if written < CHUNK * 10:
+            break
+
+    def dated(table, days):
+        """(member_id, book_id, timestamp) for each row of `table`, in time order."""
+        count = sizes[table]
+        for i in range(count):
+            yield _member(rng, sizes), 1 + rng.randrange(sizes['books']), _timestamp(_day(i, count, days, today), rng)
+
+    _insert(conn, 'INSERT INTO reservations (member_id, book_id, reserved_date, status) VALUES (?, ?, ?, ?)',
+            ((m, b, at, rng.choice(['active', 'fulfilled', 'fulfilled', 'cancelled']))
+             for m, b, at in dated('reservations', HISTORY_DAYS)))
+    _insert(conn, 'INSERT OR IGNORE INTO wishlist (member_id, book_id, added_date) VALUES (?, ?, ?)',
+            dated('wishlist', HISTORY_DAYS))
+    # One notification in a hundred is a broadcast to admins
+    _insert(conn, 'INSERT INTO notifications (user_id, audience_role, message, is_read, created_at) VALUES (?, ?, ?, ?, ?)',
+            ((None, 'admin', 'Seeded broadcast', 0, at) if rng.random() < 0.01 else
+             (m, None, 'Seeded notification', int(rng.random() < 0.7), at)
+             for m, _, at in dated('notifications', 90)))
+    _insert(conn, 'INSERT INTO user_activity (user_id, action, book_id, created_at) VALUES (?, ?, ?, ?)',
+            ((m, rng.choice(ACTIONS), b, at) for m, b, at in dated('activity', 90)))
+    conn.commit()
+
+    for _, _, sql in deferred:
+        conn.execute(sql)
+    conn.commit()
+    counters.rebuild_availability(conn)
+    counters.rebuild_report_rollups(conn)
+    search.rebuild_search_index(conn)
+    conn.commit()
+    if build_recommendations:
+        recommendations.build(conn, full=True)
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA journal_mode = WAL')
+    counts = {name: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for name, table in TABLES.items()}
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('dir', help='directory to write library.db into')
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    for table in list(SCALES['small']) + list(PER_ISSUE):
+        parser.add_argument(f'--{table}', type=int, help=f'rows of {table} (default: from --scale)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--today', type=date.fromisoformat, help='date the history ends on (default: today)')
+    parser.add_argument('--no-recommendations', action='store_true', help='skip building recommendation neighbours')
+    parser.add_argument('--force', action='store_true', help='replace an existing library.db')
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    sizes.update({table: getattr(args, table) for table in SCALES['small'] if getattr(args, table) is not None})
+    for table, share in PER_ISSUE.items():
+        sizes[table] = getattr(args, table) if getattr(args, table) is not None else int(sizes['issues'] * share)
+
+    os.makedirs(args.dir, exist_ok=True)
+    path = os.path.join(args.dir, 'library.db')
+    if os.path.exists(path):
+        if not args.force:
+            parser.error(f'{path} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    start = time.perf_counter()
+    counts = generate(path, sizes, seed=args.seed, today=args.today, build_recommendations=not args.no_recommendations)
+    print(f"{path} in {time.perf_counter() - start:.1f}s: " + ', '.join(f'{rows} {table}' for table, rows in counts.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
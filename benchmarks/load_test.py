@@ -0,0 +1,273 @@
+"""
+Drives the main routes of the app under gunicorn and reports latency
+percentiles and throughput per route, optionally against a stored baseline.
+
+The server is started on a database made by generate_data.py. Each route is
+then hammered in turn by --concurrency clients for --duration seconds, each
+client with its own keep-alive connection and, except for /login, its own
+logged-in session. Like a browser, clients accept gzip and revalidate the
+JSON they already hold with If-None-Match; --plain turns both off. Bytes are
+counted as received, before decompression:
+
+    python benchmarks/generate_data.py /tmp/load --scale medium
+    python benchmarks/load_test.py /tmp/load --save-baseline benchmarks/load_baseline.json
+    ... change something ...
+    python benchmarks/load_test.py /tmp/load --baseline benchmarks/load_baseline.json
+
+A route regresses when its p95 or bytes per request grow, or its throughput
+falls, by more than
+--tolerance (default 20%) against the baseline; the command then exits 1.
+Baselines only mean something on the machine, data and settings they were
+saved with, which is why none is kept in the repository.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from fixtures import ROOT
+
+from generate_data import ADMINS, PASSWORD, WORDS, mob_no
+
+# name -> (who, method, path); {word} and {prefix} are filled in per request
+ROUTES = {
+    'login': ('anonymous', 'POST', '/login'),
+    'user_dashboard': ('user', 'GET', '/user_dashboard'),
+    'search_books': ('user', 'GET', '/api/search_books?q={word}'),
+    'search_suggestions': ('user', 'GET', '/api/search_suggestions?q={prefix}'),
+    'notifications': ('user', 'GET', '/notifications'),
+    'admin_page': ('admin', 'GET', '/admin_page'),
+    'report_page': ('admin', 'GET', '/report_page'),
+    'manage_return': ('admin', 'GET', '/manage_return'),
+}
+OK_STATUS = {'login': 302}
+
+
+class Client:
+    """
+    One keep-alive connection with its own session cookie. Unless `plain`, it
+    accepts gzip and keeps the last ETag of each path to send back. `received`
+    counts the body bytes of every response.
+    """
+
+    def __init__(self, host, port, plain=False):
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookie = None
+        self.plain = plain
+        self.etags = {}
+        self.received = 0
+
+    def request(self, method, path, form=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        if not self.plain:
+            headers['Accept-Encoding'] = 'gzip'
+            if method == 'GET' and path in self.etags:
+                headers['If-None-Match'] = self.etags[path]
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        self.received += len(response.read())
+        etag = response.getheader('ETag')
+        if etag and not self.plain and method == 'GET':
+            self.etags[path] = etag
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            self.cookie = set_cookie.split(';', 1)[0]
+        return response.status
+
+    def login(self, mob):
+        return self.request('POST', '/login', {'mob_no': mob, 'password': PASSWORD})
+
+
+def start_server(data_dir, port, workers, threads, settings=None):
+    """Starts gunicorn on data_dir/library.db, with `settings` added to its environment, and waits for it."""
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'load-test'), PYTHONPATH=ROOT, **(settings or {}))
+    server = subprocess.Popen(['gunicorn', '--worker-class', 'gthread', '--workers', str(workers), '--threads', str(threads),
+                               '--bind', f'127.0.0.1:{port}', '--chdir', os.path.abspath(data_dir), '--log-level', 'warning',
+                               'app:app'], env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit('gunicorn exited during startup')
+        try:
+            if Client('127.0.0.1', port).request('GET', '/login') == 200:
+                return server
+        except (ConnectionError, socket.timeout, http.client.HTTPException):
+            time.sleep(0.25)
+    server.terminate()
+    raise SystemExit('gunicorn did not answer within 60s')
+
+
+def run_route(name, host, port, concurrency, duration, user_count, seed, plain=False):
+    """
+    Runs one route with `concurrency` clients for `duration` seconds. Returns
+    (latencies in ms, errors, seconds, bytes received, 304 answers).
+    """
+    who, method, template = ROUTES[name]
+    latencies, errors, received, not_modified = [], [0], [0], [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)  # every client has logged in
+    go = threading.Event()
+    stop_at = [0.0]
+
+    def user_mob(rng):
+        return mob_no(ADMINS + 5 + rng.randrange(user_count - ADMINS - 5))
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(host, port, plain)
+        if who == 'user':
+            client.login(user_mob(rng))
+        elif who == 'admin':
+            client.login(mob_no(0))
+        client.conn.close()  # idle while the others log in, past gunicorn's keep-alive; reconnects on first use
+        ready.wait()
+        go.wait()
+        client.received = 0
+        mine, failed, unchanged = [], 0, 0
+        while time.monotonic() < stop_at[0]:
+            word = rng.choice(WORDS)
+            path = template.format(word=word, prefix=word[:rng.randint(2, 4)])
+            began = time.perf_counter()
+            try:
+                if name == 'login':
+                    client.cookie = None
+                    status = client.login(user_mob(rng))
+                else:
+                    status = client.request(method, path)
+            except (ConnectionError, socket.timeout, http.client.HTTPException):
+                client.conn.close()  # reconnects on the next request
+                status = None
+            mine.append((time.perf_counter() - began) * 1000)
+            if status == 304 and not client.plain:
+                unchanged += 1
+            elif status != OK_STATUS.get(name, 200):
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+            received[0] += client.received
+            not_modified[0] += unchanged
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    began = time.monotonic()
+    stop_at[0] = began + duration
+    go.set()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.monotonic() - began, received[0], not_modified[0]
+
+
+def summarize(latencies, errors, seconds, received=0, not_modified=0):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else [latencies[0]] * 99
+    return {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / seconds, 1),
+            'p50': round(cuts[49], 2), 'p95': round(cuts[94], 2), 'p99': round(cuts[98], 2),
+            'kb': round(received / len(latencies) / 1000, 2), 'not_modified': round(not_modified / len(latencies), 3)}
+
+
+def compare(results, baseline, tolerance):
+    """Returns the regressions of `results` against a baseline's routes, as messages."""
+    regressions = []
+    for name, now in results.items():
+        before = baseline['routes'].get(name)
+        if not before:
+            continue
+        if now['p95'] > before['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95']} -> {now['p95']} ms")
+        if now['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']} -> {now['rps']} req/s")
+        if 'kb' in before and now['kb'] > before['kb'] * (1 + tolerance):
+            regressions.append(f"{name}: {before['kb']} -> {now['kb']} kB per request")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', help='directory holding a library.db from generate_data.py')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated subset of: ' + ', '.join(ROUTES))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per route')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='threads per gunicorn worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help='test a server already running at host:port instead of starting one')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--plain', action='store_true', help='send neither Accept-Encoding nor If-None-Match')
+    parser.add_argument('--baseline', help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    routes = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = [name for name in routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    db_path = os.path.join(args.data_dir, 'library.db')
+    with sqlite3.connect(db_path) as conn:
+        sizes = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                 for table in ('member_db', 'book_db', 'issued_books')}
+
+    server = None
+    host, port = '127.0.0.1', args.port
+    if args.url:
+        host, port = args.url.rsplit(':', 1)
+        port = int(port)
+    else:
+        server = start_server(args.data_dir, port, args.workers, args.threads)
+    try:
+        results = {}
+        print(f"{sizes['issued_books']} issues, {sizes['book_db']} books, {sizes['member_db']} members; "
+              f"{args.concurrency} clients, {args.duration:g}s per route")
+        print(f"{'route':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'kB/req':>9}{'304':>7}")
+        for name in routes:
+            latencies, errors, seconds, received, not_modified = run_route(
+                name, host, port, args.concurrency, args.duration, sizes['member_db'], args.seed, args.plain)
+            results[name] = summarize(latencies, errors, seconds, received, not_modified)
+            r = results[name]
+            print(f"{name:<20}{r['requests']:>9}{r['errors']:>8}{r['rps']:>9}{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}"
+                  f"{r['kb']:>9}{r['not_modified']:>7.0%}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    meta = {'sizes': sizes, 'concurrency': args.concurrency, 'duration': args.duration,
+            'workers': args.workers, 'threads': args.threads, 'plain': args.plain}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'meta': meta, 'routes': results}, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+    status = 1 if any(r['errors'] for r in results.values()) else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta') != meta:
+            print(f"warning: baseline was taken with {baseline.get('meta')}")
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
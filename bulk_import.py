@@ -0,0 +1,467 @@
+"""
+Streaming bulk import of books and members from CSV or JSONL.
+Records are read and validated IMPORT_CHUNK_SIZE at a time, and each chunk is
+written with executemany in one transaction, so a file of any size is held in
+memory one chunk at a time and other writers get the database between chunks.
+
+Books are matched on a case-insensitive (title, author_name) key, both
+against the catalog and within the file. By default a match adds its copies
+to the existing book's total_stock ('merge'); 'skip' ignores it instead.
+Members are matched on mob_no and existing ones are skipped. Their passwords
+are hashed in a process pool before the chunk's transaction starts, since
+bcrypt would otherwise keep a single core busy for the whole import. The pool
+is created on first use and shared by every later import in the process.
+Its processes are spawned, not forked, so inside a gunicorn worker they
+inherit none of the worker's threads, locks or sockets (and a script that
+imports from here needs an `if __name__ == '__main__'` guard). Each gunicorn worker
+still gets a pool of its own, so the web app can run up to workers x
+IMPORT_WORKERS hashing processes; size IMPORT_WORKERS for that.
+
+From the command line, secondary indexes and the search index trigger are
+dropped for the length of the import and rebuilt in bulk at the end (unless
+--keep-indexes). What was dropped is recorded in import_deferred, so an
+interrupted import can be put right with --restore. Imports through the web
+app keep them, since members are browsing and searching the catalog meanwhile.
+
+    python bulk_import.py books catalog.csv [--db library.db] [--on-duplicate skip]
+    python bulk_import.py members members.jsonl --workers 8
+    python bulk_import.py --restore
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import bcrypt
+
+import passwords
+
+DEFAULTS = {
+    'IMPORT_CHUNK_SIZE': 5000,     # records validated and written per transaction
+    'IMPORT_WORKERS': 0,           # processes hashing member passwords, per process importing; 0 uses every core
+    'IMPORT_BCRYPT_ROUNDS': passwords.DEFAULTS['BCRYPT_ROUNDS'],  # logins rehash any other cost
+    'IMPORT_MAX_ERRORS': 100,      # invalid rows listed in a report (all are counted)
+}
+
+FORMATS = ('csv', 'jsonl')
+DUPLICATE_MODES = ('merge', 'skip')
+ROLES = ('user', 'admin')
+
+# Dropped while an import runs and recreated afterwards. Anything not listed
+# stays: the dedupe key and mob_no indexes are what the import looks rows up by.
+DEFERRED = {
+    'books': ['idx_book_title', 'idx_book_stock', 'book_search_ai'],
+    'members': ['idx_member_role'],
+}
+
+# Books added while the search index trigger was dropped are indexed in one statement.
+SEARCH_CATCH_UP = '''
+    INSERT INTO book_search (rowid, title, author_name, category)
+    SELECT book_id, title, author_name, category FROM book_db WHERE book_id > ?
+'''
+
+# Repeats idx_book_dedupe_key's expressions exactly, so that lookups use it
+BOOK_KEY_MATCH = "lower(trim({0}.title)) = g.title_key AND lower(trim(COALESCE({0}.author_name, ''))) = g.author_key"
+
+
+PENDING_RESTORE = ('another import is running or an earlier one was interrupted; '
+                   'run `python bulk_import.py --restore` once no import is running')
+
+
+class BulkImportError(ValueError):
+    """Raised for an import that cannot start: unknown kind or format, or a pending restore."""
+
+
+class ImportReport:
+    def __init__(self, kind, max_errors):
+        self.kind = kind
+        self.max_errors = max_errors
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []  # (line, message), the first max_errors of them
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_sec(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'read': self.read,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': [{'line': line, 'error': message} for line, message in self.errors],
+            'seconds': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec),
+        }
+
+    def summary(self):
+        return (f"{self.kind}: {self.read} rows read, {self.inserted} inserted, {self.duplicates} duplicate, "
+                f"{self.invalid} invalid in {self.elapsed:.1f}s ({self.rows_per_sec:.0f} rows/s)")
+
+
+def detect_format(filename, fmt=None):
+    fmt = (fmt or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    fmt = 'jsonl' if fmt == 'ndjson' else fmt
+    if fmt not in FORMATS:
+        raise BulkImportError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def _decoded(stream):
+    for line_no, line in enumerate(stream, 1):
+        try:
+            yield line.decode('utf-8-sig' if line_no == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise BulkImportError(f'line {line_no}: the file is not UTF-8 text') from None
+
+
+def read_records(stream, fmt):
+    """
+    Yields (line number, record dict) from a binary stream of UTF-8 text;
+    unparsable lines yield an error string instead. Raises BulkImportError
+    where the file cannot be read on: bytes that are not UTF-8, or broken
+    CSV quoting.
+    """
+    lines = _decoded(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines, strict=True)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as e:
+            # line_num counts the lines of the records read whole; the broken one starts on the next
+            raise BulkImportError(f'line {reader.line_num + 1}: {e}') from None
+        return
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, 'not valid JSON'
+            continue
+        yield line_no, record if isinstance(record, dict) else 'not a JSON object'
+
+
+def _text(record, field, required=False, limit=500):
+    value = record.get(field)
+    value = ' '.join(str(value).split()) if value is not None else ''
+    if required and not value:
+        raise ValueError(f'{field} is required')
+    if len(value) > limit:
+        raise ValueError(f'{field} is longer than {limit} characters')
+    return value
+
+
+def validate_book(record):
+    """Returns the book_db values for one record, or raises ValueError."""
+    stock = _text(record, 'total_stock') or '1'
+    if not stock.isdigit():
+        raise ValueError('total_stock must be a whole number')
+    year = _text(record, 'year', limit=4)
+    if year and not year.isdigit():
+        raise ValueError('year must be a number')
+    return (_text(record, 'title', required=True), _text(record, 'author_name'), _text(record, 'category'),
+            _text(record, 'publisher'), year, _text(record, 'edition', limit=50), int(stock))
+
+
+def validate_member(record):
+    """Returns the member_db values for one record, with the password still in plain text, or raises ValueError."""
+    mob_no = ''.join(ch for ch in _text(record, 'mob_no', required=True, limit=20) if ch.isdigit() or ch == '+')
+    if len(mob_no.lstrip('+')) < 7:
+        raise ValueError('mob_no must have at least 7 digits')
+    role = _text(record, 'role').lower() or 'user'
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {', '.join(ROLES)}")
+    password = record.get('password')
+    if not password:
+        raise ValueError('password is required')
+    return (_text(record, 'first_name', required=True), _text(record, 'last_name'), _text(record, 'address'),
+            mob_no, _text(record, 'email_id'), str(password), role)
+
+
+def _chunks(records, size):
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validated(chunk, validate, report):
+    rows = []
+    for line_no, record in chunk:
+        report.read += 1
+        if isinstance(record, str):
+            report.reject(line_no, record)
+            continue
+        try:
+            rows.append((line_no, validate(record)))
+        except ValueError as e:
+            report.reject(line_no, str(e))
+    return rows
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool(workers):
+    """This process's hashing pool, created with `workers` processes on first use; later imports reuse it as it is."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Spawned rather than forked: the web worker that may own this has threads.
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+class PasswordHasher:
+    """Hashes passwords on the shared pool of `workers` processes, or inline when there is only one."""
+
+    def __init__(self, workers, rounds):
+        self.workers = workers or os.cpu_count() or 1
+        self.rounds = rounds
+
+    def hash_many(self, passwords):
+        work = partial(hash_password, rounds=self.rounds)
+        if self.workers <= 1:
+            return [work(password) for password in passwords]
+        pool = _shared_pool(self.workers)
+        return list(pool.map(work, passwords, chunksize=max(1, len(passwords) // (self.workers * 4))))
+
+
+def pending_restore(conn):
+    return [row[0] for row in conn.execute('SELECT name FROM import_deferred')]
+
+
+def defer(conn, names):
+    """
+    Drops the named indexes and triggers, recording how to recreate them.
+    import_deferred is checked and claimed in the same write transaction, so
+    of two imports starting together one gets BulkImportError.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if pending_restore(conn):
+            raise BulkImportError(PENDING_RESTORE)
+        dropped = []
+        for name in names:
+            row = conn.execute("SELECT type, sql FROM sqlite_master WHERE name = ? AND type IN ('index', 'trigger')", (name,)).fetchone()
+            if row is None:
+                continue
+            after_id = conn.execute('SELECT COALESCE(MAX(book_id), 0) FROM book_db').fetchone()[0] if name == 'book_search_ai' else None
+            conn.execute('INSERT INTO import_deferred (name, sql, after_id) VALUES (?, ?, ?)', (name, row[1], after_id))
+            dropped.append((row[0], name))
+        for kind, name in dropped:
+            conn.execute(f'DROP {kind.upper()} {name}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def restore_deferred(conn):
+    """Recreates everything in import_deferred, indexing books added meanwhile. Returns the names restored."""
+    restored = []
+    with conn:
+        for name, sql, after_id in conn.execute('SELECT name, sql, after_id FROM import_deferred').fetchall():
+            if not conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (name,)).fetchone():
+                if name == 'book_search_ai':
+                    conn.execute(SEARCH_CATCH_UP, (after_id,))
+                conn.execute(sql)
+            conn.execute('DELETE FROM import_deferred WHERE name = ?', (name,))
+            restored.append(name)
+    return restored
+
+
+def _write_books(conn, rows, on_duplicate):
+    """Writes one validated chunk; returns the number of new books."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''
+            INSERT INTO temp.import_books (line, title, author_name, category, publisher, year, edition, total_stock)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(line,) + values for line, values in rows])
+        # Rows sharing a key become one book: the first row's details with every row's copies.
+        grouped = f'''
+            SELECT title, author_name, category, publisher, year, edition,
+                   {'SUM(total_stock)' if on_duplicate == 'merge' else 'total_stock'} AS copies, MIN(line),
+                   lower(trim(title)) AS title_key, lower(trim(COALESCE(author_name, ''))) AS author_key
+            FROM temp.import_books GROUP BY title_key, author_key
+        '''
+        if on_duplicate == 'merge':
+            conn.execute(f'''
+                UPDATE book_db SET total_stock = book_db.total_stock + g.copies
+                FROM ({grouped}) AS g
+                WHERE {BOOK_KEY_MATCH.format('book_db')}
+            ''')
+        inserted = conn.execute(f'''
+            INSERT INTO book_db (title, author_name, category, publisher, year, edition, total_stock)
+            SELECT title, author_name, category, publisher, year, edition, copies FROM ({grouped}) AS g
+            WHERE NOT EXISTS (SELECT 1 FROM book_db b WHERE {BOOK_KEY_MATCH.format('b')})
+        ''').rowcount
+        conn.execute('DELETE FROM temp.import_books')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return inserted
+
+
+def _write_members(conn, rows, hasher):
+    """Hashes and writes one validated chunk, leaving out mobile numbers already taken; returns the number added."""
+    first = {}
+    for line, values in rows:
+        first.setdefault(values[3], values)
+    mob_nos = list(first)
+    taken = set()
+    for i in range(0, len(mob_nos), 500):
+        batch = mob_nos[i:i + 500]
+        taken.update(row[0] for row in conn.execute(
+            f"SELECT mob_no FROM member_db WHERE mob_no IN ({', '.join('?' for _ in batch)})", batch))
+    new = [values for mob_no, values in first.items() if mob_no not in taken]
+    hashes = hasher.hash_many([values[5] for values in new])
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        inserted = conn.executemany('''
+            INSERT OR IGNORE INTO member_db (first_name, last_name, address, mob_no, email_id, password, role)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [values[:5] + (hashed, values[6]) for values, hashed in zip(new, hashes)]).rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return inserted
+
+
+def run_import(conn, kind, stream, fmt, settings, on_duplicate='merge', defer_indexes=False, on_chunk=None):
+    """
+    Imports `stream` (binary) into book_db or member_db and returns an
+    ImportReport. `on_chunk(report)` is called after each chunk is committed.
+    defer_indexes drops DEFERRED[kind] until the end, which is faster but
+    leaves searches unindexed meanwhile: only for offline imports.
+    """
+    if kind not in DEFERRED:
+        raise BulkImportError(f"kind must be one of {', '.join(DEFERRED)}")
+    if on_duplicate not in DUPLICATE_MODES:
+        raise BulkImportError(f"on_duplicate must be one of {', '.join(DUPLICATE_MODES)}")
+    s = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+    report = ImportReport(kind, s['IMPORT_MAX_ERRORS'])
+    if defer_indexes:
+        defer(conn, DEFERRED[kind])
+    elif pending_restore(conn):
+        raise BulkImportError(PENDING_RESTORE)
+    try:
+        records = _chunks(read_records(stream, fmt), s['IMPORT_CHUNK_SIZE'])
+        if kind == 'books':
+            conn.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS import_books (
+                    line INTEGER, title TEXT, author_name TEXT, category TEXT, publisher TEXT,
+                    year TEXT, edition TEXT, total_stock INTEGER
+                )
+            ''')
+            for chunk in records:
+                rows = _validated(chunk, validate_book, report)
+                inserted = _write_books(conn, rows, on_duplicate) if rows else 0
+                report.inserted += inserted
+                report.duplicates += len(rows) - inserted
+                report.elapsed = time.perf_counter() - report.started
+                if on_chunk:
+                    on_chunk(report)
+            conn.execute('DROP TABLE IF EXISTS temp.import_books')
+        else:
+            hasher = PasswordHasher(s['IMPORT_WORKERS'], s['IMPORT_BCRYPT_ROUNDS'])
+            for chunk in records:
+                rows = _validated(chunk, validate_member, report)
+                inserted = _write_members(conn, rows, hasher) if rows else 0
+                report.inserted += inserted
+                report.duplicates += len(rows) - inserted
+                report.elapsed = time.perf_counter() - report.started
+                if on_chunk:
+                    on_chunk(report)
+    except BulkImportError as e:
+        raise BulkImportError(f'{e} ({report.inserted} records were imported before it)') from None
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if defer_indexes:
+            restore_deferred(conn)
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-imports books or members from CSV or JSONL.')
+    parser.add_argument('kind', nargs='?', choices=list(DEFERRED))
+    parser.add_argument('path', nargs='?', help="file to import, or - for stdin")
+    parser.add_argument('--db', default='library.db')
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--on-duplicate', choices=DUPLICATE_MODES, default='merge')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULTS['IMPORT_CHUNK_SIZE'])
+    parser.add_argument('--workers', type=int, default=DEFAULTS['IMPORT_WORKERS'])
+    parser.add_argument('--bcrypt-rounds', type=int, default=DEFAULTS['IMPORT_BCRYPT_ROUNDS'])
+    parser.add_argument('--keep-indexes', action='store_true', help='maintain indexes row by row instead of rebuilding them')
+    parser.add_argument('--restore', action='store_true', help='recreate what an interrupted import dropped')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.restore:
+            restored = restore_deferred(conn)
+            print(f"Restored: {', '.join(restored)}" if restored else 'Nothing to restore.')
+            if not args.kind:
+                return 0
+        if not args.kind or not args.path:
+            parser.error('kind and path are required')
+        settings = {'IMPORT_CHUNK_SIZE': args.chunk_size, 'IMPORT_WORKERS': args.workers,
+                    'IMPORT_BCRYPT_ROUNDS': args.bcrypt_rounds}
+        fmt = detect_format(args.path if args.path != '-' else '', args.format)
+        stream = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+        try:
+            report = run_import(conn, args.kind, stream, fmt, settings, on_duplicate=args.on_duplicate,
+                                defer_indexes=not args.keep_indexes,
+                                on_chunk=lambda r: print(f"  {r.read} rows, {r.rows_per_sec:.0f} rows/s", file=sys.stderr))
+        finally:
+            stream.close()
+    except BulkImportError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+    print(report.summary())
+    for line, message in report.errors:
+        print(f"  line {line}: {message}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+In-memory keyword matcher for the chatbot's canned responses.
+chatbot_responses is small and read on every message from an unauthenticated
+endpoint, so each worker loads it once and compiles its keywords into an Aho-Corasick
+automaton, which finds every keyword in a message in one pass over it. A
+message gets the response of the longest keyword it contains; ties go to the
+keyword that appears first. Messages that contain no keyword but are part of
+one ("self" for "self development") get the shortest such keyword.
+
+The table is rechecked at most every CHATBOT_RELOAD_INTERVAL seconds: the
+matcher's own connection reports a new PRAGMA data_version whenever another
+connection has committed, and only then is the table_versions counter read,
+and the rows only if it moved. Between checks a message is answered without
+touching the database.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULTS = {
+    'CHATBOT_RELOAD_INTERVAL': 1.0,  # seconds between checks for edited responses
+}
+
+FALLBACK = ("I'm sorry, I don't have information on that. Please ask about library hours, fines, "
+            "renewals, book search, or borrowing limits.")
+
+# Messages with any of these are book searches rather than keyword lookups
+SEARCH_WORDS = ('find book', 'search book', 'book by', 'author', 'category', 'title')
+SEARCH_TERM_RE = re.compile(r'(?:book|author|category|title)[:\s]+([\w\s]+)')
+
+
+def search_term(message):
+    """The part of a book-search message after 'book', 'author', ... or the whole message."""
+    match = SEARCH_TERM_RE.search(message)
+    return match.group(1).strip() if match else message
+
+
+class Automaton:
+    """Aho-Corasick automaton over a set of keywords."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._longest = [None]  # longest keyword ending at each state
+        for keyword in keywords:
+            state = 0
+            for ch in keyword:
+                following = self._goto[state].get(ch)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][ch] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._longest.append(None)
+                state = following
+            self._longest[state] = keyword
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(ch, 0)
+                if self._longest[following] is None:
+                    self._longest[following] = self._longest[self._fail[following]]
+
+    def longest_match(self, text):
+        """The longest keyword in `text`, the first one on ties, or None."""
+        goto, fail, longest = self._goto, self._fail, self._longest
+        best = None
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = longest[state]
+            if found is not None and (best is None or len(found) > len(best)):
+                best = found
+        return best
+
+
+class KeywordMatcher:
+    def __init__(self, connect, settings):
+        self._connect = connect
+        self.interval = settings.get('CHATBOT_RELOAD_INTERVAL', DEFAULTS['CHATBOT_RELOAD_INTERVAL'])
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._data_version = None
+        self._table_version = None
+        self._checked_at = float('-inf')
+        self.loads = 0
+        self._set_rows([])
+
+    def _set_rows(self, rows):
+        """Compiles (id, keyword, response) rows. Swapped in as one tuple so readers never see half of it."""
+        keywords = {}
+        for _, keyword, response in rows:
+            keywords.setdefault(keyword.lower(), response)
+        # Keywords joined into one string, to find those containing a message with str.find
+        joined, offsets = '', []
+        for keyword in keywords:
+            offsets.append(len(joined))
+            joined += keyword + '\n'
+        self._compiled = (Automaton(keywords), keywords, list(keywords), joined, offsets,
+                          [{'id': id, 'keyword': keyword, 'response': response} for id, keyword, response in rows])
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < self.interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.interval:
+                return
+            if self._pid != os.getpid():
+                # A connection inherited from the parent process must not be used
+                self._conn, self._pid, self._data_version = self._connect(), os.getpid(), None
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                row = self._conn.execute("SELECT version FROM table_versions WHERE name = 'chatbot_responses'").fetchone()
+                table_version = row[0] if row else None
+                if table_version != self._table_version or table_version is None:
+                    self._table_version = table_version
+                    self._set_rows(self._conn.execute('SELECT id, keyword, response FROM chatbot_responses ORDER BY id').fetchall())
+                    self.loads += 1
+            self._checked_at = time.monotonic()
+
+    def match(self, message):
+        """Returns the response for a lowercased message, or None."""
+        self._refresh()
+        automaton, keywords, ordered, joined, offsets, _ = self._compiled
+        if not message:
+            return None
+        best = automaton.longest_match(message)
+        if best is None and '\n' not in message:
+            at = joined.find(message)
+            while at != -1:
+                index = bisect.bisect_right(offsets, at) - 1
+                if best is None or len(ordered[index]) < len(best):
+                    best = ordered[index]
+                at = joined.find(message, offsets[index] + len(ordered[index]) + 1)
+        return keywords[best] if best is not None else None
+
+    def rows(self):
+        """Every response as a dict of id, keyword and response, in id order."""
+        self._refresh()
+        return self._compiled[5]
@@ -0,0 +1,95 @@
+"""
+Response compression.
+Text responses of at least COMPRESS_MIN_SIZE bytes are compressed after the
+view returns, with brotli when the client takes it and the brotli module is
+installed, otherwise with gzip. Streamed responses, files sent by
+send_file() and anything already encoded (the precompressed /assets/ files)
+pass through untouched.
+
+A compressed body is a different representation, so a strong ETag gets the
+encoding appended ("n5-12" becomes "n5-12-gz"). conditional_json() accepts
+either form back in If-None-Match, and a 304 repeats the one the client
+sent.
+"""
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+DEFAULTS = {
+    'COMPRESS_MIN_SIZE': 1024,        # bytes; smaller bodies gain less than the headers cost
+    'COMPRESS_GZIP_LEVEL': 3,         # the dashboard's HTML: a third of level 6's time, 12% larger
+    'COMPRESS_BROTLI_QUALITY': 4,     # 11 is for build-time assets; 4 is about as fast, and smaller
+}
+
+MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript', 'image/svg+xml'}
+SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+
+def etag_variants(etag):
+    """`etag` and its compressed forms."""
+    return [etag] + [etag + suffix for suffix in SUFFIXES.values()]
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header holds `etag` in any encoding."""
+    return any(if_none_match.contains(tag) for tag in etag_variants(etag))
+
+
+class Compressor:
+    def __init__(self, settings):
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _encoding(self, request):
+        if brotli is not None and request.accept_encodings.quality('br') > 0:
+            return 'br'
+        if request.accept_encodings.quality('gzip') > 0:
+            return 'gzip'
+        return None
+
+    def process(self, request, response):
+        """Compresses `response` in place when the client and the response allow it. Returns it."""
+        etag, weak = response.get_etag()
+        if response.status_code == 304:
+            if etag and not weak and request.if_none_match:
+                # Echo the variant the client holds so that it keeps its copy
+                for tag in etag_variants(etag):
+                    if request.if_none_match.contains(tag):
+                        response.set_etag(tag)
+                        break
+            return response
+        if (response.mimetype not in MIMETYPES or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.cache_control.no_transform):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding(request)
+        if encoding is None or response.status_code != 200:
+            return response
+        body = response.get_data()
+        if len(body) < self.settings['COMPRESS_MIN_SIZE']:
+            return response
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.settings['COMPRESS_BROTLI_QUALITY'])
+        else:
+            compressed = gzip.compress(body, self.settings['COMPRESS_GZIP_LEVEL'], mtime=0)
+        response.set_data(compressed)
+        response.content_encoding = encoding
+        if etag and not weak:
+            response.set_etag(etag + SUFFIXES[encoding])
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'compressed': self.compressed, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                    'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0}
@@ -0,0 +1,63 @@
+"""
+Denormalized counters and report rollups maintained by triggers, and the commands that rebuild
+them in bulk if they ever drift (e.g. after editing the database by hand).
+
+    python counters.py [path/to/library.db]
+"""
+import sqlite3
+import sys
+
+
+def rebuild_availability(conn):
+    """Recomputes book_db.active_issue_count from issued_books in bulk. Returns the number of books corrected."""
+    before = conn.total_changes
+    conn.execute('''
+        UPDATE book_db SET active_issue_count = 0
+        WHERE active_issue_count != 0
+          AND book_id NOT IN (SELECT book_id FROM issued_books WHERE return_date IS NULL)
+    ''')
+    conn.execute('''
+        UPDATE book_db SET active_issue_count = open_issues.cnt
+        FROM (SELECT book_id, COUNT(*) AS cnt FROM issued_books WHERE return_date IS NULL GROUP BY book_id) AS open_issues
+        WHERE book_db.book_id = open_issues.book_id AND book_db.active_issue_count != open_issues.cnt
+    ''')
+    conn.commit()
+    return conn.total_changes - before
+
+
+REPORT_ROLLUPS = ['report_daily', 'report_monthly', 'report_book_borrows', 'report_member_borrows',
+                  'report_category_borrows', 'report_author_borrows']
+
+
+def rebuild_report_rollups(conn):
+    """Recomputes the report_* rollup tables from issued_books and fines. Returns the number of rollup rows written."""
+    for table in REPORT_ROLLUPS:
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute("INSERT INTO report_daily (day, borrows) SELECT SUBSTR(issue_date, 1, 10), COUNT(*) FROM issued_books GROUP BY 1")
+    conn.execute('''
+        INSERT INTO report_daily (day, fines_collected, fines_paid)
+        SELECT SUBSTR(payment_date, 1, 10), SUM(fine_amount), COUNT(*) FROM fines
+        WHERE status = 'Paid' AND payment_date IS NOT NULL GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET fines_collected = excluded.fines_collected, fines_paid = excluded.fines_paid
+    ''')
+    conn.execute('''
+        INSERT INTO report_monthly (month, borrows, fines_collected, fines_paid)
+        SELECT SUBSTR(day, 1, 7), SUM(borrows), SUM(fines_collected), SUM(fines_paid) FROM report_daily GROUP BY 1
+    ''')
+    conn.execute("INSERT INTO report_book_borrows (book_id, borrows) SELECT book_id, COUNT(*) FROM issued_books GROUP BY book_id")
+    conn.execute("INSERT INTO report_member_borrows (member_id, borrows) SELECT member_id, COUNT(*) FROM issued_books GROUP BY member_id")
+    for table, column in (('report_category_borrows', 'category'), ('report_author_borrows', 'author_name')):
+        conn.execute(f'''
+            INSERT INTO {table} ({column}, borrows)
+            SELECT COALESCE(b.{column}, ''), SUM(r.borrows) FROM report_book_borrows r JOIN book_db b ON r.book_id = b.book_id GROUP BY 1
+        ''')
+    conn.commit()
+    return sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in REPORT_ROLLUPS)
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'library.db'
+    with sqlite3.connect(db_path) as conn:
+        fixed = rebuild_availability(conn)
+        rollup_rows = rebuild_report_rollups(conn)
+    print(f"Reconciled availability counters: {fixed} book(s) corrected.")
+    print(f"Rebuilt report rollups: {rollup_rows} row(s).")
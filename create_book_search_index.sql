@@ -0,0 +1,26 @@
+-- Full-text search index over the book catalog (SQLite FTS5).
+-- book_search is an external-content table: it stores only the index, the
+-- text itself stays in book_db. The triggers keep it in sync on every write.
+CREATE VIRTUAL TABLE IF NOT EXISTS book_search USING fts5(
+    title, author_name, category,
+    content='book_db', content_rowid='book_id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS book_search_ai AFTER INSERT ON book_db BEGIN
+    INSERT INTO book_search (rowid, title, author_name, category)
+    VALUES (new.book_id, new.title, new.author_name, new.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_ad AFTER DELETE ON book_db BEGIN
+    INSERT INTO book_search (book_search, rowid, title, author_name, category)
+    VALUES ('delete', old.book_id, old.title, old.author_name, old.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_au AFTER UPDATE OF title, author_name, category ON book_db BEGIN
+    INSERT INTO book_search (book_search, rowid, title, author_name, category)
+    VALUES ('delete', old.book_id, old.title, old.author_name, old.category);
+    INSERT INTO book_search (rowid, title, author_name, category)
+    VALUES (new.book_id, new.title, new.author_name, new.category);
+END;
@@ -0,0 +1,59 @@
+"""
+Header tiles of the admin pages (admin_page, manage_fine, manage_return).
+Every tile is computed by one statement of index-backed scalar subqueries, and
+the result is cached per worker for DASHBOARD_CACHE_TTL seconds. The routes
+that issue, return, pay or delete fines, reserve, or add and remove books and
+members invalidate it, so their own worker shows the change at once and other
+workers within the TTL.
+"""
+import threading
+import time
+from datetime import date
+
+TILES_SQL = '''
+    SELECT
+        (SELECT COUNT(*) FROM book_db) AS total_books,
+        (SELECT COUNT(*) FROM member_db WHERE role = 'user') AS total_users,
+        (SELECT COUNT(*) FROM issued_books) AS total_issues,
+        (SELECT COUNT(*) FROM issued_books WHERE return_date IS NULL) AS pending_issues,
+        (SELECT COUNT(*) FROM issued_books WHERE return_date IS NULL AND due_date = :today) AS due_today,
+        (SELECT COUNT(*) FROM issued_books WHERE return_date IS NULL AND due_date < :today) AS overdue,
+        (SELECT COUNT(*) FROM fines) AS total_fines,
+        (SELECT COUNT(*) FROM fines WHERE status = 'Pending') AS pending_fines,
+        (SELECT COUNT(*) FROM fines WHERE status = 'Paid') AS paid_fines,
+        (SELECT COALESCE(SUM(fine_amount), 0) FROM fines WHERE status = 'Pending') AS pending_fine_amount,
+        (SELECT COUNT(*) FROM reservations WHERE status = 'active') AS pending_reservations
+'''
+
+
+def load_tiles(db, today):
+    """Computes every tile as a dict; completed_returns is derived rather than counted."""
+    tiles = dict(db.execute(TILES_SQL, {'today': today.isoformat()}).fetchone())
+    tiles['completed_returns'] = tiles['total_issues'] - tiles['pending_issues']
+    return tiles
+
+
+class DashboardMetrics:
+    def __init__(self, ttl=15):
+        self.ttl = ttl
+        self._entry = None  # (expires_at, day, tiles)
+        self._generation = 0  # bumped by invalidate() so a read racing a write is not cached
+        self._lock = threading.Lock()
+
+    def get(self, db):
+        """Returns the tiles, reading them only when the cached ones expired or the day changed."""
+        today = date.today()
+        with self._lock:
+            entry, generation = self._entry, self._generation
+        if entry is not None and entry[0] >= time.monotonic() and entry[1] == today:
+            return entry[2]
+        tiles = load_tiles(db, today)
+        with self._lock:
+            if generation == self._generation:
+                self._entry = (time.monotonic() + self.ttl, today, tiles)
+        return tiles
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+            self._generation += 1
@@ -0,0 +1,130 @@
+"""
+Per-process pool of SQLite connections.
+Connections are opened once with WAL journaling and the tuned pragmas below,
+handed to one request at a time by get_db() and returned at teardown, so
+requests no longer pay for opening the file, reading the schema and warming
+an empty statement cache.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULTS = {
+    'DB_POOL_SIZE': 8,                 # idle connections kept per worker; 0 disables pooling
+    'DB_POOL_HEALTH_CHECK': 30,        # seconds idle before a connection is pinged on checkout
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_CACHE_SIZE_KB': 16384,
+    'SQLITE_MMAP_SIZE': 64 * 1024 * 1024,
+    'SQLITE_CACHED_STATEMENTS': 256,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self._idle = []  # (connection, time it was returned)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def connect(self):
+        s = self.settings
+        conn = sqlite3.connect(self.path, timeout=s['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+                               cached_statements=s['SQLITE_CACHED_STATEMENTS'], check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f"PRAGMA busy_timeout = {int(s['SQLITE_BUSY_TIMEOUT_MS'])}")
+        conn.execute(f"PRAGMA cache_size = -{int(s['SQLITE_CACHE_SIZE_KB'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(s['SQLITE_MMAP_SIZE'])}")
+        return conn
+
+    def acquire(self):
+        """Returns an idle connection if a healthy one is available, else a new one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self.misses += 1
+                    self.in_use += 1
+                    break
+                conn, returned_at = self._idle.pop()
+            if time.monotonic() - returned_at < self.settings['DB_POOL_HEALTH_CHECK'] or self._healthy(conn):
+                with self._lock:
+                    self.hits += 1
+                    self.in_use += 1
+                return conn
+            self._discard(conn)
+        return self.connect()
+
+    def release(self, conn):
+        """Takes a connection back, rolling back anything the request left uncommitted."""
+        with self._lock:
+            self.in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.set_trace_callback(None)
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.settings['DB_POOL_SIZE']:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'discarded': self.discarded,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+            }
+
+    def _healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def get_pool(path, settings):
+    """
+    Returns this process's pool for `path`. Pools are keyed by pid as well so a
+    gunicorn worker forked from a preloaded master never reuses the master's
+    connections.
+    """
+    key = (os.getpid(), path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(path, settings)
+    return pool
@@ -0,0 +1,164 @@
+"""
+Server-Sent Events hub for notifications and the activity feed.
+Each worker runs one watcher thread while it has subscribers. The watcher
+checks PRAGMA data_version, which changes whenever any connection in any
+process commits, and only then reads the rows added since its last look. New
+rows are handed to the matching subscribers' queues, so a database write in
+one gunicorn worker reaches streams held open by every other worker at the
+cost of one cheap query per worker per interval instead of one poll per
+open dashboard.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+DEFAULTS = {
+    'SSE_POLL_INTERVAL': 0.5,      # seconds between data_version checks
+    'SSE_HEARTBEAT': 15,           # seconds between keepalive comments on an idle stream
+    'SSE_STREAM_SECONDS': 300,     # a stream is closed after this and the browser reconnects
+    'SSE_MAX_SUBSCRIBERS': 48,     # open streams per worker before new ones get a 503; keep
+                                   # below the worker's thread count (Procfile) so requests still run
+    'SSE_QUEUE_SIZE': 100,         # events buffered per stream before it is closed
+}
+
+# latest(conn) returns the newest row id; fetch(conn, after_id, limit) returns
+# [(row_id, audience, payload)] for rows after it, in id order. An audience is
+# ('user', member_id) or ('role', role).
+Source = namedtuple('Source', 'name latest fetch')
+
+FETCH_LIMIT = 500
+RETRY_MS = 3000  # how soon the browser reconnects after a stream ends
+
+log = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, member_id, role, size):
+        self.member_id = member_id
+        self.role = role
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+
+    def wants(self, audience):
+        kind, value = audience
+        return value == (self.member_id if kind == 'user' else self.role)
+
+
+def format_event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+class EventHub:
+    def __init__(self, connect, sources, settings):
+        self._connect = connect
+        self.sources = sources
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self._subscribers = set()
+        self._cond = threading.Condition()
+        self._pid = None
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, member_id, role):
+        """Returns a Subscription, or None when this worker has no room for another stream."""
+        with self._cond:
+            if len(self._subscribers) >= self.settings['SSE_MAX_SUBSCRIBERS']:
+                return None
+            sub = Subscription(member_id, role, self.settings['SSE_QUEUE_SIZE'])
+            self._subscribers.add(sub)
+            self._ensure_started()
+            self._cond.notify()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._cond:
+            self._subscribers.discard(sub)
+
+    def publish(self, name, audience, payload):
+        with self._cond:
+            targets = [sub for sub in self._subscribers if sub.wants(audience)]
+            self.published += 1
+        for sub in targets:
+            try:
+                sub.queue.put_nowait((name, payload))
+            except queue.Full:
+                # A client this far behind resyncs on reconnect instead.
+                sub.overflowed = True
+                with self._cond:
+                    self.overflows += 1
+
+    def stream(self, sub):
+        """Yields the SSE body for one subscription and unsubscribes when it ends."""
+        s = self.settings
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            deadline = time.monotonic() + s['SSE_STREAM_SECONDS']
+            while not sub.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    name, payload = sub.queue.get(timeout=min(s['SSE_HEARTBEAT'], remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(name, payload)
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'overflows': self.overflows,
+            }
+
+    def _ensure_started(self):
+        # Called with the condition held; one watcher per process, as with
+        # the pools, so forked workers start their own.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            threading.Thread(target=self._run, name='event-hub', daemon=True).start()
+
+    def _wait_for_subscribers(self):
+        with self._cond:
+            idle = not self._subscribers
+            while not self._subscribers:
+                self._cond.wait()
+        return idle
+
+    def _run(self):
+        conn = None
+        cursors = {}
+        version = None
+        while True:
+            try:
+                if self._wait_for_subscribers() or conn is None:
+                    # Nobody was listening, so nothing before now is replayed;
+                    # clients catch up with a fetch when their stream opens.
+                    conn = conn or self._connect()
+                    cursors = {source.name: source.latest(conn) or 0 for source in self.sources}
+                    version = conn.execute('PRAGMA data_version').fetchone()[0]
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current != version:
+                    version = current
+                    for source in self.sources:
+                        while True:
+                            rows = source.fetch(conn, cursors[source.name], FETCH_LIMIT)
+                            for row_id, audience, payload in rows:
+                                cursors[source.name] = row_id
+                                self.publish(source.name, audience, payload)
+                            if len(rows) < FETCH_LIMIT:
+                                break
+            except Exception:
+                log.exception('event hub watcher failed; reconnecting')
+                if conn is not None:
+                    conn.close()
+                conn = None
+            time.sleep(self.settings['SSE_POLL_INTERVAL'])
@@ -0,0 +1,296 @@
+"""
+Nightly maintenance jobs, each one set-based statement or two run in its own
+transaction:
+  days_overdue     refreshes issued_books.days_overdue for every open issue
+  fines            creates or updates the Pending fine of every overdue open issue
+  reminders        notifies members of books due tomorrow and of overdue books
+  recommendations  recomputes co-borrow neighbours of books with new borrows
+Every job can be rerun safely: values are recomputed rather than added to,
+and sent reminders are recorded in issue_reminders. A job that runs past
+MAINTENANCE_TIMEOUT seconds is interrupted and rolled back.
+
+The jobs run from this command, e.g. against a copy of the production
+database with --dry-run to see what would change:
+
+    python maintenance.py [path/to/library.db] [--job fines] [--today YYYY-MM-DD] [--dry-run]
+
+or, with MAINTENANCE_SCHEDULER=1, from a background thread in each worker that
+runs them once a day after MAINTENANCE_HOUR. Workers claim the day in
+maintenance_runs first, so only one of them does the work.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import notifier
+import recommendations
+
+DEFAULTS = {
+    'MAINTENANCE_SCHEDULER': 0,        # 1 runs the nightly jobs from a background thread
+    'MAINTENANCE_HOUR': 2,             # local hour of the day after which they run
+    'MAINTENANCE_TIMEOUT': 60,         # seconds a job may take before it is rolled back
+    'MAINTENANCE_CHECK_INTERVAL': 300, # seconds between the scheduler's checks
+}
+
+FINE_PER_DAY = 5
+OVERDUE_REMINDER_DAYS = 7  # an overdue book is reminded about at most this often
+PROGRESS_STEPS = 10000     # VM instructions between time-box checks
+
+log = logging.getLogger(__name__)
+
+
+class JobTimeout(Exception):
+    """Raised when a job runs past its time box; its transaction was rolled back."""
+
+
+def update_days_overdue(conn, today):
+    """Sets days_overdue of open issues as of `today`. Returns the number of issues changed."""
+    return conn.execute('''
+        UPDATE issued_books
+        SET days_overdue = MAX(0, CAST(JULIANDAY(:today) - JULIANDAY(due_date) AS INTEGER))
+        WHERE return_date IS NULL
+          AND days_overdue != MAX(0, CAST(JULIANDAY(:today) - JULIANDAY(due_date) AS INTEGER))
+    ''', {'today': today.isoformat()}).rowcount
+
+
+class DaysOverdueRefresher:
+    """
+    Runs update_days_overdue on read, at most once a day per process, so that
+    listings reading issued_books.days_overdue are current on days the nightly
+    jobs have not run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._as_of = None
+
+    def ensure(self, conn, today=None):
+        today = today or date.today()
+        if self._as_of == today:
+            return
+        with self._lock:
+            if self._as_of != today:
+                update_days_overdue(conn, today)
+                conn.commit()
+                self._as_of = today
+
+
+def accrue_fines(conn, today, issue_id=None):
+    """
+    Brings the Pending fine of each overdue open issue, or of `issue_id` alone,
+    to FINE_PER_DAY per day overdue less what was already paid for it, creating
+    the fine if there is none. Reads days_overdue, so it runs after
+    update_days_overdue. Returns the number of fines created or changed.
+    """
+    where = 'ib.issue_id = :issue_id' if issue_id is not None else 'ib.return_date IS NULL AND ib.days_overdue > 0'
+    owed = f'''
+        (SELECT ib.issue_id, ib.days_overdue AS days_late,
+                ib.days_overdue * :per_day - COALESCE((SELECT SUM(f.fine_amount) FROM fines f
+                                                       WHERE f.issue_id = ib.issue_id AND f.status = 'Paid'), 0) AS amount
+         FROM issued_books ib
+         WHERE {where}) AS owed
+    '''
+    params = {'per_day': FINE_PER_DAY, 'today': today.isoformat(), 'issue_id': issue_id}
+    # idx_fines_pending_issue keeps one Pending fine per issue; a skipped update is not counted
+    return conn.execute(f'''
+        INSERT INTO fines (issue_id, fine_amount, days_late, status, fine_date)
+        SELECT issue_id, amount, days_late, 'Pending', :today FROM {owed}
+        WHERE amount > 0
+        ON CONFLICT (issue_id) WHERE status = 'Pending' DO UPDATE
+        SET fine_amount = excluded.fine_amount, days_late = excluded.days_late
+        WHERE fine_amount != excluded.fine_amount OR days_late != excluded.days_late
+    ''', params).rowcount
+
+
+def send_reminders(conn, today):
+    """Queues due-tomorrow and overdue notifications not already sent. Returns the number sent."""
+    due_soon = conn.execute('''
+        SELECT ib.issue_id, ib.member_id, ib.due_date, b.title
+        FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id
+        WHERE ib.return_date IS NULL AND ib.due_date = :tomorrow
+          AND NOT EXISTS (SELECT 1 FROM issue_reminders r
+                          WHERE r.issue_id = ib.issue_id AND r.kind = 'due_soon' AND r.sent_on >= :today)
+    ''', {'today': today.isoformat(), 'tomorrow': (today + timedelta(days=1)).isoformat()}).fetchall()
+    overdue = conn.execute('''
+        SELECT ib.issue_id, ib.member_id, ib.days_overdue, b.title
+        FROM issued_books ib JOIN book_db b ON ib.book_id = b.book_id
+        WHERE ib.return_date IS NULL AND ib.due_date < :today
+          AND NOT EXISTS (SELECT 1 FROM issue_reminders r
+                          WHERE r.issue_id = ib.issue_id AND r.kind = 'overdue' AND r.sent_on > :since)
+    ''', {'today': today.isoformat(), 'since': (today - timedelta(days=OVERDUE_REMINDER_DAYS)).isoformat()}).fetchall()
+
+    messages = [(row['member_id'], f"Reminder: '{row['title']}' is due back tomorrow ({row['due_date']}).") for row in due_soon]
+    messages += [(row['member_id'], f"'{row['title']}' is {row['days_overdue']} day(s) overdue. "
+                                    f"A fine of ₹{FINE_PER_DAY} per day applies until it is returned.") for row in overdue]
+    notifier.send(conn, messages=messages, commit=False)
+    conn.executemany('''
+        INSERT INTO issue_reminders (issue_id, kind, sent_on) VALUES (?, ?, ?)
+        ON CONFLICT (issue_id, kind) DO UPDATE SET sent_on = excluded.sent_on
+    ''', [(row['issue_id'], 'due_soon', today.isoformat()) for row in due_soon]
+       + [(row['issue_id'], 'overdue', today.isoformat()) for row in overdue])
+    return len(messages)
+
+
+def plan_recommendations(conn, today):
+    return recommendations.plan(conn)
+
+
+def refresh_recommendations(conn, today, plan):
+    """Brings book_neighbours up to date with issues since the last build. Returns the number of books recomputed."""
+    return recommendations.apply(conn, plan)
+
+
+# In run order: fines and reminders read the days_overdue the first job writes.
+JOBS = {
+    'days_overdue': update_days_overdue,
+    'fines': accrue_fines,
+    'reminders': send_reminders,
+    'recommendations': refresh_recommendations,
+}
+# Read-only work done before a job takes the write lock; its result is passed to the job
+PREPARE = {
+    'recommendations': plan_recommendations,
+}
+
+
+def run_job(conn, name, today, timeout, commit=True):
+    """
+    Runs one job and returns its row count. Its PREPARE step, if any, runs
+    first and outside the write transaction. The job then starts a
+    transaction unless one is open and commits it unless commit=False; on
+    failure or timeout the transaction is rolled back.
+    """
+    deadline = time.monotonic() + timeout
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+    try:
+        prepared = ()
+        if name in PREPARE:
+            prepared = (PREPARE[name](conn, today),)
+            if time.monotonic() > deadline:
+                raise JobTimeout(f'{name} ran past {timeout}s')
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        rows = JOBS[name](conn, today, *prepared)
+        if commit:
+            conn.commit()
+        return rows
+    except sqlite3.OperationalError:
+        conn.rollback()
+        if time.monotonic() > deadline:
+            raise JobTimeout(f'{name} ran past {timeout}s and was rolled back')
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def run_all(conn, today, timeout, jobs=None, dry_run=False):
+    """
+    Runs `jobs` (default: all, in order) and returns {job: rows changed, or
+    'timeout'}. A dry run keeps every job in one transaction, so later jobs
+    see what earlier ones did, and rolls it back at the end.
+    """
+    summary = {}
+    for name in jobs or JOBS:
+        try:
+            summary[name] = run_job(conn, name, today, timeout, commit=not dry_run)
+        except JobTimeout:
+            log.warning('maintenance job %s timed out after %ss', name, timeout)
+            summary[name] = 'timeout'
+    if dry_run:
+        conn.rollback()
+    return summary
+
+
+def _timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def record_run(conn, today, started_at, summary):
+    conn.execute('''
+        INSERT INTO maintenance_runs (run_on, started_at, finished_at, summary) VALUES (?, ?, ?, ?)
+        ON CONFLICT (run_on) DO UPDATE SET finished_at = excluded.finished_at, summary = excluded.summary
+    ''', (today.isoformat(), started_at, _timestamp(), json.dumps(summary)))
+    conn.commit()
+
+
+class Scheduler:
+    def __init__(self, connect, settings):
+        self._connect = connect
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """Starts this process's scheduler thread unless it has one. Cheap enough to call on every request."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='maintenance', daemon=True).start()
+
+    def run_if_due(self, now=None):
+        """Runs the jobs if today's run is due and no worker has claimed it. Returns the summary, or None."""
+        now = now or datetime.now()
+        if now.hour < self.settings['MAINTENANCE_HOUR']:
+            return None
+        today = now.date()
+        conn = self._connect()
+        try:
+            started_at = _timestamp()
+            claimed = conn.execute('INSERT OR IGNORE INTO maintenance_runs (run_on, started_at) VALUES (?, ?)',
+                                   (today.isoformat(), started_at)).rowcount
+            conn.commit()
+            if not claimed:
+                return None
+            summary = run_all(conn, today, self.settings['MAINTENANCE_TIMEOUT'])
+            record_run(conn, today, started_at, summary)
+            log.info('maintenance run for %s: %s', today, summary)
+            return summary
+        finally:
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_if_due()
+            except Exception:
+                log.exception('maintenance run failed')
+            time.sleep(self.settings['MAINTENANCE_CHECK_INTERVAL'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the nightly maintenance jobs.')
+    parser.add_argument('db_path', nargs='?', default='library.db')
+    parser.add_argument('--job', action='append', choices=list(JOBS), help='run only this job (repeatable)')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(), help='run as of this date (YYYY-MM-DD)')
+    parser.add_argument('--timeout', type=float, default=DEFAULTS['MAINTENANCE_TIMEOUT'])
+    parser.add_argument('--dry-run', action='store_true', help='roll every job back instead of committing')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        started_at = _timestamp()
+        summary = run_all(conn, args.today, args.timeout, jobs=[name for name in JOBS if name in (args.job or JOBS)],
+                          dry_run=args.dry_run)
+        if not args.dry_run:
+            record_run(conn, args.today, started_at, summary)
+    finally:
+        conn.close()
+    for name, rows in summary.items():
+        print(f"{name}: {rows}{' (rolled back)' if args.dry_run and rows != 'timeout' else ''}")
+    return 1 if 'timeout' in summary.values() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Cache of logged-in member records keyed by mob_no.
+Entries are plain dicts without the password hash. They expire after a TTL so
+that edits made through another worker are eventually seen, and the routes
+that write member_db invalidate them immediately in their own worker.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MEMBER_COLUMNS = ('member_id', 'first_name', 'last_name', 'address', 'mob_no', 'email_id', 'role', 'profile_pic')
+
+
+class MemberCache:
+    def __init__(self, ttl=60, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # mob_no -> (expires_at, member)
+        self._lock = threading.Lock()
+
+    def get(self, mob_no):
+        with self._lock:
+            entry = self._entries.get(mob_no)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[mob_no]
+                return None
+            self._entries.move_to_end(mob_no)
+            return entry[1]
+
+    def put(self, mob_no, member):
+        with self._lock:
+            self._entries[mob_no] = (time.monotonic() + self.ttl, member)
+            self._entries.move_to_end(mob_no)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, mob_no=None, member_id=None):
+        """Drops the entry for a mobile number and/or a member id."""
+        with self._lock:
+            if mob_no is not None:
+                self._entries.pop(mob_no, None)
+            if member_id is not None:
+                member_id = int(member_id)
+                for key in [k for k, (_, m) in self._entries.items() if m['member_id'] == member_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def load_member(db, mob_no):
+    """Reads one member from the database as a cacheable dict, or None."""
+    row = db.execute(f"SELECT {', '.join(MEMBER_COLUMNS)} FROM member_db WHERE mob_no = ?", (mob_no,)).fetchone()
+    return {column: row[column] for column in MEMBER_COLUMNS} if row else None
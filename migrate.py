@@ -0,0 +1,50 @@
+"""
+Versioned schema migrations for the SQLite database.
+Migrations live in migrations/ as NNNN_description.sql and are applied in
+order, each in its own transaction. The number of the last applied
+migration is kept in PRAGMA user_version.
+
+    python migrate.py [path/to/library.db]
+"""
+import os
+import re
+import sqlite3
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+_NAME_RE = re.compile(r'^(\d{4})_[\w-]+\.sql$')
+
+
+def available_migrations():
+    """Returns [(version, path)] for every migration file, oldest first."""
+    migrations = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        match = _NAME_RE.match(name)
+        if match:
+            migrations.append((int(match.group(1)), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(migrations)
+
+
+def migrate(conn):
+    """Applies every migration newer than the database's user_version. Returns the versions applied."""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    applied = []
+    for version, path in available_migrations():
+        if version <= current:
+            continue
+        with open(path, 'r') as f:
+            script = f.read()
+        try:
+            conn.executescript(f'BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;')
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'library.db'
+    with sqlite3.connect(db_path) as conn:
+        applied = migrate(conn)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date.")
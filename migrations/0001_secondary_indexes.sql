@@ -0,0 +1,38 @@
+-- Secondary indexes for the predicates the routes in app.py filter, join and sort on.
+-- Partial indexes cover the "still on loan" rows (return_date IS NULL), which are
+-- a small slice of issued_books once the library has some history.
+
+-- Members
+CREATE INDEX IF NOT EXISTS idx_member_role ON member_db (role);
+
+-- Books
+CREATE INDEX IF NOT EXISTS idx_book_title ON book_db (title);
+CREATE INDEX IF NOT EXISTS idx_book_stock ON book_db (total_stock);
+
+-- Issued books
+CREATE INDEX IF NOT EXISTS idx_issued_book_return ON issued_books (book_id, return_date);
+CREATE INDEX IF NOT EXISTS idx_issued_member_return ON issued_books (member_id, return_date, due_date);
+CREATE INDEX IF NOT EXISTS idx_issued_issue_date ON issued_books (issue_date);
+CREATE INDEX IF NOT EXISTS idx_issued_open_due ON issued_books (due_date) WHERE return_date IS NULL;
+
+-- Fines
+CREATE INDEX IF NOT EXISTS idx_fines_issue ON fines (issue_id);
+CREATE INDEX IF NOT EXISTS idx_fines_status ON fines (status, payment_date, fine_amount);
+CREATE INDEX IF NOT EXISTS idx_fines_date ON fines (fine_date);
+
+-- Wishlist (member_id, book_id) is already covered by its UNIQUE constraint
+CREATE INDEX IF NOT EXISTS idx_wishlist_book ON wishlist (book_id);
+CREATE INDEX IF NOT EXISTS idx_wishlist_added ON wishlist (added_date);
+
+-- Reservations
+CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations (status, reserved_date);
+CREATE INDEX IF NOT EXISTS idx_reservations_member ON reservations (member_id, book_id, status);
+CREATE INDEX IF NOT EXISTS idx_reservations_book ON reservations (book_id, status, reserved_date);
+
+-- Notifications
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id, is_read, created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications (user_id, created_at);
+
+-- User activity
+CREATE INDEX IF NOT EXISTS idx_activity_created ON user_activity (created_at);
+CREATE INDEX IF NOT EXISTS idx_activity_user ON user_activity (user_id);
@@ -0,0 +1,25 @@
+-- Live count of copies currently on loan, kept on book_db so catalog listings
+-- read it directly instead of counting open issued_books rows per book.
+-- Copies available = total_stock - active_issue_count.
+ALTER TABLE book_db ADD COLUMN active_issue_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE book_db SET active_issue_count = (
+    SELECT COUNT(*) FROM issued_books ib WHERE ib.book_id = book_db.book_id AND ib.return_date IS NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS issued_books_count_ai AFTER INSERT ON issued_books
+WHEN new.return_date IS NULL BEGIN
+    UPDATE book_db SET active_issue_count = active_issue_count + 1 WHERE book_id = new.book_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS issued_books_count_ad AFTER DELETE ON issued_books
+WHEN old.return_date IS NULL BEGIN
+    UPDATE book_db SET active_issue_count = active_issue_count - 1 WHERE book_id = old.book_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS issued_books_count_au AFTER UPDATE OF book_id, return_date ON issued_books BEGIN
+    UPDATE book_db SET active_issue_count = active_issue_count - 1
+    WHERE book_id = old.book_id AND old.return_date IS NULL;
+    UPDATE book_db SET active_issue_count = active_issue_count + 1
+    WHERE book_id = new.book_id AND new.return_date IS NULL;
+END;
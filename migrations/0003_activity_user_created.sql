@@ -0,0 +1,4 @@
+-- Activity exports filtered to one member read that member's rows in
+-- created_at order straight from the index instead of sorting them.
+DROP INDEX IF EXISTS idx_activity_user;
+CREATE INDEX IF NOT EXISTS idx_activity_user_created ON user_activity (user_id, created_at);
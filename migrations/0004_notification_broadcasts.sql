@@ -0,0 +1,16 @@
+-- Role-wide notifications: stored once with user_id NULL and the role in
+-- audience_role, and merged into each member's feed at read time.
+ALTER TABLE notifications ADD COLUMN audience_role TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_role ON notifications (audience_role, is_read, created_at)
+    WHERE audience_role IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_notifications_role_created ON notifications (audience_role, created_at)
+    WHERE audience_role IS NOT NULL;
+
+-- A broadcast's own is_read stays 0: each member who has read it gets a row
+-- here instead, so one admin reading it leaves it unread for the others.
+CREATE TABLE IF NOT EXISTS notification_reads (
+    member_id INTEGER NOT NULL,
+    notification_id INTEGER NOT NULL,
+    PRIMARY KEY (member_id, notification_id)
+) WITHOUT ROWID;
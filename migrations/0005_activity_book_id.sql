@@ -0,0 +1,6 @@
+-- Book actions in the activity log carry the book in its own column rather
+-- than as a 'book_id=N' details string, so feeds can resolve titles in bulk.
+ALTER TABLE user_activity ADD COLUMN book_id INTEGER;
+
+UPDATE user_activity SET book_id = CAST(substr(details, 9) AS INTEGER), details = NULL
+WHERE details LIKE 'book_id=%' AND substr(details, 9) GLOB '[0-9]*';
@@ -0,0 +1,11 @@
+-- Single-probe lookups of a member's and a role's newest notification, which
+-- /notifications uses as its ETag. Index entries end in the rowid, so these
+-- keep each member's (or role's) rows in notification_id order.
+CREATE INDEX IF NOT EXISTS idx_notifications_user_latest ON notifications (user_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_role_latest ON notifications (audience_role)
+    WHERE audience_role IS NOT NULL;
+
+-- Feeds page by notification_id through these now, so the created_at
+-- indexes from 0001 and 0004 serve no query and only slow every insert.
+DROP INDEX IF EXISTS idx_notifications_user_created;
+DROP INDEX IF EXISTS idx_notifications_role_created;
@@ -0,0 +1,186 @@
+-- Rollups behind report_page, kept current by triggers so the report reads a
+-- handful of small rows instead of grouping over all of issued_books and fines.
+--   report_daily / report_monthly  borrows by issue date, paid fines by payment date
+--   report_*_borrows               all-time borrows per book, member, category, author
+-- Category and author totals follow the book's current category and author, and
+-- a deleted book's borrows leave them, as the report's joins on book_db did.
+-- NULL categories and authors are stored as '' so they can be upsert keys.
+-- counters.rebuild_report_rollups() recomputes all of them from history.
+
+CREATE TABLE IF NOT EXISTS report_daily (
+    day TEXT PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0,
+    fines_collected REAL NOT NULL DEFAULT 0,
+    fines_paid INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS report_monthly (
+    month TEXT PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0,
+    fines_collected REAL NOT NULL DEFAULT 0,
+    fines_paid INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS report_book_borrows (
+    book_id INTEGER PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS report_member_borrows (
+    member_id INTEGER PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS report_category_borrows (
+    category TEXT PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS report_author_borrows (
+    author_name TEXT PRIMARY KEY,
+    borrows INTEGER NOT NULL DEFAULT 0
+);
+
+-- Top-N reads walk these from the largest count down
+CREATE INDEX IF NOT EXISTS idx_report_book_borrows ON report_book_borrows (borrows);
+CREATE INDEX IF NOT EXISTS idx_report_member_borrows ON report_member_borrows (borrows);
+CREATE INDEX IF NOT EXISTS idx_report_author_borrows ON report_author_borrows (borrows);
+
+-- Backfill from existing history
+INSERT INTO report_daily (day, borrows)
+SELECT SUBSTR(issue_date, 1, 10), COUNT(*) FROM issued_books GROUP BY 1;
+
+INSERT INTO report_daily (day, fines_collected, fines_paid)
+SELECT SUBSTR(payment_date, 1, 10), SUM(fine_amount), COUNT(*) FROM fines
+WHERE status = 'Paid' AND payment_date IS NOT NULL GROUP BY 1
+ON CONFLICT (day) DO UPDATE SET fines_collected = excluded.fines_collected, fines_paid = excluded.fines_paid;
+
+INSERT INTO report_monthly (month, borrows, fines_collected, fines_paid)
+SELECT SUBSTR(day, 1, 7), SUM(borrows), SUM(fines_collected), SUM(fines_paid) FROM report_daily GROUP BY 1;
+
+INSERT INTO report_book_borrows (book_id, borrows)
+SELECT book_id, COUNT(*) FROM issued_books GROUP BY book_id;
+
+INSERT INTO report_member_borrows (member_id, borrows)
+SELECT member_id, COUNT(*) FROM issued_books GROUP BY member_id;
+
+INSERT INTO report_category_borrows (category, borrows)
+SELECT COALESCE(b.category, ''), SUM(r.borrows) FROM report_book_borrows r JOIN book_db b ON r.book_id = b.book_id GROUP BY 1;
+
+INSERT INTO report_author_borrows (author_name, borrows)
+SELECT COALESCE(b.author_name, ''), SUM(r.borrows) FROM report_book_borrows r JOIN book_db b ON r.book_id = b.book_id GROUP BY 1;
+
+-- Issues
+CREATE TRIGGER IF NOT EXISTS issued_books_report_ai AFTER INSERT ON issued_books BEGIN
+    INSERT INTO report_daily (day, borrows) VALUES (SUBSTR(new.issue_date, 1, 10), 1)
+    ON CONFLICT (day) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_monthly (month, borrows) VALUES (SUBSTR(new.issue_date, 1, 7), 1)
+    ON CONFLICT (month) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_book_borrows (book_id, borrows) VALUES (new.book_id, 1)
+    ON CONFLICT (book_id) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_member_borrows (member_id, borrows) VALUES (new.member_id, 1)
+    ON CONFLICT (member_id) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_category_borrows (category, borrows)
+    SELECT COALESCE(category, ''), 1 FROM book_db WHERE book_id = new.book_id
+    ON CONFLICT (category) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_author_borrows (author_name, borrows)
+    SELECT COALESCE(author_name, ''), 1 FROM book_db WHERE book_id = new.book_id
+    ON CONFLICT (author_name) DO UPDATE SET borrows = borrows + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS issued_books_report_ad AFTER DELETE ON issued_books BEGIN
+    UPDATE report_daily SET borrows = borrows - 1 WHERE day = SUBSTR(old.issue_date, 1, 10);
+    UPDATE report_monthly SET borrows = borrows - 1 WHERE month = SUBSTR(old.issue_date, 1, 7);
+    UPDATE report_book_borrows SET borrows = borrows - 1 WHERE book_id = old.book_id;
+    UPDATE report_member_borrows SET borrows = borrows - 1 WHERE member_id = old.member_id;
+    UPDATE report_category_borrows SET borrows = borrows - 1
+    WHERE category = (SELECT COALESCE(category, '') FROM book_db WHERE book_id = old.book_id);
+    UPDATE report_author_borrows SET borrows = borrows - 1
+    WHERE author_name = (SELECT COALESCE(author_name, '') FROM book_db WHERE book_id = old.book_id);
+END;
+
+-- Moves the issue from its old day, book and member to the new ones
+CREATE TRIGGER IF NOT EXISTS issued_books_report_au AFTER UPDATE OF issue_date, book_id, member_id ON issued_books BEGIN
+    UPDATE report_daily SET borrows = borrows - 1 WHERE day = SUBSTR(old.issue_date, 1, 10);
+    UPDATE report_monthly SET borrows = borrows - 1 WHERE month = SUBSTR(old.issue_date, 1, 7);
+    UPDATE report_book_borrows SET borrows = borrows - 1 WHERE book_id = old.book_id;
+    UPDATE report_member_borrows SET borrows = borrows - 1 WHERE member_id = old.member_id;
+    UPDATE report_category_borrows SET borrows = borrows - 1
+    WHERE category = (SELECT COALESCE(category, '') FROM book_db WHERE book_id = old.book_id);
+    UPDATE report_author_borrows SET borrows = borrows - 1
+    WHERE author_name = (SELECT COALESCE(author_name, '') FROM book_db WHERE book_id = old.book_id);
+    INSERT INTO report_daily (day, borrows) VALUES (SUBSTR(new.issue_date, 1, 10), 1)
+    ON CONFLICT (day) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_monthly (month, borrows) VALUES (SUBSTR(new.issue_date, 1, 7), 1)
+    ON CONFLICT (month) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_book_borrows (book_id, borrows) VALUES (new.book_id, 1)
+    ON CONFLICT (book_id) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_member_borrows (member_id, borrows) VALUES (new.member_id, 1)
+    ON CONFLICT (member_id) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_category_borrows (category, borrows)
+    SELECT COALESCE(category, ''), 1 FROM book_db WHERE book_id = new.book_id
+    ON CONFLICT (category) DO UPDATE SET borrows = borrows + 1;
+    INSERT INTO report_author_borrows (author_name, borrows)
+    SELECT COALESCE(author_name, ''), 1 FROM book_db WHERE book_id = new.book_id
+    ON CONFLICT (author_name) DO UPDATE SET borrows = borrows + 1;
+END;
+
+-- Fine payments
+CREATE TRIGGER IF NOT EXISTS fines_report_ai AFTER INSERT ON fines
+WHEN new.status = 'Paid' AND new.payment_date IS NOT NULL BEGIN
+    INSERT INTO report_daily (day, fines_collected, fines_paid) VALUES (SUBSTR(new.payment_date, 1, 10), new.fine_amount, 1)
+    ON CONFLICT (day) DO UPDATE SET fines_collected = fines_collected + excluded.fines_collected, fines_paid = fines_paid + 1;
+    INSERT INTO report_monthly (month, fines_collected, fines_paid) VALUES (SUBSTR(new.payment_date, 1, 7), new.fine_amount, 1)
+    ON CONFLICT (month) DO UPDATE SET fines_collected = fines_collected + excluded.fines_collected, fines_paid = fines_paid + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS fines_report_ad AFTER DELETE ON fines
+WHEN old.status = 'Paid' AND old.payment_date IS NOT NULL BEGIN
+    UPDATE report_daily SET fines_collected = fines_collected - old.fine_amount, fines_paid = fines_paid - 1
+    WHERE day = SUBSTR(old.payment_date, 1, 10);
+    UPDATE report_monthly SET fines_collected = fines_collected - old.fine_amount, fines_paid = fines_paid - 1
+    WHERE month = SUBSTR(old.payment_date, 1, 7);
+END;
+
+CREATE TRIGGER IF NOT EXISTS fines_report_au AFTER UPDATE OF status, payment_date, fine_amount ON fines BEGIN
+    UPDATE report_daily SET fines_collected = fines_collected - old.fine_amount, fines_paid = fines_paid - 1
+    WHERE old.status = 'Paid' AND day = SUBSTR(old.payment_date, 1, 10);
+    UPDATE report_monthly SET fines_collected = fines_collected - old.fine_amount, fines_paid = fines_paid - 1
+    WHERE old.status = 'Paid' AND month = SUBSTR(old.payment_date, 1, 7);
+    INSERT INTO report_daily (day, fines_collected, fines_paid)
+    SELECT SUBSTR(new.payment_date, 1, 10), new.fine_amount, 1 WHERE new.status = 'Paid' AND new.payment_date IS NOT NULL
+    ON CONFLICT (day) DO UPDATE SET fines_collected = fines_collected + excluded.fines_collected, fines_paid = fines_paid + 1;
+    INSERT INTO report_monthly (month, fines_collected, fines_paid)
+    SELECT SUBSTR(new.payment_date, 1, 7), new.fine_amount, 1 WHERE new.status = 'Paid' AND new.payment_date IS NOT NULL
+    ON CONFLICT (month) DO UPDATE SET fines_collected = fines_collected + excluded.fines_collected, fines_paid = fines_paid + 1;
+END;
+
+-- Books changing category or author, or being deleted, carry their totals along
+CREATE TRIGGER IF NOT EXISTS book_db_report_category_au AFTER UPDATE OF category ON book_db
+WHEN COALESCE(old.category, '') != COALESCE(new.category, '') BEGIN
+    UPDATE report_category_borrows
+    SET borrows = borrows - COALESCE((SELECT borrows FROM report_book_borrows WHERE book_id = old.book_id), 0)
+    WHERE category = COALESCE(old.category, '');
+    INSERT INTO report_category_borrows (category, borrows)
+    SELECT COALESCE(new.category, ''), borrows FROM report_book_borrows WHERE book_id = new.book_id
+    ON CONFLICT (category) DO UPDATE SET borrows = borrows + excluded.borrows;
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_db_report_author_au AFTER UPDATE OF author_name ON book_db
+WHEN COALESCE(old.author_name, '') != COALESCE(new.author_name, '') BEGIN
+    UPDATE report_author_borrows
+    SET borrows = borrows - COALESCE((SELECT borrows FROM report_book_borrows WHERE book_id = old.book_id), 0)
+    WHERE author_name = COALESCE(old.author_name, '');
+    INSERT INTO report_author_borrows (author_name, borrows)
+    SELECT COALESCE(new.author_name, ''), borrows FROM report_book_borrows WHERE book_id = new.book_id
+    ON CONFLICT (author_name) DO UPDATE SET borrows = borrows + excluded.borrows;
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_db_report_ad AFTER DELETE ON book_db BEGIN
+    UPDATE report_category_borrows
+    SET borrows = borrows - COALESCE((SELECT borrows FROM report_book_borrows WHERE book_id = old.book_id), 0)
+    WHERE category = COALESCE(old.category, '');
+    UPDATE report_author_borrows
+    SET borrows = borrows - COALESCE((SELECT borrows FROM report_book_borrows WHERE book_id = old.book_id), 0)
+    WHERE author_name = COALESCE(old.author_name, '');
+END;
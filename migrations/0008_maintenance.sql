@@ -0,0 +1,38 @@
+-- State for the nightly maintenance jobs (maintenance.py).
+-- days_overdue is how many days an issue is past its due date: the final
+-- figure once it is returned, and as of the last maintenance run (or the
+-- first listing of the day, see DaysOverdueRefresher) while it is open.
+-- Listings read it instead of computing JULIANDAY differences per row.
+ALTER TABLE issued_books ADD COLUMN days_overdue INTEGER NOT NULL DEFAULT 0;
+
+UPDATE issued_books
+SET days_overdue = MAX(0, CAST(JULIANDAY(COALESCE(return_date, CURRENT_DATE)) - JULIANDAY(due_date) AS INTEGER))
+WHERE COALESCE(return_date, CURRENT_DATE) > due_date;
+
+-- At most one Pending fine per issue, which the fines job upserts. Fines
+-- paid earlier stay as their own rows. Duplicate Pending fines are merged
+-- into the oldest first.
+UPDATE fines SET fine_amount = (SELECT SUM(d.fine_amount) FROM fines d
+                                WHERE d.issue_id = fines.issue_id AND d.status = 'Pending')
+WHERE status = 'Pending'
+  AND fine_id = (SELECT MIN(d.fine_id) FROM fines d WHERE d.issue_id = fines.issue_id AND d.status = 'Pending');
+DELETE FROM fines
+WHERE status = 'Pending'
+  AND fine_id != (SELECT MIN(d.fine_id) FROM fines d WHERE d.issue_id = fines.issue_id AND d.status = 'Pending');
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fines_pending_issue ON fines (issue_id) WHERE status = 'Pending';
+
+-- Last reminder of each kind sent for an issue, so reruns do not repeat them
+CREATE TABLE IF NOT EXISTS issue_reminders (
+    issue_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    sent_on TEXT NOT NULL,
+    PRIMARY KEY (issue_id, kind)
+);
+
+-- One row per day the jobs ran; the scheduler claims the day before running
+CREATE TABLE IF NOT EXISTS maintenance_runs (
+    run_on TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    summary TEXT
+);
@@ -0,0 +1,14 @@
+-- Support for bulk_import.py.
+-- Imports match books on a case-insensitive (title, author_name) key; this
+-- expression index serves those lookups. Queries must repeat the expressions
+-- exactly for SQLite to use it.
+CREATE INDEX IF NOT EXISTS idx_book_dedupe_key ON book_db (lower(trim(title)), lower(trim(COALESCE(author_name, ''))));
+
+-- Indexes and triggers an import has dropped for its duration, with the SQL
+-- to recreate them. Rows left here mean an import is running or was
+-- interrupted; `python bulk_import.py --restore` puts them back.
+CREATE TABLE IF NOT EXISTS import_deferred (
+    name TEXT PRIMARY KEY,
+    sql TEXT NOT NULL,
+    after_id INTEGER  -- for book_search_ai: books above this id are indexed on restore
+);
@@ -0,0 +1,21 @@
+-- Item-to-item recommendations (recommendations.py).
+-- For each book, its recommendations.NEIGHBOURS most similar books by
+-- co-borrowing: the number of members who borrowed both, divided by the
+-- geometric mean of each book's number of borrowers (cosine similarity).
+CREATE TABLE IF NOT EXISTS book_neighbours (
+    book_id INTEGER NOT NULL,
+    neighbour_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (book_id, neighbour_id)
+) WITHOUT ROWID;
+
+-- Highest issue_id the neighbours have been built from. Incremental builds
+-- start from members with issues above it.
+CREATE TABLE IF NOT EXISTS recommendation_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_issue_id INTEGER NOT NULL,
+    built_at TEXT NOT NULL
+);
+
+-- Whether a member has borrowed a book, for filtering recommendations
+CREATE INDEX IF NOT EXISTS idx_issued_member_book ON issued_books (member_id, book_id);
@@ -0,0 +1,24 @@
+-- Change counters for small tables that workers keep in memory. A worker
+-- that sees PRAGMA data_version move reads its table's counter and reloads
+-- only if that changed. chatbot.py keeps chatbot_responses this way.
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_versions (name, version) VALUES ('chatbot_responses', 1);
+
+CREATE TRIGGER IF NOT EXISTS chatbot_responses_version_ai AFTER INSERT ON chatbot_responses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'chatbot_responses';
+END;
+
+CREATE TRIGGER IF NOT EXISTS chatbot_responses_version_au AFTER UPDATE ON chatbot_responses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'chatbot_responses';
+END;
+
+CREATE TRIGGER IF NOT EXISTS chatbot_responses_version_ad AFTER DELETE ON chatbot_responses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'chatbot_responses';
+END;
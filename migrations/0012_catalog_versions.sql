@@ -0,0 +1,51 @@
+-- Change counters for the catalogue and wishlists, from which
+-- /api/search_books derives its ETag without running the search. Changes
+-- made by other triggers (issued_books keeping book_db counts) count too.
+-- 'notification_reads' counts changes to read state, which /notifications
+-- puts in its ETag next to the newest notification id.
+INSERT OR IGNORE INTO table_versions (name, version) VALUES ('book_db', 1), ('wishlist', 1), ('notification_reads', 1);
+
+CREATE TRIGGER IF NOT EXISTS book_db_version_ai AFTER INSERT ON book_db
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'book_db';
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_db_version_au AFTER UPDATE ON book_db
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'book_db';
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_db_version_ad AFTER DELETE ON book_db
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'book_db';
+END;
+
+CREATE TRIGGER IF NOT EXISTS wishlist_version_ai AFTER INSERT ON wishlist
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'wishlist';
+END;
+
+CREATE TRIGGER IF NOT EXISTS wishlist_version_au AFTER UPDATE ON wishlist
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'wishlist';
+END;
+
+CREATE TRIGGER IF NOT EXISTS wishlist_version_ad AFTER DELETE ON wishlist
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'wishlist';
+END;
+
+CREATE TRIGGER IF NOT EXISTS notifications_read_version_au AFTER UPDATE OF is_read ON notifications
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'notification_reads';
+END;
+
+CREATE TRIGGER IF NOT EXISTS notification_reads_version_ai AFTER INSERT ON notification_reads
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'notification_reads';
+END;
+
+CREATE TRIGGER IF NOT EXISTS notification_reads_version_ad AFTER DELETE ON notification_reads
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'notification_reads';
+END;
@@ -0,0 +1,109 @@
+"""
+In-app notifications.
+A notification is either addressed to one member (user_id) or broadcast to a
+role (audience_role, user_id NULL). Broadcasts are stored once and merged into
+each member's feed when it is read, so telling every admin about a return is
+one row however many admins there are. Who has read a broadcast is kept per
+member in notification_reads, and a broadcast's is_read in a feed is that
+member's.
+"""
+
+FEED_COLUMNS = 'notification_id, user_id, audience_role, message, is_read, created_at'
+BROADCAST_COLUMNS = '''notification_id, user_id, audience_role, message,
+    EXISTS (SELECT 1 FROM notification_reads r
+            WHERE r.member_id = :member_id AND r.notification_id = n.notification_id) AS is_read,
+    created_at'''
+
+
+def send(db, messages=(), broadcasts=(), commit=True):
+    """
+    Records `messages`, (user_id, text) pairs, and `broadcasts`, (role, text)
+    pairs, in one transaction. Pass commit=False to leave them in the caller's
+    open transaction so they are committed together with the change they
+    describe.
+    """
+    if messages:
+        db.executemany('INSERT INTO notifications (user_id, message) VALUES (?, ?)', list(messages))
+    if broadcasts:
+        db.executemany('INSERT INTO notifications (audience_role, message) VALUES (?, ?)', list(broadcasts))
+    if commit:
+        db.commit()
+
+
+def feed(db, member, limit=20, after_id=0):
+    """Returns a member's newest notifications, their own and their role's, past `after_id`."""
+    return db.execute(f'''
+        SELECT * FROM (
+            SELECT {FEED_COLUMNS} FROM notifications WHERE user_id = :member_id AND notification_id > :after_id
+            ORDER BY notification_id DESC LIMIT :limit
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT {BROADCAST_COLUMNS} FROM notifications n WHERE audience_role = :role AND notification_id > :after_id
+            ORDER BY notification_id DESC LIMIT :limit
+        )
+        ORDER BY notification_id DESC
+        LIMIT :limit
+    ''', {'member_id': member['member_id'], 'role': member['role'], 'after_id': after_id, 'limit': limit}).fetchall()
+
+
+def latest(db, member):
+    """(notification_id, created_at) of the newest notification a member can see, or (0, None)."""
+    row = db.execute('''
+        SELECT * FROM (
+            SELECT notification_id, created_at FROM notifications WHERE user_id = ?
+            ORDER BY notification_id DESC LIMIT 1
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT notification_id, created_at FROM notifications WHERE audience_role = ?
+            ORDER BY notification_id DESC LIMIT 1
+        )
+        ORDER BY notification_id DESC
+        LIMIT 1
+    ''', (member['member_id'], member['role'])).fetchone()
+    return (row['notification_id'], row['created_at']) if row else (0, None)
+
+
+def unread_count(db, member):
+    return db.execute('''
+        SELECT (SELECT COUNT(*) FROM notifications WHERE user_id = :member_id AND is_read = 0)
+             + (SELECT COUNT(*) FROM notifications WHERE audience_role = :role AND is_read = 0)
+             - (SELECT COUNT(*) FROM notification_reads r JOIN notifications n ON n.notification_id = r.notification_id
+                WHERE r.member_id = :member_id AND n.audience_role = :role) AS cnt
+    ''', {'member_id': member['member_id'], 'role': member['role']}).fetchone()['cnt']
+
+
+def mark_read(db, member, upto, commit=True):
+    """
+    Marks a member's feed read up to notification `upto`: their own
+    notifications, and their role's broadcasts for them alone. Broadcasts are
+    only ever marked up to an id, so those at or below the member's newest
+    read are already recorded.
+    """
+    params = {'member_id': member['member_id'], 'role': member['role'], 'upto': upto}
+    db.execute('UPDATE notifications SET is_read = 1 WHERE user_id = :member_id AND is_read = 0 AND notification_id <= :upto',
+               params)
+    db.execute('''
+        INSERT OR IGNORE INTO notification_reads (member_id, notification_id)
+        SELECT :member_id, notification_id FROM notifications
+        WHERE audience_role = :role AND notification_id <= :upto
+          AND notification_id > COALESCE((SELECT MAX(notification_id) FROM notification_reads
+                                          WHERE member_id = :member_id), 0)
+    ''', params)
+    if commit:
+        db.commit()
+
+
+def latest_id(db):
+    return db.execute('SELECT MAX(notification_id) FROM notifications').fetchone()[0]
+
+
+def changes(db, after_id, limit):
+    """Notifications added after `after_id` as (id, audience, row) for the live event hub."""
+    rows = db.execute(f'SELECT {FEED_COLUMNS} FROM notifications WHERE notification_id > ? ORDER BY notification_id LIMIT ?',
+                      (after_id, limit)).fetchall()
+    return [(row['notification_id'],
+             ('user', row['user_id']) if row['user_id'] is not None else ('role', row['audience_role']),
+             dict(row))
+            for row in rows]
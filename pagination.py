@@ -0,0 +1,90 @@
+"""
+Keyset (cursor) pagination for listing queries.
+A page is fetched with `WHERE (sort keys) > (last row's keys) ORDER BY ... LIMIT n`
+so every page costs the same index probe no matter how deep it is. Cursors are
+the sort-key values of a boundary row, JSON-encoded and base64'd for URLs.
+"""
+import base64
+import json
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Returns the key values in `token`, or None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(map(_is_key_value, values)):
+        return None
+    return values
+
+
+def _is_key_value(value):
+    """Whether `value` can be bound as an SQLite parameter."""
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63
+    return value is None or isinstance(value, (str, float))
+
+
+def paginate(db, query, params, keys, after=None, before=None, page_size=50, descending=False):
+    """
+    Runs one page of `query`, which must end in a WHERE clause (use WHERE 1=1)
+    and have no ORDER BY or LIMIT. `keys` is a list of (sql_expr, column) pairs
+    forming a unique sort order, with `column` the name under which the query
+    selects that value. Pass `after` for the page following a next_cursor, or
+    `before` for the page preceding a prev_cursor.
+    """
+    exprs = ', '.join(expr for expr, _ in keys)
+    placeholders = ', '.join('?' for _ in keys)
+    after_values = decode_cursor(after, len(keys))
+    before_values = decode_cursor(before, len(keys))
+    backwards = before_values is not None and after_values is None
+
+    forward_desc = descending != backwards
+    order = ', '.join(f"{expr} {'DESC' if forward_desc else 'ASC'}" for expr, _ in keys)
+    params = list(params)
+    boundary = before_values if backwards else after_values
+    if boundary is not None:
+        query += f" AND ({exprs}) {'<' if forward_desc else '>'} ({placeholders})"
+        params.extend(boundary)
+    query += f" ORDER BY {order} LIMIT ?"
+    params.append(page_size + 1)
+
+    rows = db.execute(query, params).fetchall()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor(row[column] for _, column in keys)
+
+    if not rows:
+        return Page(rows)
+    if backwards:
+        return Page(rows, next_cursor=cursor_for(rows[-1]), prev_cursor=cursor_for(rows[0]) if has_more else None)
+    return Page(rows, next_cursor=cursor_for(rows[-1]) if has_more else None,
+                prev_cursor=cursor_for(rows[0]) if boundary is not None else None)
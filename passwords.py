@@ -0,0 +1,146 @@
+"""
+Password hashing off the request path.
+bcrypt spends about a quarter of a second of CPU per hash or check at the
+default cost, and releases the GIL while it does. Every hash and check runs on
+a pool of BCRYPT_WORKERS threads per worker process. A burst of logins
+therefore takes at most that many cores, and the rest of the worker's threads
+keep serving pages. Operations that find BCRYPT_QUEUE_SIZE others already
+waiting are refused with Busy instead of queueing behind them.
+
+New hashes use BCRYPT_ROUNDS. A successful login whose stored hash has another
+cost gets a fresh hash at the configured one, so changing the setting migrates
+members as they sign in. `python passwords.py --calibrate 250` prints the
+highest cost that hashes within 250 ms on this machine.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+DEFAULTS = {
+    'BCRYPT_ROUNDS': 12,          # work factor of new hashes; logins rehash hashes of any other cost
+    'BCRYPT_WORKERS': 0,          # hashes and checks run at once per worker process; 0 uses every core
+    'BCRYPT_QUEUE_SIZE': 32,      # operations waiting for a thread before new ones get Busy
+    'BCRYPT_TIMEOUT': 10.0,       # seconds a request waits for its result
+}
+
+MIN_ROUNDS, MAX_ROUNDS = 4, 31
+
+
+class Busy(RuntimeError):
+    """The hashing pool is full, or did not answer within BCRYPT_TIMEOUT."""
+
+
+def cost(hashed):
+    """The work factor of a bcrypt hash such as $2b$12$..., or None if it is not one."""
+    try:
+        return int(hashed[4:6])
+    except ValueError:
+        return None
+
+
+def _as_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed, rounds):
+    """(matches, new hash or None): a matching password is rehashed when `hashed` has another cost."""
+    try:
+        if not bcrypt.checkpw(password, hashed):
+            return False, None
+    except ValueError:  # not a bcrypt hash
+        return False, None
+    return True, (_hash(password, rounds) if cost(hashed) != rounds else None)
+
+
+class PasswordService:
+    def __init__(self, settings):
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self.rounds = min(max(self.settings['BCRYPT_ROUNDS'], MIN_ROUNDS), MAX_ROUNDS)
+        self.workers = self.settings['BCRYPT_WORKERS'] or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(self.workers + self.settings['BCRYPT_QUEUE_SIZE'])
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.completed = 0
+        self.refused = 0
+        self.rehashed = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.refused += 1
+            raise Busy('too many password operations in progress')
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; a worker forked from a preloaded master starts its own
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt')
+                self._pid = os.getpid()
+            future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(self.settings['BCRYPT_TIMEOUT'])
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.refused += 1
+            raise Busy('password operation timed out') from None
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def hash(self, password):
+        """A bcrypt hash of `password` at the configured cost."""
+        return self._run(_hash, _as_bytes(password), self.rounds)
+
+    def check(self, password, hashed):
+        """
+        Returns (matches, new hash or None). The new hash is given for a
+        matching password stored at another cost and should replace it.
+        """
+        matches, rehashed = self._run(_check, _as_bytes(password), _as_bytes(hashed), self.rounds)
+        if rehashed is not None:
+            with self._lock:
+                self.rehashed += 1
+        return matches, rehashed
+
+    def stats(self):
+        with self._lock:
+            return {'rounds': self.rounds, 'workers': self.workers, 'completed': self.completed,
+                    'refused': self.refused, 'rehashed': self.rehashed}
+
+
+def calibrate(target_ms):
+    """The highest cost (at least 10) whose hash takes no longer than `target_ms` here."""
+    rounds = 10
+    start = time.perf_counter()
+    _hash(b'calibration', rounds)
+    elapsed = (time.perf_counter() - start) * 1000
+    # Each round doubles the work
+    while rounds < MAX_ROUNDS and elapsed * 2 <= target_ms:
+        rounds += 1
+        elapsed *= 2
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suggest a BCRYPT_ROUNDS for this machine.')
+    parser.add_argument('--calibrate', type=float, default=250.0, metavar='MS', help='target time per hash')
+    args = parser.parse_args()
+    rounds = calibrate(args.calibrate)
+    start = time.perf_counter()
+    _hash(b'calibration', rounds)
+    print(f"BCRYPT_ROUNDS={rounds} ({(time.perf_counter() - start) * 1000:.0f} ms per hash)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
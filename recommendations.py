@@ -0,0 +1,171 @@
+"""
+Item-to-item "members who borrowed this also borrowed" recommendations.
+A build loads every member's distinct borrows into memory, counts for each
+book the books borrowed by the same members, scores them by cosine similarity
+of their borrower sets, and keeps the top NEIGHBOURS in book_neighbours.
+A member's recommendations are then the neighbours of the books they borrowed
+most recently, summed by score, which reads NEIGHBOURS rows per book of
+history instead of grouping issued_books.
+
+Builds are incremental: only books borrowed by members with issues since the
+last build have their neighbours recomputed. Scores elsewhere that involve
+those books' borrower counts drift slightly until the next full build.
+
+A build reads and computes in plan(), from one read snapshot and without the
+write lock, which takes seconds on a large history; apply() then replaces the
+rows in a short write transaction. Builds run as the 'recommendations'
+maintenance job, or from here:
+
+    python recommendations.py [path/to/library.db] [--full]
+"""
+import argparse
+import heapq
+import math
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from itertools import chain
+
+NEIGHBOURS = 20          # neighbours kept per book
+RECENT_HISTORY = 20      # most recently borrowed books a member's recommendations start from
+MAX_MEMBER_BOOKS = 500   # members with more distinct books than this are left out of co-borrow counts
+
+Plan = namedtuple('Plan', 'full last_issue_id targets rows')
+
+
+def _load_history(conn):
+    """Returns {member_id: [book_id, ...]} and {book_id: [member_id, ...]} of distinct borrows, in id order."""
+    books_of, borrowers_of = defaultdict(list), defaultdict(list)
+    for member_id, book_id in conn.execute('SELECT DISTINCT member_id, book_id FROM issued_books ORDER BY member_id, book_id'):
+        books_of[member_id].append(book_id)
+    for member_id, books in list(books_of.items()):
+        if len(books) > MAX_MEMBER_BOOKS:
+            del books_of[member_id]
+            continue
+        for book_id in books:
+            borrowers_of[book_id].append(member_id)
+    return books_of, borrowers_of
+
+
+def _neighbours(book_id, books_of, borrowers_of, weight):
+    """The NEIGHBOURS best (book_id, neighbour_id, score) rows for one book."""
+    together = Counter(chain.from_iterable(books_of[member_id] for member_id in borrowers_of[book_id]))
+    del together[book_id]
+    scores = {other: count * weight[other] for other, count in together.items()}
+    best = heapq.nlargest(NEIGHBOURS, scores, key=scores.__getitem__)
+    return [(book_id, other, scores[other] * weight[book_id]) for other in best]
+
+
+def plan(conn, full=False):
+    """
+    Computes new neighbours, for every book if `full` or if there has been no
+    build yet, else for books borrowed by members with new issues. Only reads,
+    from one snapshot. Returns a Plan for apply(), or None when there is
+    nothing new.
+    """
+    own_snapshot = not conn.in_transaction
+    if own_snapshot:
+        conn.execute('BEGIN')
+    try:
+        state = conn.execute('SELECT last_issue_id FROM recommendation_state WHERE id = 1').fetchone()
+        last_issue_id = conn.execute('SELECT COALESCE(MAX(issue_id), 0) FROM issued_books').fetchone()[0]
+        if state is not None and not full and state[0] >= last_issue_id:
+            return None
+        books_of, borrowers_of = _load_history(conn)
+        full = full or state is None
+        if full:
+            targets = list(borrowers_of)
+        else:
+            members = conn.execute('SELECT DISTINCT member_id FROM issued_books WHERE issue_id > ? AND issue_id <= ?',
+                                   (state[0], last_issue_id)).fetchall()
+            targets = sorted({book_id for (member_id,) in members for book_id in books_of.get(member_id, ())})
+    finally:
+        if own_snapshot:
+            conn.rollback()
+    # Cosine similarity is together / sqrt(borrowers(a) * borrowers(b)); this is each book's half
+    weight = {book_id: 1 / math.sqrt(len(members)) for book_id, members in borrowers_of.items()}
+    rows = list(chain.from_iterable(_neighbours(book_id, books_of, borrowers_of, weight) for book_id in targets))
+    return Plan(full, last_issue_id, targets, rows)
+
+
+def apply(conn, plan):
+    """
+    Writes a plan's neighbours, unless another build already covered its
+    issues. Leaves the transaction for the caller to commit and returns the
+    number of books whose neighbours were replaced.
+    """
+    if plan is None:
+        return 0
+    state = conn.execute('SELECT last_issue_id FROM recommendation_state WHERE id = 1').fetchone()
+    if state is not None and not plan.full and state[0] >= plan.last_issue_id:
+        return 0
+    if plan.full:
+        conn.execute('DELETE FROM book_neighbours')
+    else:
+        conn.executemany('DELETE FROM book_neighbours WHERE book_id = ?', [(book_id,) for book_id in plan.targets])
+    conn.executemany('INSERT INTO book_neighbours (book_id, neighbour_id, score) VALUES (?, ?, ?)', plan.rows)
+    conn.execute('''
+        INSERT INTO recommendation_state (id, last_issue_id, built_at) VALUES (1, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET last_issue_id = excluded.last_issue_id, built_at = excluded.built_at
+    ''', (plan.last_issue_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return len(plan.targets)
+
+
+def build(conn, full=False):
+    """plan() then apply(). Leaves the transaction for the caller to commit; returns the number of books recomputed."""
+    return apply(conn, plan(conn, full))
+
+
+def for_member(db, member_id, limit=5):
+    """
+    Books similar to what the member borrowed most recently and has not
+    borrowed yet, best first. Falls back to the most borrowed books when the
+    member has no history or their books have no neighbours.
+    """
+    rows = db.execute('''
+        SELECT b.book_id, b.title, b.author_name, b.category, b.year, SUM(n.score) AS score
+        FROM (SELECT book_id FROM issued_books WHERE member_id = :member_id
+              GROUP BY book_id ORDER BY MAX(issue_id) DESC LIMIT :history) AS recent
+        JOIN book_neighbours n ON n.book_id = recent.book_id
+        JOIN book_db b ON b.book_id = n.neighbour_id
+        WHERE n.neighbour_id NOT IN (SELECT book_id FROM issued_books WHERE member_id = :member_id)
+        GROUP BY n.neighbour_id
+        ORDER BY score DESC, n.neighbour_id
+        LIMIT :limit
+    ''', {'member_id': member_id, 'history': RECENT_HISTORY, 'limit': limit}).fetchall()
+    if rows:
+        return rows
+    return popular(db, limit)
+
+
+def popular(db, limit=5):
+    """The most borrowed books of all time, from the report rollup."""
+    return db.execute('''
+        SELECT b.book_id, b.title, b.author_name, b.category, b.year, r.borrows AS score
+        FROM report_book_borrows r JOIN book_db b ON b.book_id = r.book_id
+        ORDER BY r.borrows DESC, r.book_id
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the co-borrow recommendation neighbours.')
+    parser.add_argument('db_path', nargs='?', default='library.db')
+    parser.add_argument('--full', action='store_true', help='recompute every book instead of those with new borrows')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        start = time.perf_counter()
+        books = build(conn, full=args.full)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Recomputed neighbours of {books} book(s) in {time.perf_counter() - start:.2f}s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Book catalog search backed by the SQLite FTS5 table `book_search`.
+The index is kept in sync with book_db by the triggers in
+create_book_search_index.sql, so callers only ever read from it.
+"""
+import os
+import re
+
+SEARCH_INDEX_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_book_search_index.sql')
+
+# Maps the `filter` request argument to the indexed column it searches.
+SEARCH_FIELDS = {
+    'all': None,
+    'title': 'title',
+    'author': 'author_name',
+    'category': 'category',
+}
+
+# bm25 weights for (title, author_name, category); lower scores rank first.
+RANK_ORDER = 'bm25(book_search, 10.0, 5.0, 1.0)'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def ensure_search_index(conn):
+    """Creates the search index and its triggers on databases that predate them."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'book_search'").fetchone()
+    if exists:
+        return
+    with open(SEARCH_INDEX_SQL, 'r') as f:
+        conn.executescript(f.read())
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """Re-reads every row of book_db into the index."""
+    conn.execute("INSERT INTO book_search (book_search) VALUES ('rebuild')")
+    conn.commit()
+
+
+def build_match_query(query, search_filter='all'):
+    """
+    Turns free text typed by a user into an FTS5 MATCH expression.
+    Every word becomes a quoted prefix term, so 'atom hab' finds 'Atomic Habits',
+    and the expression is restricted to one column unless the filter is 'all'.
+    Returns None when the text contains nothing searchable.
+    """
+    terms = _TERM_RE.findall(query.lower())
+    if not terms:
+        return None
+    expr = ' '.join(f'"{term}"*' for term in terms)
+    column = SEARCH_FIELDS.get(search_filter)
+    if column:
+        expr = f'{column} : ({expr})'
+    return expr
+
+
+def catalog_filter(query, search_filter='all', default_order='b.title'):
+    """
+    Returns (join, where, order_by, params) SQL fragments that restrict a
+    `FROM book_db b` query to the books matching `query`, best match first.
+    An empty query leaves the listing untouched (WHERE 1=1).
+    """
+    if not query.strip():
+        return '', 'WHERE 1=1', default_order, []
+    match = build_match_query(query, search_filter)
+    if match is None:
+        return '', 'WHERE 0', default_order, []
+    return ('JOIN book_search ON book_search.rowid = b.book_id',
+            'WHERE book_search MATCH ?',
+            RANK_ORDER,
+            [match])
+
+
+def search_books(db, query, search_filter='all', limit=5):
+    """Returns the best matching book_db rows for `query`."""
+    if not query.strip():
+        return []
+    join, where, order_by, params = catalog_filter(query, search_filter)
+    return db.execute(f"SELECT b.* FROM book_db b {join} {where} ORDER BY {order_by} LIMIT ?",
+                      params + [limit]).fetchall()
@@ -0,0 +1,292 @@
+"""
+Per-request SQL profiling, slow-query log and Prometheus metrics.
+While SQL_PROFILING is on, get_db() hands out its pooled connection wrapped
+in a ProfiledConnection. The wrapper times each statement from execute()
+through its last fetch and counts it against the request. At the end of the
+request the statements are folded into per-endpoint totals, keyed by their
+normalized SQL text (literals and placeholder lists collapsed to '?').
+Statements slower than SQL_SLOW_QUERY_MS are logged along with their EXPLAIN
+QUERY PLAN, which is taken on the request's own connection before it goes back
+to the pool. Bound parameters are never logged.
+
+The cost is a few microseconds per statement, with iterated cursors timed a
+batch of rows at a time, and one lock per request to merge its totals. Everything is kept per worker, like
+the pool and event hub stats, so each gunicorn worker reports its own numbers
+and a scraper sees whichever worker answers.
+"""
+import bisect
+import hmac
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+DEFAULTS = {
+    'SQL_PROFILING': 1,                # 0 hands out plain connections and records nothing
+    'SQL_SLOW_QUERY_MS': 100.0,        # statements slower than this are logged with their plan
+    'SQL_SLOW_QUERY_LOG': '',          # file to append slow queries to; '' uses the app's logging
+    'SQL_SLOWEST_PER_ENDPOINT': 10,    # statements listed per endpoint by /admin/sql_stats
+    'METRICS_TOKEN': '',               # bearer token a scraper may use for /admin/metrics
+}
+
+# Prometheus' default latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_STATEMENTS = 200  # distinct statements tracked per endpoint; later ones go uncounted by text
+ITER_BATCH = 64       # rows fetched per timed step when a cursor is iterated
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+log = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=2048)
+def normalize(sql):
+    """SQL text with whitespace collapsed and literals and IN lists replaced by '?'."""
+    sql = _SPACE_RE.sub(' ', sql).strip()
+    return _LIST_RE.sub('(?, ...)', _LITERAL_RE.sub('?', sql))
+
+
+class Statement:
+    __slots__ = ('sql', 'params', 'seconds')
+
+    def __init__(self, sql, params, seconds):
+        self.sql = sql
+        self.params = params  # None where no plan can be taken (executemany, scripts, commits)
+        self.seconds = seconds
+
+
+class RequestProfile:
+    """The statements of one request, in the order they ran."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = []
+        self.sql_seconds = 0.0
+
+    def add(self, sql, params, seconds):
+        statement = Statement(sql, params, seconds)
+        self.statements.append(statement)
+        self.sql_seconds += seconds
+        return statement
+
+    def extend(self, statement, seconds):
+        statement.seconds += seconds
+        self.sql_seconds += seconds
+
+
+class ProfiledCursor:
+    """Cursor whose fetches are added to the time of the statement that made it."""
+
+    def __init__(self, cursor, statement, profile):
+        self._cursor = cursor
+        self._statement = statement
+        self._profile = profile
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._profile.extend(self._statement, time.perf_counter() - start)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        # Timed a batch at a time, so the per-row cost is a generator step
+        while True:
+            rows = self._timed(self._cursor.fetchmany, ITER_BATCH)
+            yield from rows
+            if len(rows) < ITER_BATCH:
+                return
+
+    def __next__(self):
+        return self._timed(self._cursor.__next__)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection:
+    """Times execute(), executemany(), executescript() and commit(); everything else is passed through."""
+
+    def __init__(self, conn, profile):
+        self._conn = conn
+        self._profile = profile
+
+    def _run(self, method, sql, params, plannable):
+        start = time.perf_counter()
+        cursor = method(sql, params) if params is not None else method(sql)
+        statement = self._profile.add(sql, params if plannable else None, time.perf_counter() - start)
+        return ProfiledCursor(cursor, statement, self._profile)
+
+    def execute(self, sql, params=()):
+        return self._run(self._conn.execute, sql, params, True)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self._conn.executemany, sql, seq_of_params, False)
+
+    def executescript(self, script):
+        return self._run(self._conn.executescript, script, None, False)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            self._profile.add('COMMIT', None, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def unwrap(conn):
+    """The pooled connection behind a ProfiledConnection, or `conn` itself."""
+    return conn._conn if isinstance(conn, ProfiledConnection) else conn
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN of a statement as '; '-separated steps, or None if it cannot be explained."""
+    try:
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except Exception:  # sqlite3.Error, or parameters the plan cannot take
+        return None
+    return '; '.join(row[3] for row in rows)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.requests = 0
+        self.seconds = 0.0
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.slow_queries = 0
+        self.statements = {}  # normalized sql -> [calls, seconds, slowest]
+
+
+class Profiler:
+    def __init__(self, settings):
+        self.settings = {key: settings.get(key, default) for key, default in DEFAULTS.items()}
+        self.enabled = bool(self.settings['SQL_PROFILING'])
+        self.slow_seconds = self.settings['SQL_SLOW_QUERY_MS'] / 1000
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.slow_log = log
+        if self.settings['SQL_SLOW_QUERY_LOG']:
+            self.slow_log = logging.getLogger(__name__ + '.slow')
+            self.slow_log.propagate = False
+            self.slow_log.setLevel(logging.INFO)
+            handler = logging.FileHandler(self.settings['SQL_SLOW_QUERY_LOG'])
+            handler.setFormatter(logging.Formatter('%(asctime)s %(process)d %(message)s'))
+            self.slow_log.addHandler(handler)
+
+    def start(self):
+        """A profile for a new request, or None when profiling is off."""
+        return RequestProfile() if self.enabled else None
+
+    def wrap(self, conn, profile):
+        return ProfiledConnection(conn, profile) if profile is not None else conn
+
+    def finish(self, profile, endpoint, conn=None):
+        """
+        Records a finished request against `endpoint`. Slow statements are
+        logged, with their plans taken on `conn` when it is given.
+        """
+        seconds = time.perf_counter() - profile.started
+        endpoint = endpoint or 'unmatched'
+        slow = [s for s in profile.statements if s.seconds >= self.slow_seconds]
+        for statement in slow:
+            plan = explain(conn, statement.sql, statement.params) if conn is not None and statement.params is not None else None
+            self.slow_log.warning('slow query %.1f ms in %s: %s%s', statement.seconds * 1000, endpoint,
+                                  normalize(statement.sql), f' | plan: {plan}' if plan else '')
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.sql_statements += len(profile.statements)
+            stats.sql_seconds += profile.sql_seconds
+            stats.slow_queries += len(slow)
+            for statement in profile.statements:
+                key = normalize(statement.sql)
+                entry = stats.statements.get(key)
+                if entry is None:
+                    if len(stats.statements) >= MAX_STATEMENTS:
+                        continue
+                    entry = stats.statements[key] = [0, 0.0, 0.0]
+                entry[0] += 1
+                entry[1] += statement.seconds
+                if statement.seconds > entry[2]:
+                    entry[2] = statement.seconds
+        return seconds
+
+    def server_timing(self, profile):
+        """Server-Timing header value with the request's SQL time and statement count so far."""
+        return f'sql;dur={profile.sql_seconds * 1000:.1f};desc="{len(profile.statements)} statements"'
+
+    def scrape_allowed(self, authorization):
+        """Whether an Authorization header carries METRICS_TOKEN."""
+        token = self.settings['METRICS_TOKEN']
+        return bool(token) and hmac.compare_digest(authorization or '', f'Bearer {token}')
+
+    def stats(self):
+        """Per endpoint: request and SQL totals and the statements with the most total time."""
+        limit = self.settings['SQL_SLOWEST_PER_ENDPOINT']
+        with self._lock:
+            result = {}
+            for endpoint, stats in sorted(self._endpoints.items()):
+                top = sorted(stats.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+                result[endpoint] = {
+                    'requests': stats.requests,
+                    'avg_ms': round(stats.seconds / stats.requests * 1000, 2),
+                    'sql_statements_per_request': round(stats.sql_statements / stats.requests, 2),
+                    'sql_ms_per_request': round(stats.sql_seconds / stats.requests * 1000, 2),
+                    'slow_queries': stats.slow_queries,
+                    'statements': [{'sql': sql, 'calls': calls, 'total_ms': round(total * 1000, 2),
+                                    'max_ms': round(slowest * 1000, 2)}
+                                   for sql, (calls, total, slowest) in top],
+                }
+            return result
+
+    def prometheus(self):
+        """This worker's metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP library_request_duration_seconds Time to handle a request, by Flask endpoint.',
+            '# TYPE library_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            endpoints = [(_label(name), stats.buckets[:], stats.requests, stats.seconds, stats.sql_statements,
+                          stats.sql_seconds, stats.slow_queries) for name, stats in sorted(self._endpoints.items())]
+        for name, buckets, requests, seconds, _, _, _ in endpoints:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f'library_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'library_request_duration_seconds_sum{{endpoint="{name}"}} {seconds:.6f}')
+            lines.append(f'library_request_duration_seconds_count{{endpoint="{name}"}} {requests}')
+        for metric, help_text, index, fmt in (
+            ('library_sql_statements_total', 'SQL statements run, by Flask endpoint.', 4, '{}'),
+            ('library_sql_seconds_total', 'Time spent in SQL, by Flask endpoint.', 5, '{:.6f}'),
+            ('library_sql_slow_queries_total', 'Statements slower than SQL_SLOW_QUERY_MS, by Flask endpoint.', 6, '{}'),
+        ):
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for row in endpoints:
+                lines.append(f'{metric}{{endpoint="{row[0]}"}} {fmt.format(row[index])}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
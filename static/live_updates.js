@@ -0,0 +1,116 @@
+// Live updates over Server-Sent Events (/events), with polling as a fallback.
+// handlers: {notification(n), activity(entry), poll(), resync(), pollSeconds}
+function liveUpdates(handlers) {
+    var pollTimer = null;
+
+    function resync() {
+        if (handlers.resync) {
+            handlers.resync();
+        }
+    }
+
+    function startPolling() {
+        if (!pollTimer && handlers.poll) {
+            pollTimer = setInterval(handlers.poll, (handlers.pollSeconds || 20) * 1000);
+        }
+    }
+
+    if (!window.EventSource) {
+        resync();
+        startPolling();
+        return;
+    }
+    var source = new EventSource('/events');
+    source.addEventListener('open', function () {
+        if (pollTimer) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+        // The stream only carries what happens from now on, so catch up on
+        // anything since the page was rendered or the stream dropped.
+        resync();
+    });
+    source.addEventListener('error', function () {
+        // The browser retries dropped streams on its own; it gives up on a
+        // refused one (503 when the worker is full), so poll instead.
+        if (source.readyState === EventSource.CLOSED) {
+            resync();
+            startPolling();
+        }
+    });
+    ['notification', 'activity'].forEach(function (name) {
+        if (handlers[name]) {
+            source.addEventListener(name, function (e) {
+                handlers[name](JSON.parse(e.data));
+            });
+        }
+    });
+}
+
+// Bell dropdown state shared by polling (deltas from /notifications?since=)
+// and pushed notifications; items are kept newest first.
+var notifState = {latest: 0, unread: 0, items: []};
+
+function mergeNotifications(items) {
+    var seen = new Set(notifState.items.map(function (n) { return n.notification_id; }));
+    var fresh = items.filter(function (n) { return !seen.has(n.notification_id); });
+    notifState.items = fresh.concat(notifState.items)
+        .sort(function (a, b) { return b.notification_id - a.notification_id; })
+        .slice(0, 20);
+    fresh.forEach(function (n) { notifState.latest = Math.max(notifState.latest, n.notification_id); });
+    return fresh;
+}
+
+function renderNotifications() {
+    var notifCount = document.getElementById('notifCount');
+    notifCount.textContent = notifState.unread;
+    notifCount.style.display = notifState.unread > 0 ? 'inline-block' : 'none';
+    var notifList = document.getElementById('notifList');
+    if (notifState.items.length === 0) {
+        notifList.innerHTML = '<div style="padding:10px;color:#888;">No notifications</div>';
+        return;
+    }
+    notifList.innerHTML = notifState.items.map(function (n) {
+        return `<div style='padding:8px 0;border-bottom:1px solid #eee;${n.is_read ? '' : 'font-weight:bold;'}'>${n.message}<br><span style='font-size:0.8em;color:#888;'>${n.created_at ? n.created_at.split('T')[0] : ''}</span></div>`;
+    }).join('');
+}
+
+// Asks only for notifications newer than the ones already shown. The browser
+// revalidates an idle feed with its ETag and, on a 304, hands back the copy it
+// holds, whose items are already merged.
+function fetchNotifications() {
+    return fetch('/notifications?since=' + notifState.latest).then(function (r) {
+        return r.json();
+    }).then(function (data) {
+        mergeNotifications(data.notifications);
+        notifState.unread = data.unread_count || 0;
+        notifState.latest = Math.max(notifState.latest, data.latest || 0);
+        renderNotifications();
+    });
+}
+
+// Marks everything the dropdown shows as read, for this member only.
+function markNotificationsRead() {
+    if (!notifState.unread || !notifState.latest) {
+        return;
+    }
+    var body = new URLSearchParams({upto: notifState.latest});
+    fetch('/notifications/read', {method: 'POST', body: body}).then(function (r) {
+        return r.ok ? r.json() : null;
+    }).then(function (data) {
+        if (!data) {
+            return;
+        }
+        notifState.items.forEach(function (n) { n.is_read = 1; });
+        notifState.unread = data.unread_count || 0;
+        renderNotifications();
+    });
+}
+
+// Adds a pushed notification to the dropdown and bumps its counter.
+function addNotification(n) {
+    if (mergeNotifications([n]).length && !n.is_read) {
+        notifState.unread += 1;
+    }
+    renderNotifications();
+}
@@ -16,45 +16,74 @@ document.addEventListener('DOMContentLoaded', function() {
         filterSelect.addEventListener('change', performSearch);
     }
 
+    function searchUrl(query, filter, after) {
+        let url = `/api/search_books?q=${encodeURIComponent(query)}&filter=${encodeURIComponent(filter)}`;
+        if (after) url += `&after=${encodeURIComponent(after)}`;
+        return url;
+    }
+
     function performSearch() {
         const query = searchInput.value;
         const filter = filterSelect ? filterSelect.value : 'all';
-        fetch(`/api/search_books?q=${encodeURIComponent(query)}&filter=${encodeURIComponent(filter)}`)
+        fetch(searchUrl(query, filter))
             .then(response => response.json())
-            .then(books => {
-                renderBooks(books, query);
+            .then(page => {
+                renderBooks(page.books, query);
+                renderShowMore(page.next, query, filter);
             });
     }
 
+    function renderShowMore(next, query, filter) {
+        const container = booksSection.querySelector('#showMoreContainer');
+        container.innerHTML = '';
+        if (!next) return;
+        const btn = document.createElement('button');
+        btn.className = 'btn btn-secondary';
+        btn.textContent = 'Show More';
+        btn.onclick = function() {
+            btn.disabled = true;
+            fetch(searchUrl(query, filter, next))
+                .then(response => response.json())
+                .then(page => {
+                    booksSection.querySelector('.books-grid').insertAdjacentHTML('beforeend', page.books.map(bookCard).join(''));
+                    renderShowMore(page.next, query, filter);
+                });
+        };
+        container.appendChild(btn);
+    }
+
     function renderBooks(books, query) {
         let html = `<h2>📚 ${query ? `Search Results for \"${query}\"` : 'Available Books'}</h2>`;
         if (books.length === 0) {
             html += `<p>No books found matching your search criteria. Try different keywords or filters.</p>`;
         } else {
             html += '<div class="books-grid">';
-            books.forEach(book => {
-                const availableCopies = book.total_stock - book.issued_count;
-                const availabilityClass = availableCopies > 2 ? 'available' : (availableCopies > 0 ? 'limited' : 'unavailable');
-                const availabilityText = availableCopies > 0 ? `Available (${availableCopies} copies)` : 'Not Available';
-                    const wishlistBtnClass = book.in_wishlist ? 'btn-danger' : 'btn-primary';
-                    const wishlistBtnText = book.in_wishlist ? '💔 Remove from Wishlist' : '❤️ Add to Wishlist';
-                    html += `
-                    <div class="book-card">
-                        <div class="book-title">${escapeHtml(book.title)}</div>
-                        <div class="book-author">by ${escapeHtml(book.author_name)}</div>
-                        <div class="book-category">${escapeHtml(book.category)}</div>
-                        <div class="book-details">${book.year ? `Published: ${escapeHtml(book.year)}<br>` : ''}</div>
-                        <div class="book-availability"><span class="${availabilityClass}">${availabilityText}</span></div>
-                        <div class="book-actions">
-                            <button class="btn ${wishlistBtnClass} wishlist-btn" data-book-id="${book.book_id}">${wishlistBtnText}</button>
-                        </div>
-                    </div>`;
-            });
+            html += books.map(bookCard).join('');
             html += '</div>';
         }
+        html += '<div id="showMoreContainer"></div>';
         booksSection.innerHTML = html;
     }
 
+    function bookCard(book) {
+        const availableCopies = book.total_stock - book.issued_count;
+        const availabilityClass = availableCopies > 2 ? 'available' : (availableCopies > 0 ? 'limited' : 'unavailable');
+        const availabilityText = availableCopies > 0 ? `Available (${availableCopies} copies)` : 'Not Available';
+        const wishlistBtnClass = book.in_wishlist ? 'btn-danger' : 'btn-primary';
+        const wishlistBtnText = book.in_wishlist ? '💔 Remove from Wishlist' : '❤️ Add to Wishlist';
+        return `
+        <div class="book-card">
+            <div class="book-title">${escapeHtml(book.title)}</div>
+            <div class="book-author">by ${escapeHtml(book.author_name)}</div>
+            <div class="book-category">${escapeHtml(book.category)}</div>
+            <div class="book-details">${book.year ? `Published: ${escapeHtml(book.year)}<br>` : ''}</div>
+            <div class="book-availability"><span class="${availabilityClass}">${availabilityText}</span></div>
+            <div class="book-actions">
+                <button class="btn ${wishlistBtnClass} wishlist-btn" data-book-id="${book.book_id}">${wishlistBtnText}</button>
+            </div>
+        </div>`;
+    }
+
     function escapeHtml(text) {
         const map = {
             '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#039;'
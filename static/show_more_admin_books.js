@@ -1,35 +1,35 @@
-// Show More functionality for admin books table
+// Show More functionality for admin tables: appends the rows of the next page in place
 
 document.addEventListener('DOMContentLoaded', function() {
     const table = document.querySelector('.table-container table');
-    if (!table) return;
+    const pager = document.querySelector('.pager');
+    if (!table || !pager) return;
     const tbody = table.querySelector('tbody');
-    const allRows = Array.from(tbody.children);
-    const PAGE_SIZE = 10;
-    let shown = 0;
 
-    function renderPage() {
-        allRows.forEach((row, idx) => {
-            row.style.display = idx < shown ? '' : 'none';
-        });
+    function renderButton(nextLink) {
         let showMoreBtn = document.getElementById('showMoreAdminBtn');
-        if (shown < allRows.length) {
-            if (!showMoreBtn) {
-                showMoreBtn = document.createElement('button');
-                showMoreBtn.id = 'showMoreAdminBtn';
-                showMoreBtn.className = 'btn btn-secondary';
-                showMoreBtn.textContent = 'Show More';
-                table.parentNode.appendChild(showMoreBtn);
-            }
-            showMoreBtn.onclick = function() {
-                shown += PAGE_SIZE;
-                renderPage();
-            };
-        } else if (showMoreBtn) {
-            showMoreBtn.remove();
-        }
+        if (showMoreBtn) showMoreBtn.remove();
+        if (!nextLink) return;
+        const ownLink = pager.querySelector('.pager-next');
+        if (ownLink) ownLink.remove();
+        showMoreBtn = document.createElement('button');
+        showMoreBtn.id = 'showMoreAdminBtn';
+        showMoreBtn.className = 'btn btn-secondary';
+        showMoreBtn.textContent = 'Show More';
+        showMoreBtn.onclick = function() {
+            showMoreBtn.disabled = true;
+            fetch(nextLink.href)
+                .then(res => res.text())
+                .then(html => {
+                    const doc = new DOMParser().parseFromString(html, 'text/html');
+                    const nextBody = doc.querySelector('.table-container table tbody');
+                    if (nextBody) Array.from(nextBody.children).forEach(row => tbody.appendChild(row));
+                    renderButton(doc.querySelector('.pager-next'));
+                })
+                .catch(() => { showMoreBtn.disabled = false; });
+        };
+        pager.appendChild(showMoreBtn);
     }
 
-    shown = PAGE_SIZE;
-    renderPage();
+    renderButton(pager.querySelector('.pager-next'));
 });
@@ -1,28 +1,35 @@
-// Show More functionality for books grid
+// Show More functionality for books grid: loads the next page of cards from the server
 
 document.addEventListener('DOMContentLoaded', function() {
     const grid = document.getElementById('booksGrid');
     const showMoreContainer = document.getElementById('showMoreContainer');
     if (!grid || !showMoreContainer) return;
-    const allCards = Array.from(grid.children);
-    const PAGE_SIZE = 10;
-    let shown = 0;
 
-    function renderPage() {
-        allCards.forEach((card, idx) => {
-            card.style.display = idx < shown ? '' : 'none';
-        });
-        if (shown < allCards.length) {
-            showMoreContainer.innerHTML = '<button id="showMoreBtn" class="btn btn-secondary">Show More</button>';
-            document.getElementById('showMoreBtn').onclick = function() {
-                shown += PAGE_SIZE;
-                renderPage();
-            };
-        } else {
-            showMoreContainer.innerHTML = '';
-        }
+    function renderButton(nextLink) {
+        const oldBtn = document.getElementById('showMoreBtn');
+        if (oldBtn) oldBtn.remove();
+        if (!nextLink) return;
+        // Keep "Previous" (if any) and swap "Next" for an in-place Show More
+        nextLink.remove();
+        const btn = document.createElement('button');
+        btn.id = 'showMoreBtn';
+        btn.className = 'btn btn-secondary';
+        btn.textContent = 'Show More';
+        btn.onclick = function() {
+            btn.disabled = true;
+            const url = new URL(nextLink.href, window.location.href);
+            url.searchParams.set('partial', 'books');
+            fetch(url)
+                .then(res => res.text())
+                .then(html => {
+                    const doc = new DOMParser().parseFromString(html, 'text/html');
+                    doc.querySelectorAll('.book-card').forEach(card => grid.appendChild(card));
+                    renderButton(doc.querySelector('.pager-next'));
+                })
+                .catch(() => { btn.disabled = false; });
+        };
+        (showMoreContainer.querySelector('.pager') || showMoreContainer).appendChild(btn);
     }
 
-    shown = PAGE_SIZE;
-    renderPage();
+    renderButton(showMoreContainer.querySelector('.pager-next'));
 });
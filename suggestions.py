@@ -0,0 +1,229 @@
+"""
+In-memory prefix index behind /api/search_suggestions.
+Each worker keeps a sorted list of (key, text) pairs covering every word
+position of every title, author and category, so a lookup is two bisects
+over the list plus a popularity ranking of the matching range.
+
+Once the index is older than its max age, requests keep being answered from
+it while a background thread builds a replacement on a connection of its own.
+Edits made through add_book/update_book/remove_book in the meantime are
+applied to both, so the swap loses none of them.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+# Ranges wider than this (one or two letter prefixes) have their ranked
+# result memoized until the next change to the index.
+MEMO_THRESHOLD = 2000
+
+_index = None
+_index_lock = threading.Lock()   # guards _index, _journal and _generation
+_build_lock = threading.Lock()   # one build at a time
+_journal = None                  # edits made while a rebuild runs, as (method, args)
+_generation = 0                  # bumped by reset_index()
+
+log = logging.getLogger(__name__)
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def _keys(text):
+    """Yields the text starting at each of its words: 'the power of now', 'power of now', ..."""
+    words = normalize(text).split(' ')
+    for i in range(len(words)):
+        if words[i]:
+            yield ' '.join(words[i:])
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self.built_at = time.monotonic()
+        self._entries = []   # sorted (key, text)
+        self._books = {}     # book_id -> (title, author_name, category, popularity)
+        self._refs = {}      # text -> number of book fields carrying it
+        self._scores = {}    # text -> summed popularity of those books
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, db):
+        """Loads the whole catalog with its popularity (read_count plus times borrowed)."""
+        index = cls()
+        rows = db.execute('''
+            SELECT b.book_id, b.title, b.author_name, b.category,
+                   COALESCE(b.read_count, 0) + COUNT(ib.issue_id) AS popularity
+            FROM book_db b
+            LEFT JOIN issued_books ib ON ib.book_id = b.book_id
+            GROUP BY b.book_id
+        ''').fetchall()
+        for row in rows:
+            index._add(row[0], row[1], row[2], row[3], row[4], sort=False)
+        index._entries.sort()
+        return index
+
+    def suggest(self, prefix, limit=5):
+        """Returns up to `limit` distinct texts with a word starting with `prefix`, most popular first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect_left(self._entries, (prefix,))
+            hi = bisect_left(self._entries, (prefix + '\uffff',))
+            if hi - lo > MEMO_THRESHOLD and (prefix, limit) in self._memo:
+                return self._memo[(prefix, limit)]
+            # One pass keeping only the best `limit` distinct texts seen so far
+            ranked, chosen = [], set()
+            for i in range(lo, hi):
+                text = self._entries[i][1]
+                if text in chosen:
+                    continue
+                rank = (-self._scores[text], text)
+                if len(ranked) == limit:
+                    if rank >= ranked[-1]:
+                        continue
+                    chosen.discard(ranked.pop()[1])
+                insort(ranked, rank)
+                chosen.add(text)
+            result = [text for _, text in ranked]
+            if hi - lo > MEMO_THRESHOLD:
+                self._memo[(prefix, limit)] = result
+            return result
+
+    def add_book(self, book_id, title, author_name, category, popularity=0):
+        with self._lock:
+            self._add(book_id, title, author_name, category, popularity)
+
+    def update_book(self, book_id, title, author_name, category):
+        with self._lock:
+            popularity = self._remove(book_id)
+            self._add(book_id, title, author_name, category, popularity)
+
+    def remove_book(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _add(self, book_id, title, author_name, category, popularity, sort=True):
+        book_id = int(book_id)
+        self._books[book_id] = (title, author_name, category, popularity)
+        for text in (title, author_name, category):
+            if not text:
+                continue
+            if text not in self._refs:
+                self._refs[text] = 0
+                self._scores[text] = 0
+                for key in _keys(text):
+                    if sort:
+                        insort(self._entries, (key, text))
+                    else:
+                        self._entries.append((key, text))
+            self._refs[text] += 1
+            self._scores[text] += popularity
+        self._memo.clear()
+
+    def _remove(self, book_id):
+        book = self._books.pop(int(book_id), None)
+        if book is None:
+            return 0
+        title, author_name, category, popularity = book
+        for text in (title, author_name, category):
+            if not text:
+                continue
+            self._refs[text] -= 1
+            self._scores[text] -= popularity
+            if self._refs[text] == 0:
+                del self._refs[text]
+                del self._scores[text]
+                for key in _keys(text):
+                    i = bisect_left(self._entries, (key, text))
+                    if i < len(self._entries) and self._entries[i] == (key, text):
+                        del self._entries[i]
+        self._memo.clear()
+        return popularity
+
+
+def _build(connect):
+    conn = connect()
+    try:
+        return SuggestionIndex.build(conn)
+    finally:
+        conn.close()
+
+
+def _rebuild(connect):
+    global _index, _journal
+    try:
+        with _index_lock:
+            generation = _generation
+        index = _build(connect)
+        with _index_lock:
+            for method, args in _journal:
+                getattr(index, method)(*args)
+            if generation != _generation:
+                # Reset while it was building, e.g. by a bulk import: serve it but replace it next time
+                index.built_at = float('-inf')
+            _index = index
+    except Exception:
+        log.exception('suggestion index rebuild failed; serving the old one')
+    finally:
+        with _index_lock:
+            _journal = None
+        _build_lock.release()
+
+
+def get_index(connect, max_age):
+    """
+    Returns this worker's index. The first call builds it; once it is
+    `max_age` seconds old, so that popularity and edits made by other workers
+    are picked up, it is rebuilt in the background and the old one is
+    returned until the new one is ready. `connect()` opens a connection the
+    build closes when it is done.
+    """
+    global _index, _journal
+    with _index_lock:
+        index = _index
+        if index is not None:
+            if time.monotonic() - index.built_at > max_age and _build_lock.acquire(blocking=False):
+                _journal = []
+                threading.Thread(target=_rebuild, args=(connect,), name='suggestion-index', daemon=True).start()
+            return index
+    with _build_lock:
+        if _index is None:
+            index = _build(connect)
+            with _index_lock:
+                _index = index
+        return _index
+
+
+def _edit(method, *args):
+    with _index_lock:
+        if _index is None:
+            return
+        getattr(_index, method)(*args)
+        if _journal is not None:
+            _journal.append((method, args))
+
+
+def add_book(book_id, title, author_name, category):
+    # As an update, so that replaying it onto a rebuild that already has the book changes nothing
+    _edit('update_book', book_id, title, author_name, category)
+
+
+def update_book(book_id, title, author_name, category):
+    _edit('update_book', book_id, title, author_name, category)
+
+
+def remove_book(book_id):
+    _edit('remove_book', book_id)
+
+
+def reset_index():
+    """Marks this worker's index out of date so the next get_index() rebuilds it, e.g. after a bulk import."""
+    global _generation
+    with _index_lock:
+        _generation += 1
+        if _index is not None:
+            _index.built_at = float('-inf')
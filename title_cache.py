@@ -0,0 +1,50 @@
+"""
+Cache of book titles keyed by book_id, shared by a worker's requests.
+Feeds that show many books ask for all their ids at once and the misses are
+read with a single IN (...) query. Entries expire after a TTL so renames made
+through another worker are eventually seen; manage_book invalidates its own.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TitleCache:
+    def __init__(self, ttl=300, max_size=4096):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # book_id -> (expires_at, title)
+        self._lock = threading.Lock()
+
+    def get_many(self, db, book_ids):
+        """Returns {book_id: title} for the ids that exist, querying only the misses."""
+        now = time.monotonic()
+        titles, missing = {}, set()
+        with self._lock:
+            for book_id in set(book_ids):
+                entry = self._entries.get(book_id)
+                if entry is None or entry[0] < now:
+                    missing.add(book_id)
+                else:
+                    self._entries.move_to_end(book_id)
+                    titles[book_id] = entry[1]
+        if missing:
+            ids = sorted(missing)
+            rows = db.execute(f"SELECT book_id, title FROM book_db WHERE book_id IN ({', '.join('?' for _ in ids)})",
+                              ids).fetchall()
+            with self._lock:
+                for row in rows:
+                    titles[row['book_id']] = row['title']
+                    self._entries[row['book_id']] = (now + self.ttl, row['title'])
+                    self._entries.move_to_end(row['book_id'])
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return titles
+
+    def invalidate(self, book_id):
+        with self._lock:
+            self._entries.pop(int(book_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()